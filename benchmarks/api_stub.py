@@ -0,0 +1,260 @@
+from collections import Counter
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import re
+import threading
+import time
+
+from benchmarks.git_fixtures import SyntheticRepository
+
+
+class ApiStubServer:
+    rate_limit = 5000
+    rate_limit_window_seconds = 3600
+    core_be_path = "/api/company/version-control/me/"
+    repository_path_pattern = re.compile(r"^/repos/(?P<owner>[^/]+)/(?P<name>[^/]+)(?P<endpoint>/.*)?$")
+    graphql_repository_pattern = re.compile(
+        r'^(\w+): repository\(owner: ("[^"]*"), name: ("[^"]*")\) \{(.*)\}$', re.MULTILINE
+    )
+    graphql_field_pattern = re.compile(r'(\w+): (?:ref\(qualifiedName: ("[^"]*")\)|latestRelease)')
+    graphql_refs_pattern = re.compile(r'refs\(refPrefix: "refs/tags/", first: (\d+), after: ("[^"]*"|null)\)')
+
+    def __init__(self, repository: SyntheticRepository) -> None:
+        self.repository = repository
+        self.configs: dict[str, dict] = {}
+        self.latest_release: str | None = None
+        self.requests_count = Counter()
+        self.rate_limit_remaining = self.rate_limit
+        self.rate_limit_reset_at = time.time() + self.rate_limit_window_seconds
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_config(self, core_be_token: str, config: dict) -> None:
+        self.configs[core_be_token] = config
+
+    def start(self) -> "ApiStubServer":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._get_handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="api-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self) -> "ApiStubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def handle(self, path: str, headers: dict) -> tuple[int, dict | None, dict]:
+        path = path.split("?", 1)[0]
+        with self._lock:
+            self.requests_count[path] += 1
+
+        if path == self.core_be_path:
+            token = headers.get("Authorization", "").removeprefix("Token ")
+            if token not in self.configs:
+                return 401, {"detail": "Invalid token."}, {}
+            return 200, self.configs[token], {}
+
+        if path == "/rate_limit":
+            return 200, self._get_rate_limit_body(), {}
+
+        repository_match = self.repository_path_pattern.match(path)
+        if not repository_match:
+            return 404, {"message": "Not Found"}, {}
+        body = self._get_repository_body(repository_match["owner"], repository_match["name"],
+                                         repository_match["endpoint"] or "")
+        if body is None:
+            return 404, {"message": "Not Found"}, {}
+        return 200, body, {"ETag": self._get_etag(body)}
+
+    def set_rate_limit(self, remaining: int, reset_in_seconds: float) -> None:
+        with self._lock:
+            self.rate_limit_remaining = remaining
+            self.rate_limit_reset_at = time.time() + reset_in_seconds
+
+    def is_rate_limited(self) -> bool:
+        with self._lock:
+            self._reset_rate_limit_window()
+            return self.rate_limit_remaining == 0
+
+    def count_github_request(self, is_not_modified: bool) -> dict:
+        with self._lock:
+            self._reset_rate_limit_window()
+            if not is_not_modified:
+                self.rate_limit_remaining = max(0, self.rate_limit_remaining - 1)
+            return self._get_rate_limit_headers()
+
+    def get_rate_limited_response(self) -> tuple[int, dict, dict]:
+        with self._lock:
+            return 403, {"message": "API rate limit exceeded"}, self._get_rate_limit_headers()
+
+    def handle_graphql(self, query: str) -> tuple[int, dict, dict]:
+        with self._lock:
+            self.requests_count["/graphql"] += 1
+
+        data = {}
+        tag_objects = self.repository.get_tag_objects()
+        for repository_alias, _, _, raw_fields in self.graphql_repository_pattern.findall(query):
+            fields = data[repository_alias] = {}
+            for field_alias, raw_qualified_name in self.graphql_field_pattern.findall(raw_fields):
+                if not raw_qualified_name:
+                    latest_release = self.latest_release or self.repository.get_latest_tag()
+                    fields[field_alias] = {"tagName": latest_release} if latest_release else None
+                    continue
+                tag = json.loads(raw_qualified_name).removeprefix("refs/tags/")
+                if tag not in tag_objects:
+                    fields[field_alias] = None
+                    continue
+                tag_object, object_type = tag_objects[tag]
+                target = {"oid": tag_object}
+                if object_type == "tag":
+                    target["target"] = {"oid": self.repository.get_peeled_commit(tag_object)}
+                fields[field_alias] = {"target": target}
+            refs_match = self.graphql_refs_pattern.search(raw_fields)
+            if refs_match:
+                fields["refs"] = self._get_graphql_refs(tag_objects, int(refs_match[1]), json.loads(refs_match[2]))
+        return 200, {"data": data}, {}
+
+    def _get_graphql_refs(self, tag_objects: dict[str, tuple[str, str]], first: int, after: str | None) -> dict:
+        tags = sorted(tag_objects)
+        start = int(after) if after else 0
+        nodes = []
+        for tag in tags[start:start + first]:
+            tag_object, object_type = tag_objects[tag]
+            target = {"oid": tag_object}
+            if object_type == "tag":
+                target["target"] = {"oid": self.repository.get_peeled_commit(tag_object)}
+            nodes.append({"name": tag, "target": target})
+        end = start + len(nodes)
+        return {"pageInfo": {"hasNextPage": end < len(tags), "endCursor": str(end)}, "nodes": nodes}
+
+    def _reset_rate_limit_window(self) -> None:
+        if time.time() >= self.rate_limit_reset_at:
+            self.rate_limit_remaining = self.rate_limit
+            self.rate_limit_reset_at = time.time() + self.rate_limit_window_seconds
+
+    def _get_rate_limit_headers(self) -> dict:
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(self.rate_limit_remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.rate_limit_reset_at)),
+        }
+
+    def _get_repository_body(self, owner: str, name: str, endpoint: str) -> dict | list | None:
+        repository_api_url = f"{self.url}/repos/{owner}/{name}"
+        if endpoint == "":
+            return {
+                "id": 1,
+                "name": name,
+                "full_name": f"{owner}/{name}",
+                "url": repository_api_url,
+                "clone_url": self.repository.url,
+                "default_branch": "main",
+            }
+        if endpoint == "/releases/latest":
+            latest_release = self.latest_release or self.repository.get_latest_tag()
+            if latest_release is None:
+                return None
+            return {"url": f"{repository_api_url}/releases/1", "id": 1, "tag_name": latest_release}
+        if endpoint == "/git/matching-refs/tags":
+            return [
+                {
+                    "ref": f"refs/tags/{tag}",
+                    "url": f"{repository_api_url}/git/refs/tags/{tag}",
+                    "object": {"sha": tag_object, "type": object_type},
+                }
+                for tag, (tag_object, object_type) in self.repository.get_tag_objects().items()
+            ]
+        if endpoint.startswith("/git/tags/"):
+            tag_object = endpoint.removeprefix("/git/tags/")
+            commit = self.repository.get_peeled_commit(tag_object)
+            if commit is None:
+                return None
+            return {"sha": tag_object, "object": {"sha": commit, "type": "commit"}}
+        if endpoint.startswith("/git/ref/tags/"):
+            tag = endpoint.removeprefix("/git/ref/tags/")
+            tag_object = self.repository.get_tag_object(tag)
+            if tag_object is None:
+                return None
+            return {
+                "ref": f"refs/tags/{tag}",
+                "url": f"{repository_api_url}/git/refs/tags/{tag}",
+                "object": {"sha": tag_object[0], "type": tag_object[1]},
+            }
+        return None
+
+    def _get_rate_limit_body(self) -> dict:
+        rate = {
+            "limit": self.rate_limit,
+            "remaining": self.rate_limit_remaining,
+            "reset": math.ceil(self.rate_limit_reset_at),
+            "used": self.rate_limit - self.rate_limit_remaining,
+        }
+        return {"resources": {"core": rate}, "rate": rate}
+
+    @staticmethod
+    def _get_etag(body: dict | list) -> str:
+        return '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest() + '"'
+
+    def _get_handler_class(self) -> type[BaseHTTPRequestHandler]:
+        api_stub_server = self
+
+        class ApiStubHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                is_github_request = not self.path.startswith(api_stub_server.core_be_path)
+                if is_github_request and self.path != "/rate_limit" and api_stub_server.is_rate_limited():
+                    self._send(*api_stub_server.get_rate_limited_response())
+                    return
+
+                status_code, body, headers = api_stub_server.handle(self.path, dict(self.headers))
+                is_not_modified = (
+                    status_code == 200
+                    and "ETag" in headers
+                    and self.headers.get("If-None-Match") == headers["ETag"]
+                )
+                if is_github_request:
+                    headers |= api_stub_server.count_github_request(is_not_modified)
+                self._send(304 if is_not_modified else status_code, None if is_not_modified else body, headers)
+
+            def do_POST(self) -> None:
+                request_body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path != "/graphql":
+                    self._send(404, {"message": "Not Found"}, {})
+                elif api_stub_server.is_rate_limited():
+                    self._send(*api_stub_server.get_rate_limited_response())
+                else:
+                    status_code, body, headers = api_stub_server.handle_graphql(request_body.get("query", ""))
+                    self._send(status_code, body, headers | api_stub_server.count_github_request(False))
+
+            def _send(self, status_code: int, body: dict | list | None, headers: dict) -> None:
+                payload = b"" if body is None else json.dumps(body).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for header, value in headers.items():
+                    self.send_header(header, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return ApiStubHandler
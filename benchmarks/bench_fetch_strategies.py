@@ -0,0 +1,57 @@
+import argparse
+from pathlib import Path
+import shutil
+import tempfile
+import time
+
+from benchmarks.git_fixtures import SyntheticRepository
+from src.github_repository import GithubRepository
+
+FETCH_STRATEGIES = {
+    "full": {"fetch_strategy": GithubRepository.FETCH_STRATEGY_FULL},
+    "target": {"fetch_strategy": GithubRepository.FETCH_STRATEGY_TARGET},
+    "target_depth_1": {"fetch_strategy": GithubRepository.FETCH_STRATEGY_TARGET, "fetch_depth": 1},
+    "target_blobless": {"fetch_strategy": GithubRepository.FETCH_STRATEGY_TARGET, "fetch_filter": "blob:none"},
+}
+
+
+def run_benchmark(workdir: Path, commits: int, branches: int, binary_blob_size: int) -> list[dict]:
+    remote = SyntheticRepository(workdir / "remote.git")
+    remote.add_commits(commits // 2, binary_blob_size=binary_blob_size)
+    remote.tag("v1")
+    installation_path = remote.clone(workdir / "installation")
+
+    remote.add_commits(commits // 2, binary_blob_size=binary_blob_size)
+    remote.add_branches(branches, commits_per_branch=commits // 20 or 1)
+    target_commit = remote.tag("v2")
+
+    results = []
+    for strategy_name, fetch_options in FETCH_STRATEGIES.items():
+        strategy_path = workdir / strategy_name
+        shutil.copytree(installation_path, strategy_path, symlinks=True)
+        github_repository = GithubRepository("", "", strategy_path, "", **fetch_options)
+
+        started_at = time.perf_counter()
+        github_repository.change_source_code_version(target_commit)
+        duration_seconds = time.perf_counter() - started_at
+
+        results.append({
+            "strategy": strategy_name,
+            "seconds": round(duration_seconds, 4),
+            "objects": github_repository.last_fetch_report["objects"],
+            "bytes": github_repository.last_fetch_report["bytes"],
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare fetch strategies against a local synthetic remote")
+    parser.add_argument("--commits", type=int, default=4000)
+    parser.add_argument("--branches", type=int, default=20)
+    parser.add_argument("--binary-blob-size", type=int, default=0)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for result in run_benchmark(Path(workdir), arguments.commits, arguments.branches, arguments.binary_blob_size):
+            print(f"{result['strategy']:<16} {result['seconds']:>8}s {result['objects']:>8} objects "
+                  f"{result['bytes']:>12} bytes")
@@ -0,0 +1,53 @@
+import argparse
+import json
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("github", "git", "requests", "urllib3", "yaml", "smtplib", "ssl", "email.mime")
+IMPORT_BUDGET_SECONDS = 0.25
+MEASURE_IMPORT_CODE = """
+import json, sys, time
+started_at = time.perf_counter()
+import {module}
+duration_seconds = time.perf_counter() - started_at
+loaded_modules = [
+    name for name in {heavy_modules!r}
+    if name in sys.modules and type(sys.modules[name]).__name__ != "_LazyModule"
+]
+print(json.dumps({{"seconds": duration_seconds, "loaded_modules": loaded_modules}}))
+"""
+
+
+def measure_import(module: str = "main") -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE_IMPORT_CODE.format(module=module, heavy_modules=HEAVY_MODULES)],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def run_benchmark(module: str = "main", repeats: int = 10) -> dict:
+    measures = [measure_import(module) for _ in range(repeats)]
+    durations_seconds = [measure["seconds"] for measure in measures]
+    return {
+        "module": module,
+        "median_seconds": round(statistics.median(durations_seconds), 4),
+        "min_seconds": round(min(durations_seconds), 4),
+        "loaded_modules": measures[-1]["loaded_modules"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the import time of main.py in fresh interpreters")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--repeats", type=int, default=10)
+    arguments = parser.parse_args()
+
+    results = run_benchmark(arguments.module, arguments.repeats)
+    print(f"{results['module']}: {results['median_seconds']}s median {results['min_seconds']}s min "
+          f"(budget {IMPORT_BUDGET_SECONDS}s), heavy modules loaded: {', '.join(results['loaded_modules']) or '-'}")
@@ -0,0 +1,207 @@
+import argparse
+from contextlib import contextmanager
+import json
+from pathlib import Path
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from unittest.mock import patch
+
+from benchmarks.api_stub import ApiStubServer
+from benchmarks.git_fixtures import SyntheticRepository
+from src.app_updater import AppUpdater
+from src.github_repository import GithubClientPool, GithubRepository
+from src.response_cache import ResponseCache
+from src.version_control_provider import CoreConfigProvider
+
+SCENARIOS = ("cold_clone", "no_op", "large_diff")
+CORE_BE_TOKEN = "benchmark-core-be-token"
+GITHUB_TOKEN = "benchmark-github-token"
+default_results_directory = Path(__file__).parent / "results"
+
+
+def prepare_remote(workdir: Path, commits: int, files: int, diff_commits: int, binary_blob_size: int,
+                   tags: int) -> SyntheticRepository:
+    remote = SyntheticRepository(workdir / "remote.git", files=files)
+    commits_per_tag = max(1, commits // max(1, tags))
+    for tag_index in range(max(1, tags)):
+        remote.add_commits(commits_per_tag)
+        remote.tag(f"v0.{tag_index}")
+    remote.tag("v1")
+    remote.add_commits(diff_commits, files_per_commit=10, binary_blob_size=binary_blob_size)
+    remote.tag("v2")
+    return remote
+
+
+def prepare_installation(remote: SyntheticRepository, scenario: str, path: Path, templates_path: Path) -> None:
+    if scenario == "cold_clone":
+        return
+
+    version = "v2" if scenario == "no_op" else "v1"
+    template_path = templates_path / version
+    if not template_path.exists():
+        remote.clone(template_path)
+        subprocess.run(["git", "-C", str(template_path), "checkout", "--quiet", version], check=True)
+    shutil.copytree(template_path, path, symlinks=True)
+
+
+@contextmanager
+def api_stub_environment(api_stub_server: ApiStubServer):
+    with (
+        patch.object(GithubRepository, "api_base_url", api_stub_server.url),
+        patch.object(CoreConfigProvider, "BASE_URL", f"{api_stub_server.url}/"),
+        patch.object(AppUpdater, "prefetch_wheels", False),
+    ):
+        yield
+
+
+def run_update(api_stub_server: ApiStubServer, installation_path: Path, response_cache: ResponseCache,
+               config_options: dict, configs_path: Path) -> dict:
+    api_stub_server.set_config(CORE_BE_TOKEN, {
+        "token": GITHUB_TOKEN,
+        "version": "v2",
+        "local_repository_path": str(installation_path),
+        "repository_url": api_stub_server.repository.url,
+        **config_options,
+    })
+    requests_before = sum(api_stub_server.requests_count.values())
+    app_updater = AppUpdater(
+        version_control_provider=CoreConfigProvider(CORE_BE_TOKEN, last_known_good_directory=configs_path),
+        response_cache=response_cache,
+        client_pool=GithubClientPool(),
+    )
+
+    started_at = time.perf_counter()
+    is_updated = app_updater.update_source_code_automaticaly()
+    duration_seconds = time.perf_counter() - started_at
+
+    stage_durations_seconds = {
+        name: round(result["duration_seconds"], 4)
+        for name, result in app_updater.update_pipeline.results.items()
+        if result["duration_seconds"] is not None
+    }
+    return {
+        "seconds": duration_seconds,
+        "is_updated": is_updated,
+        "api_requests": sum(api_stub_server.requests_count.values()) - requests_before,
+        "stages_seconds": stage_durations_seconds,
+    }
+
+
+def run_benchmark(workdir: Path, scenarios: tuple[str, ...] = SCENARIOS, repeats: int = 5, commits: int = 2000,
+                  files: int = 200, diff_commits: int = 200, binary_blob_size: int = 0, tags: int = 10,
+                  config_options: dict | None = None) -> dict:
+    remote = prepare_remote(workdir, commits, files, diff_commits, binary_blob_size, tags)
+    scenario_results = {}
+    with ApiStubServer(remote) as api_stub_server, api_stub_environment(api_stub_server):
+        for scenario in scenarios:
+            response_cache = ResponseCache(workdir / "responses" / scenario)
+            runs = []
+            for repeat in range(repeats):
+                installation_path = workdir / "installations" / f"{scenario}_{repeat}" / "core_legacy"
+                installation_path.parent.mkdir(parents=True)
+                prepare_installation(remote, scenario, installation_path, workdir / "templates")
+                runs.append(run_update(
+                    api_stub_server, installation_path, response_cache, config_options or {}, workdir / "configs"
+                ))
+                shutil.rmtree(installation_path.parent)
+
+            durations_seconds = [run["seconds"] for run in runs]
+            scenario_results[scenario] = {
+                "median_seconds": round(statistics.median(durations_seconds), 4),
+                "min_seconds": round(min(durations_seconds), 4),
+                "runs_seconds": [round(seconds, 4) for seconds in durations_seconds],
+                "api_requests": runs[-1]["api_requests"],
+                "is_updated": runs[-1]["is_updated"],
+                "stages_seconds": runs[-1]["stages_seconds"],
+            }
+
+    return {
+        "commit": get_code_version(),
+        "created_at": time.time(),
+        "parameters": {
+            "repeats": repeats,
+            "commits": commits,
+            "files": files,
+            "diff_commits": diff_commits,
+            "binary_blob_size": binary_blob_size,
+            "tags": tags,
+            "config_options": config_options or {},
+        },
+        "scenarios": scenario_results,
+    }
+
+
+def get_code_version() -> str:
+    repository_path = Path(__file__).parent.parent
+    commit = subprocess.run(
+        ["git", "-C", str(repository_path), "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+    ).stdout.strip() or "unknown"
+    is_dirty = subprocess.run(
+        ["git", "-C", str(repository_path), "status", "--porcelain", "--untracked-files=no"],
+        capture_output=True, text=True,
+    ).stdout.strip()
+    return f"{commit}-dirty" if is_dirty else commit
+
+
+def save_results(results: dict, results_directory: Path = default_results_directory) -> Path:
+    results_directory.mkdir(parents=True, exist_ok=True)
+    results_path = results_directory / f"{results['commit']}.json"
+    results_path.write_text(json.dumps(results, indent=2, sort_keys=True))
+    return results_path
+
+
+def compare_results(baseline: dict, results: dict) -> list[str]:
+    lines = [f"{'scenario':<12} {baseline['commit']:>14} {results['commit']:>14} {'change':>8}"]
+    for scenario, scenario_results in results["scenarios"].items():
+        if scenario not in baseline["scenarios"]:
+            continue
+        baseline_seconds = baseline["scenarios"][scenario]["median_seconds"]
+        seconds = scenario_results["median_seconds"]
+        change = (seconds - baseline_seconds) / baseline_seconds * 100 if baseline_seconds else 0
+        lines.append(f"{scenario:<12} {baseline_seconds:>13}s {seconds:>13}s {change:>+7.1f}%")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time complete updates against a local git remote and API stub")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--diff-commits", type=int, default=200)
+    parser.add_argument("--binary-blob-size", type=int, default=0)
+    parser.add_argument("--tags", type=int, default=10)
+    parser.add_argument("--fetch-strategy", choices=("full", "target"))
+    parser.add_argument("--ref-resolver", choices=("api", "remote", "local"))
+    parser.add_argument("--results-directory", type=Path, default=default_results_directory)
+    parser.add_argument("--compare", type=Path, help="results file of a previous commit")
+    arguments = parser.parse_args()
+
+    config_options = {}
+    if arguments.fetch_strategy:
+        config_options["fetch_strategy"] = arguments.fetch_strategy
+    if arguments.ref_resolver:
+        config_options["ref_resolver"] = arguments.ref_resolver
+
+    with tempfile.TemporaryDirectory() as workdir:
+        benchmark_results = run_benchmark(
+            Path(workdir),
+            scenarios=tuple(arguments.scenarios),
+            repeats=arguments.repeats,
+            commits=arguments.commits,
+            files=arguments.files,
+            diff_commits=arguments.diff_commits,
+            binary_blob_size=arguments.binary_blob_size,
+            tags=arguments.tags,
+            config_options=config_options,
+        )
+
+    for scenario, scenario_results in benchmark_results["scenarios"].items():
+        print(f"{scenario:<12} {scenario_results['median_seconds']:>8}s median {scenario_results['min_seconds']:>8}s "
+              f"min {scenario_results['api_requests']:>4} api requests")
+    print(f"results saved in {save_results(benchmark_results, arguments.results_directory)}")
+    if arguments.compare:
+        print("\n".join(compare_results(json.loads(arguments.compare.read_text()), benchmark_results)))
@@ -0,0 +1,125 @@
+from pathlib import Path
+import random
+import subprocess
+
+
+class SyntheticRepository:
+    def __init__(self, path: Path, files: int = 200, blob_size: int = 256, seed: int = 0) -> None:
+        self.path = Path(path)
+        self.files = files
+        self.blob_size = blob_size
+        self.random = random.Random(seed)
+        self.commits_count = 0
+
+        subprocess.run(["git", "init", "--quiet", "--bare", "--initial-branch=main", str(self.path)], check=True)
+        self._git("config", "uploadpack.allowFilter", "true")
+        self._git("config", "uploadpack.allowAnySHA1InWant", "true")
+
+    @property
+    def url(self) -> str:
+        return self.path.as_uri()
+
+    def add_commits(self, commits: int, branch: str = "main", files_per_commit: int = 3,
+                    binary_blob_size: int = 0) -> str:
+        stream = []
+        parent = self._get_ref(f"refs/heads/{branch}") or self._get_ref("refs/heads/main")
+        for index in range(commits):
+            self.commits_count += 1
+            message = f"synthetic commit {self.commits_count}".encode()
+            stream.append(f"commit refs/heads/{branch}\n".encode())
+            stream.append(f"committer Core Developer <developer@core.com> {1700000000 + self.commits_count} +0000\n"
+                          .encode())
+            stream.append(f"data {len(message)}\n".encode() + message + b"\n")
+            if parent and index == 0:
+                stream.append(f"from {parent}\n".encode())
+            for _ in range(files_per_commit):
+                file_path = f"src/module_{self.random.randrange(self.files)}.py"
+                content = self._get_text_blob()
+                stream.append(f"M 644 inline {file_path}\ndata {len(content)}\n".encode() + content + b"\n")
+            if binary_blob_size:
+                content = self.random.randbytes(binary_blob_size)
+                stream.append(f"M 644 inline assets/blob_{self.commits_count}.bin\ndata {len(content)}\n".encode()
+                              + content + b"\n")
+            stream.append(b"\n")
+
+        subprocess.run(
+            ["git", "fast-import", "--quiet"],
+            input=b"".join(stream),
+            cwd=self.path,
+            check=True,
+        )
+        return self._get_ref(f"refs/heads/{branch}")
+
+    def add_branches(self, branches: int, commits_per_branch: int) -> None:
+        for index in range(branches):
+            self._git("branch", "--force", f"feature_{index}", "main")
+            self.add_commits(commits_per_branch, branch=f"feature_{index}")
+
+    def add_requirements(self, requirements: str) -> str:
+        content = requirements.encode()
+        self.commits_count += 1
+        message = b"update requirements"
+        stream = b"".join([
+            b"commit refs/heads/main\n",
+            f"committer Core Developer <developer@core.com> {1700000000 + self.commits_count} +0000\n".encode(),
+            f"data {len(message)}\n".encode() + message + b"\n",
+            f"from {self._get_ref('refs/heads/main')}\n".encode(),
+            f"M 644 inline requirements.txt\ndata {len(content)}\n".encode() + content + b"\n\n",
+        ])
+        subprocess.run(["git", "fast-import", "--quiet"], input=stream, cwd=self.path, check=True)
+        return self._get_ref("refs/heads/main")
+
+    def tag(self, tag_name: str, commit: str = "main") -> str:
+        self._git("tag", "--force", "--annotate", tag_name, commit, "--message", f"release {tag_name}")
+        return self._get_ref(f"refs/tags/{tag_name}^{{commit}}")
+
+    def clone(self, destination: Path, *arguments: str) -> Path:
+        subprocess.run(["git", "clone", "--quiet", *arguments, self.url, str(destination)], check=True)
+        return Path(destination)
+
+    def get_tag_object(self, tag_name: str) -> tuple[str, str] | None:
+        tag_object = self._get_ref(f"refs/tags/{tag_name}")
+        if tag_object is None:
+            return None
+        return tag_object, self._git("cat-file", "-t", tag_object).strip()
+
+    def get_tag_objects(self) -> dict[str, tuple[str, str]]:
+        raw_tags = self._git("for-each-ref", "--format=%(refname:short) %(objectname) %(objecttype)", "refs/tags")
+        tag_objects = {}
+        for line in raw_tags.splitlines():
+            tag_name, tag_object, object_type = line.split()
+            tag_objects[tag_name] = (tag_object, object_type)
+        return tag_objects
+
+    def get_peeled_commit(self, tag_object: str) -> str | None:
+        return self._get_ref(f"{tag_object}^{{commit}}")
+
+    def get_latest_tag(self) -> str | None:
+        raw_tags = self._git(
+            "for-each-ref", "--sort=-version:refname", "--count=1", "--format=%(refname:short)", "refs/tags"
+        )
+        return raw_tags.strip() or None
+
+    def _get_text_blob(self) -> bytes:
+        line = f"value = {self.random.random()}\n".encode()
+        return line * max(1, self.blob_size // len(line))
+
+    def _get_ref(self, ref: str) -> str | None:
+        result = subprocess.run(
+            ["git", "rev-parse", "--verify", "--quiet", ref],
+            cwd=self.path,
+            capture_output=True,
+            text=True,
+        )
+        return result.stdout.strip() or None
+
+    def _git(self, *arguments: str) -> str:
+        env_arguments = ["-c", "user.name=Core Developer", "-c", "user.email=developer@core.com"]
+        result = subprocess.run(
+            ["git", *env_arguments, *arguments],
+            cwd=self.path,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        return result.stdout
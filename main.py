@@ -1,5 +1,101 @@
+import argparse
+import os
+from pathlib import Path
+
 from src.app_updater import AppUpdater
+from src.environment_store import EnvironmentStore
+from src.github_repository import GithubClientPool
+from src.object_store import SharedObjectStore
+from src.release_changelog import ChangelogCache
+from src.release_index import ReleaseIndex
+from src.response_cache import ResponseCache
 from src.version_control_provider import CoreConfigProvider
 
+
+def get_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Update core_legacy installations")
+    parser.add_argument("--fleet", type=Path, help="yaml file with the installations to update")
+    parser.add_argument("--workers", type=int, default=4, help="installations updated at the same time")
+    parser.add_argument("--object-store", type=Path, help="directory of the git objects shared by the installations")
+    parser.add_argument("--environment-store", type=Path, help="directory of the virtualenvs built per requirements")
+    parser.add_argument("--metrics-directory", type=Path, help="directory for run records and prometheus files")
+    parser.add_argument("--daemon", action="store_true", help="keep running and update when the version changes")
+    parser.add_argument("--min-interval", type=float, default=10, help="seconds between checks after a change")
+    parser.add_argument("--max-interval", type=float, default=120, help="maximum seconds between checks")
+    parser.add_argument("--webhook-port", type=int, help="listen for github and core-be webhooks in daemon mode")
+    parser.add_argument("--webhook-host", default="127.0.0.1", help="address of the webhook listener")
+    parser.add_argument("--prefetch", action="store_true", help="download the prefetch_tags releases and exit")
+    parser.add_argument(
+        "--collect-garbage", action="store_true", help="pack and prune the shared object store and exit"
+    )
+    parser.add_argument("--rollback", action="store_true", help="go back to the previously deployed release")
+    parser.add_argument("--rollback-to", metavar="COMMIT", help="go back to the deployed release of this commit")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    AppUpdater(version_control_provider=CoreConfigProvider).update_source_code_automaticaly()
+    arguments = get_arguments()
+    object_store = SharedObjectStore(arguments.object_store) if arguments.object_store else None
+    environment_store = EnvironmentStore(arguments.environment_store) if arguments.environment_store else None
+
+    if arguments.collect_garbage:
+        for store_path in (object_store or SharedObjectStore()).collect_all_garbage():
+            print(f"{store_path}: ok")
+        raise SystemExit(0)
+
+    if arguments.fleet:
+        from src.fleet_updater import FleetUpdater, load_fleet_targets
+
+        fleet_report = FleetUpdater(
+            load_fleet_targets(arguments.fleet),
+            max_workers=arguments.workers,
+            response_cache=ResponseCache(),
+            object_store=object_store,
+            environment_store=environment_store,
+            metrics_directory=arguments.metrics_directory,
+            changelog_cache=ChangelogCache(),
+            release_index=ReleaseIndex(),
+        ).update_all()
+        for result in fleet_report["results"]:
+            print(f"{result['name']}: {result['status']} ({result['duration_seconds']:.2f}s) {result['error'] or ''}")
+        raise SystemExit(1 if fleet_report["failed_count"] else 0)
+
+    app_updater = AppUpdater(
+        version_control_provider=CoreConfigProvider,
+        response_cache=ResponseCache(),
+        client_pool=GithubClientPool(),
+        object_store=object_store,
+        environment_store=environment_store,
+        metrics_directory=arguments.metrics_directory,
+        changelog_cache=ChangelogCache(),
+        release_index=ReleaseIndex(),
+    )
+    if arguments.prefetch:
+        for release in app_updater.prefetch_releases():
+            print(f"{release['version']}: {release['commit']} ({release['bytes']} bytes)")
+    elif arguments.rollback or arguments.rollback_to:
+        release = app_updater.rollback(commit=arguments.rollback_to)
+        print(f"{release.get('version')}: {release['commit']}")
+    elif arguments.daemon:
+        from src.update_daemon import UpdateDaemon
+
+        update_daemon = UpdateDaemon(app_updater, arguments.min_interval, arguments.max_interval)
+        update_daemon.install_signal_handlers()
+        webhook_listener = None
+        if arguments.webhook_port:
+            from src.webhook_listener import WebhookListener
+
+            # the only trigger also takes the core-be notifications that name the installation
+            webhook_listener = WebhookListener(
+                {"installation": lambda: update_daemon.request_check(force=True)},
+                os.environ["WEBHOOK_SECRET"],
+                host=arguments.webhook_host,
+                port=arguments.webhook_port,
+            ).start()
+        try:
+            update_daemon.run()
+        finally:
+            if webhook_listener:
+                webhook_listener.stop()
+    else:
+        app_updater.update_source_code_automaticaly()
@@ -1,19 +1,129 @@
+import os
 from pathlib import Path
+import shlex
+import signal
 import subprocess
-import traceback
-from src.version_control_provider import LocalConfigProvider, VersionControlProvider
+import threading
+import time
+from typing import TypedDict
+from src.version_control_provider import (
+    LocalConfigProvider,
+    VersionControlConfigs,
+    VersionControlProvider,
+)
 
+from src.deployment_state import DeploymentState
 from src.email_sender import EmailSender
-from .github_repository import GithubRepository
+from src.environment_store import EnvironmentStore
+from src.migration_plan import (
+    MigrationPlan,
+    migration_file_patterns,
+    plan_migrations,
+    schema_file_patterns,
+)
+from src.object_store import SharedObjectStore
+from src.release_changelog import (
+    ChangelogCache,
+    ReleaseChangelog,
+    build_changelog,
+    format_changelog,
+)
+from src.release_index import ReleaseIndex
+from src.requirements_diff import (
+    RequirementsDiff,
+    diff_requirements,
+    get_requirements_hash,
+)
+from src.response_cache import ResponseCache
+from src.update_metrics import UpdateMetrics
+from src.update_pipeline import (
+    PipelineStopped,
+    Stage,
+    UpdatePipeline,
+)
+from src.worktree_deployer import WorktreeDeployer
+from .github_repository import GithubClientPool, GithubRepository
+
+
+class ResolvedVersion(TypedDict):
+    github_repository: GithubRepository
+    deployment_state: DeploymentState
+    version_tag: str
+    version_commit: str
+    previous_commit: str | None
+    previous_release: dict
+    worktree_deployer: WorktreeDeployer | None
+
+
+class DependenciesPlan(TypedDict):
+    requirements: str
+    requirements_hash: str
+    pip_arguments: list[list[str]]
+
+
+class PrefetchedRelease(TypedDict):
+    version: str
+    commit: str
+    requirements_hash: str | None
+    bytes: int
+    prefetched_at: float
+
+
+class HealthCheckError(Exception):
+    pass
 
 
 class AppUpdater:
+    DEPLOY_MODE_IN_PLACE = "in_place"
+    DEPLOY_MODE_WORKTREE = "worktree"
+    PREFETCH_LATEST_RELEASE = "latest"
+
     max_input_retries = 3
     organization_name = "core-webapp"
     repository_name = "core_legacy"
     user_input_true = "y"
     license_path = Path() / repository_name / "state" / "utils" / "license.yaml"
-    requirements_path = Path() / repository_name / "requirements.txt"
+    requirements_path = Path("requirements.txt")
+    pip_command = ("pip",)
+    uninstall_removed_requirements = False
+    prefetch_wheels = True
+    collect_rate_limit = True
+    max_changelog_commits = 50
+    max_release_history = 5
+    release_keys = ("version", "commit", "requirements_hash", "environment", "migrations")
+    default_health_check_timeout_seconds = 60
+    migration_file_patterns = migration_file_patterns
+    schema_file_patterns = schema_file_patterns
+    max_narrowed_migration_apps = 3
+    wheels_path = Path.home() / ".cache" / "app_updater" / "wheels"
+    # success and error messages of each pip command
+    pip_messages = {
+        "install": ("Dependencias instaladas con éxito.", "Hubo un error al instalar las dependencias."),
+        "download": ("Dependencias descargadas con éxito.", "Hubo un error al descargar las dependencias."),
+        "uninstall": ("Dependencias desinstaladas con éxito.", "Hubo un error al desinstalar las dependencias."),
+    }
+    github_repository_config_keys = (
+        "token",
+        "local_repository_path",
+        "deploy_mode",
+        "ref_resolver",
+        "fetch_strategy",
+        "fetch_depth",
+        "fetch_filter",
+        "repository_url",
+        "sparse_checkout_paths",
+    )
+    stage_timeouts_seconds = {
+        "config": 60,
+        "resolve": 60,
+        "fetch": 15 * 60,
+        "checkout": 10 * 60,
+        "switch": 60,
+        "dependencies": 30 * 60,
+        "migrations": 30 * 60,
+        "changelog": 5 * 60,
+        "health_check": 5 * 60,
+    }
 
     # TODO where should we add the developers? harcoded here or in a config file?
     developers: tuple[str]
@@ -22,12 +132,35 @@ class AppUpdater:
     user_mail: str
     password_mail: str
 
-    changes_made = []
-
     def __init__(
-        self, version_control_provider: VersionControlProvider = LocalConfigProvider
+        self,
+        version_control_provider: VersionControlProvider | type[VersionControlProvider] = LocalConfigProvider,
+        response_cache: ResponseCache | None = None,
+        client_pool: GithubClientPool | None = None,
+        object_store: SharedObjectStore | None = None,
+        environment_store: EnvironmentStore | None = None,
+        metrics_directory: Path | None = None,
+        email_sender: EmailSender | None = None,
+        changelog_cache: ChangelogCache | None = None,
+        release_index: ReleaseIndex | None = None,
     ) -> None:
-        self.version_control_provider = version_control_provider()
+        if isinstance(version_control_provider, type):
+            version_control_provider = version_control_provider()
+        self.version_control_provider = version_control_provider
+        self.response_cache = response_cache
+        self.client_pool = client_pool
+        self.object_store = object_store
+        self.environment_store = environment_store
+        self.metrics_directory = Path(metrics_directory) if metrics_directory else None
+        self.email_sender = email_sender
+        self.changelog_cache = changelog_cache
+        self.release_index = release_index
+        self.last_update_metrics: UpdateMetrics | None = None
+        self.changes_made = []
+        self._github_repositories: dict[str, GithubRepository] = {}
+        self._github_repositories_lock = threading.Lock()
+        if response_cache:
+            self.version_control_provider.use_response_cache(response_cache)
 
     def install_source_code(self):
         # TODO: get token from user and if it is valid continue
@@ -47,49 +180,716 @@ class AppUpdater:
         # TODO: send mail with a resume of the new changes
         pass
 
-    def update_source_code_automaticaly(self) -> None:
-        version_control_data = self.version_control_provider.get_config()
-        github_repository = GithubRepository(
-            version_control_data["token"],
-            self.organization_name,
-            version_control_data["local_repository_path"],
-            self.repository_name,
+    def update_source_code_automaticaly(self, version_control_data: VersionControlConfigs | None = None) -> bool:
+        self.update_pipeline = self._get_update_pipeline()
+        started_at = time.perf_counter()
+        results = self.update_pipeline.run({"version_control_data": version_control_data})
+        # a timed out stage still stops on its own deadline, and the next update must not run next to it
+        self.update_pipeline.wait_for_abandoned_stages()
+        if self.metrics_directory:
+            self._record_metrics(time.perf_counter() - started_at)
+
+        error = self.update_pipeline.get_error()
+        if error is not None:
+            raise error
+        return results["checkout"]["status"] == UpdatePipeline.STATUS_SUCCEEDED
+
+    def _get_update_pipeline(self) -> UpdatePipeline:
+        is_collecting_rate_limit = bool(self.metrics_directory and self.collect_rate_limit)
+        # the rate limit is read before resolve, so the difference with the one read after covers every call
+        resolve_dependencies = ("config", "rate_limit_before") if is_collecting_rate_limit else ("config",)
+        stages = [
+            self._get_stage("config", self._get_version_control_data),
+            self._get_stage("resolve", self._resolve_version_commit, resolve_dependencies),
+            self._get_stage("fetch", self._fetch_version, ("resolve",)),
+            self._get_stage("checkout", self._checkout_version, ("fetch",)),
+            self._get_stage("plan_dependencies", self._plan_dependencies, ("fetch",)),
+            self._get_stage("changelog", self._build_changelog, ("fetch",), failure_policy=Stage.FAILURE_IGNORE),
+            self._get_stage("plan_migrations", self._plan_migrations, ("fetch",)),
+        ]
+        if self.environment_store:
+            stages += [
+                self._get_stage("dependencies", self._build_environment, ("plan_dependencies",)),
+                self._get_stage("activate_environment", self._activate_environment, ("checkout", "dependencies")),
+                self._get_stage("switch", self._switch_version, ("activate_environment",)),
+            ]
+        else:
+            stages += [
+                self._get_stage(
+                    "prefetch_dependencies",
+                    self._download_wheels,
+                    ("plan_dependencies",),
+                    failure_policy=Stage.FAILURE_IGNORE,
+                ),
+                self._get_stage("dependencies", self._install_dependencies, ("checkout", "prefetch_dependencies")),
+                self._get_stage("switch", self._switch_version, ("dependencies",)),
+            ]
+        if is_collecting_rate_limit:
+            stages.append(self._get_stage(
+                "rate_limit_before",
+                self._get_rate_limit_remaining,
+                ("config",),
+                failure_policy=Stage.FAILURE_IGNORE,
+            ))
+        stages += [
+            self._get_stage("migrations", self._run_database_migration, ("switch", "plan_migrations")),
+            self._get_stage("health_check", self._run_health_check, ("migrations",)),
+            self._get_stage("release_history", self._record_release, ("health_check",)),
+        ]
+        stages.append(self._get_stage(
+            "email",
+            self._send_email_with_resume_of_changes,
+            ("health_check", "changelog"),
+            failure_policy=Stage.FAILURE_IGNORE,
+            background=True,
+        ))
+        return UpdatePipeline(stages)
+
+    def _get_stage(self, name: str, function, depends_on: tuple[str, ...] = (), **kwargs) -> Stage:
+        return Stage(name, function, depends_on, timeout_seconds=self.stage_timeouts_seconds.get(name), **kwargs)
+
+    def _get_version_control_data(self, context: dict) -> VersionControlConfigs:
+        if context.get("version_control_data") is not None:
+            return context["version_control_data"]
+        return self.version_control_provider.get_config()
+
+    def is_deployed(self, version_control_data: VersionControlConfigs) -> bool:
+        # moving tags are re-pointed to new commits, so the tag is resolved instead of comparing version names
+        github_repository = self._get_github_repository(version_control_data)
+        github_repository.refresh()
+        version_commit = github_repository.get_commit_sha_of_version_tag(version_control_data["version"])
+        version_commit = github_repository.peel_commit(version_commit)
+        deployment_state = DeploymentState.for_installation(version_control_data["local_repository_path"])
+        return self._is_rejected_release(
+            deployment_state, version_control_data["version"], version_commit
+        ) or self._is_commit_deployed(version_control_data, github_repository, deployment_state, version_commit)
+
+    def _resolve_version_commit(self, context: dict) -> ResolvedVersion:
+        version_control_data = context["config"]
+        github_repository = self._get_github_repository(version_control_data)
+        github_repository.refresh()
+        worktree_deployer = self._get_worktree_deployer(version_control_data)
+        version_tag = version_control_data["version"]
+
+        version_commit = github_repository.peel_commit(github_repository.get_commit_sha_of_version_tag(version_tag))
+        deployment_state = DeploymentState.for_installation(version_control_data["local_repository_path"])
+        if self._is_rejected_release(deployment_state, version_tag, version_commit):
+            raise PipelineStopped(f"{version_tag} was rolled back, it is skipped until the version changes")
+        if self._is_commit_deployed(version_control_data, github_repository, deployment_state, version_commit):
+            raise PipelineStopped(f"{version_tag} is already deployed")
+
+        previous_commit = github_repository.get_local_head_commit()
+        return ResolvedVersion(
+            github_repository=github_repository,
+            deployment_state=deployment_state,
+            version_tag=version_tag,
+            version_commit=version_commit,
+            previous_commit=previous_commit,
+            previous_release=self._get_current_release(deployment_state, worktree_deployer, previous_commit),
+            worktree_deployer=worktree_deployer,
         )
 
-        self._update_to_new_version(github_repository, version_control_data["version"])
+    @staticmethod
+    def _is_rejected_release(deployment_state: DeploymentState, version_tag: str, version_commit: str) -> bool:
+        # a release that failed its health check or was rolled back would be deployed again on the next check,
+        # so it is skipped until the config names another version or the tag is moved
+        rejected_release = deployment_state.get("rejected_release")
+        if not rejected_release:
+            return False
+        if rejected_release == {"version": version_tag, "commit": version_commit}:
+            return True
+        deployment_state.update(rejected_release=None)
+        return False
 
-        # self._install_dependencies_from_requirements()
+    def _is_commit_deployed(
+        self,
+        version_control_data: VersionControlConfigs,
+        github_repository: GithubRepository,
+        deployment_state: DeploymentState,
+        version_commit: str,
+    ) -> bool:
+        # a run that failed after the checkout leaves HEAD at the new commit, so the state also has to
+        # record the dependencies and the migrations of that commit
+        if not github_repository.is_at_commit(version_commit):
+            return False
+        state = deployment_state.read()
+        if not state:
+            return True
+        if version_control_data.get("migration_command") and state.get("migrations") != version_commit:
+            return False
+        requirements = github_repository.read_file(version_commit, self.requirements_path)
+        if requirements is None and self.environment_store:
+            requirements = ""
+        return requirements is None or state.get("requirements_hash") == get_requirements_hash(requirements)
 
-        # self._run_database_migration()
-        # self._send_email_with_resume_of_changes()
+    def _fetch_version(self, context: dict) -> None:
+        resolved_version = context["resolve"]
+        version_commit = resolved_version["version_commit"]
+        github_repository = resolved_version["github_repository"]
+        prefetched_releases = resolved_version["deployment_state"].get("prefetched_releases") or {}
+        github_repository.fetch_source_code_version(
+            version_commit,
+            is_prefetched=any(release["commit"] == version_commit for release in prefetched_releases.values()),
+        )
+        # the state and the history record the commit, also when the tag was resolved to its tag object
+        resolved_version["version_commit"] = github_repository.resolve_commit(version_commit)
 
-    def _update_to_new_version(
-        self, github_repository: GithubRepository, version_tag: str = "qa"
-    ) -> None:
-        version_commit = github_repository.get_commit_sha_of_version_tag(version_tag)
-        github_repository.change_source_code_version(version_commit)
+    def _checkout_version(self, context: dict) -> dict:
+        resolved_version = context["resolve"]
+        version_commit = resolved_version["version_commit"]
+
+        github_repository = resolved_version["github_repository"]
+        worktree_deployer = resolved_version["worktree_deployer"]
+        if worktree_deployer:
+            # the release only goes live in the switch stage, once its dependencies are installed
+            github_repository.checkout_worktree(worktree_deployer, version_commit)
+        else:
+            github_repository.checkout_source_code_version(version_commit)
+        changed_files = github_repository.get_changed_files(resolved_version["previous_commit"], version_commit)
+        checkout_report = github_repository.last_checkout_report or {}
+        return {
+            "files_changed": len(changed_files),
+            "files_written": checkout_report.get("files"),
+            "bytes_written": checkout_report.get("bytes"),
+        }
+
+    def _switch_version(self, context: dict) -> None:
+        resolved_version = context["resolve"]
+        version_tag = resolved_version["version_tag"]
+        version_commit = resolved_version["version_commit"]
+
+        worktree_deployer = resolved_version["worktree_deployer"]
+        if worktree_deployer:
+            worktree_deployer.switch(self._get_release_path(context))
+            worktree_deployer.prune()
+        resolved_version["deployment_state"].update(version=version_tag, commit=version_commit)
         self._log_change(
             f"Se actualizo a la version {version_tag} - commit {version_commit}\n\n"
         )
 
+    def _get_release_path(self, context: dict) -> Path:
+        # in worktree mode the dependencies are installed from the new release before it goes live
+        resolved_version = context["resolve"]
+        worktree_deployer = resolved_version["worktree_deployer"]
+        if not worktree_deployer:
+            return Path(context["config"]["local_repository_path"])
+        return worktree_deployer.get_release_path(resolved_version["version_commit"])
+
+    def _build_changelog(self, context: dict) -> ReleaseChangelog | None:
+        resolved_version = context["resolve"]
+        previous_commit = resolved_version["previous_commit"]
+        version_commit = resolved_version["version_commit"]
+        if previous_commit is None:
+            return None
+
+        def build() -> ReleaseChangelog:
+            log_lines = resolved_version["github_repository"].iter_log_lines(previous_commit, version_commit)
+            return build_changelog(previous_commit, version_commit, log_lines, self.max_changelog_commits)
+
+        if self.changelog_cache:
+            return self.changelog_cache.get_or_build(previous_commit, version_commit, build)
+        return build()
+
+    def _get_github_repository(self, version_control_data: VersionControlConfigs) -> GithubRepository:
+        # the handles are kept between checks, so the github clients and the git processes stay warm
+        key = repr([version_control_data.get(config_key) for config_key in self.github_repository_config_keys])
+        with self._github_repositories_lock:
+            if key not in self._github_repositories:
+                self._github_repositories[key] = self._build_github_repository(version_control_data)
+            return self._github_repositories[key]
+
+    def _build_github_repository(self, version_control_data: VersionControlConfigs) -> GithubRepository:
+        worktree_deployer = self._get_worktree_deployer(version_control_data)
+        return GithubRepository(
+            version_control_data["token"],
+            self.organization_name,
+            worktree_deployer.repository_path if worktree_deployer else version_control_data["local_repository_path"],
+            self.repository_name,
+            ref_resolver=version_control_data.get("ref_resolver", GithubRepository.REF_RESOLVER_API),
+            response_cache=self.response_cache,
+            client_pool=self.client_pool,
+            fetch_strategy=version_control_data.get("fetch_strategy", GithubRepository.FETCH_STRATEGY_FULL),
+            fetch_depth=version_control_data.get("fetch_depth"),
+            fetch_filter=version_control_data.get("fetch_filter"),
+            object_store=self.object_store,
+            repository_url=version_control_data.get("repository_url"),
+            live_path=version_control_data["local_repository_path"] if worktree_deployer else None,
+            sparse_checkout_paths=version_control_data.get("sparse_checkout_paths"),
+            release_index=self.release_index,
+        )
+
+    def _get_worktree_deployer(self, version_control_data: VersionControlConfigs) -> WorktreeDeployer | None:
+        if version_control_data.get("deploy_mode", self.DEPLOY_MODE_IN_PLACE) != self.DEPLOY_MODE_WORKTREE:
+            return None
+        return WorktreeDeployer(
+            version_control_data["local_repository_path"],
+            keep_releases=version_control_data.get("keep_releases", WorktreeDeployer.default_keep_releases),
+        )
+
     def _log_change(self, change: str) -> None:
         self.changes_made.append(change)
 
-    def _install_dependencies_from_requirements(self) -> None:
+    def _plan_dependencies(self, context: dict) -> DependenciesPlan | None:
+        resolved_version = context["resolve"]
+        github_repository = resolved_version["github_repository"]
+        deployment_state = resolved_version["deployment_state"]
+
+        new_requirements = github_repository.read_file(resolved_version["version_commit"], self.requirements_path)
+        if new_requirements is None:
+            if self.environment_store is None:
+                return None
+            new_requirements = ""
+
+        dependencies_plan = DependenciesPlan(
+            requirements=new_requirements,
+            requirements_hash=get_requirements_hash(new_requirements),
+            pip_arguments=[],
+        )
+        if self.environment_store:
+            return dependencies_plan
+
+        installed_requirements_hash = deployment_state.get("requirements_hash")
+        if installed_requirements_hash == dependencies_plan["requirements_hash"]:
+            return None
+
+        old_requirements = github_repository.read_file(resolved_version["previous_commit"], self.requirements_path)
+        if old_requirements == new_requirements and installed_requirements_hash is None:
+            deployment_state.update(requirements_hash=dependencies_plan["requirements_hash"])
+            return None
+
+        requirements_path = self._get_release_path(context) / self.requirements_path
+        if (
+            old_requirements is None
+            or installed_requirements_hash != get_requirements_hash(old_requirements)
+        ):
+            dependencies_plan["pip_arguments"] = [["install", "-r", str(requirements_path)]]
+        else:
+            dependencies_plan["pip_arguments"] = self._get_incremental_pip_arguments(
+                diff_requirements(old_requirements, new_requirements),
+                requirements_path,
+            )
+        return dependencies_plan
+
+    def _download_wheels(self, context: dict) -> bool:
+        dependencies_plan = context["plan_dependencies"]
+        if not self.prefetch_wheels or not dependencies_plan:
+            return False
+
+        self.wheels_path.mkdir(parents=True, exist_ok=True)
+        requirements_path = self.wheels_path / f"requirements-{dependencies_plan['requirements_hash']}.txt"
+        requirements_path.write_text(dependencies_plan["requirements"])
+        for pip_arguments in dependencies_plan["pip_arguments"]:
+            if pip_arguments[0] != "install":
+                continue
+            requirements_to_download = ["-r", str(requirements_path)] if "-r" in pip_arguments else pip_arguments[1:]
+            self._run_pip(["download", "--dest", str(self.wheels_path), *requirements_to_download])
+        return True
+
+    def _install_dependencies(self, context: dict) -> int:
+        dependencies_plan = context["plan_dependencies"]
+        if not dependencies_plan:
+            return 0
+
+        find_links_arguments = ["--find-links", str(self.wheels_path)] if context.get("prefetch_dependencies") else []
+        for pip_arguments in dependencies_plan["pip_arguments"]:
+            if pip_arguments[0] == "install":
+                pip_arguments = [*pip_arguments, *find_links_arguments]
+            self._run_pip(pip_arguments, timeout_seconds=self.update_pipeline.get_remaining_seconds("dependencies"))
+        context["resolve"]["deployment_state"].update(requirements_hash=dependencies_plan["requirements_hash"])
+        return len(dependencies_plan["pip_arguments"])
+
+    def _build_environment(self, context: dict) -> Path:
+        return self.environment_store.get_or_build(context["plan_dependencies"]["requirements"])
+
+    def _activate_environment(self, context: dict) -> None:
+        environment_path = context["dependencies"]
+        environment_link_path = self._get_environment_link_path(context["config"])
+        self.environment_store.activate(environment_path, environment_link_path)
+        context["resolve"]["deployment_state"].update(
+            requirements_hash=context["plan_dependencies"]["requirements_hash"],
+            environment=str(environment_path),
+        )
+
+    @staticmethod
+    def _get_environment_link_path(version_control_data: VersionControlConfigs) -> Path:
+        if version_control_data.get("environment_path"):
+            return Path(version_control_data["environment_path"])
+        local_repository_path = Path(version_control_data["local_repository_path"]).absolute()
+        return local_repository_path.parent / f".{local_repository_path.name}.venv"
+
+    def _get_incremental_pip_arguments(self, requirements_diff: RequirementsDiff, requirements_path: Path) -> list:
+        if requirements_diff["options_changed"]:
+            return [["install", "-r", str(requirements_path)]]
+
+        pip_arguments = []
+        requirements_to_install = requirements_diff["added"] + requirements_diff["changed"]
+        if requirements_to_install:
+            pip_arguments.append(["install", *requirements_to_install])
+        if self.uninstall_removed_requirements and requirements_diff["removed"]:
+            pip_arguments.append(["uninstall", "--yes", *requirements_diff["removed"]])
+        return pip_arguments
+
+    def _run_pip(self, pip_arguments: list[str], timeout_seconds: float | None = None) -> None:
+        pip_command = [*self.pip_command, *pip_arguments]
+        success_message, error_message = self.pip_messages[pip_arguments[0]]
         try:
-            subprocess.check_call(["pip", "install", "-r", self.requirements_path])
-            print("Dependencias instaladas con éxito.")
+            return_code = self._run_command(pip_command, timeout_seconds)
+            if return_code:
+                raise subprocess.CalledProcessError(return_code, pip_command)
         except subprocess.CalledProcessError:
-            print("Hubo un error al instalar las dependencias.")
-            traceback.print_exc()
-        except Exception as e:
-            print(f"Ocurrió un error inesperado: {e}")
-            traceback.print_exc()
+            print(error_message)
+            raise
+        print(success_message)
+
+    @staticmethod
+    def _run_command(command: str | list[str], timeout_seconds: float | None = None, **kwargs) -> int:
+        # the command gets its own process group, so a timeout also stops the processes it started, like the
+        # command run by the shell or the builds run by pip
+        with subprocess.Popen(command, start_new_session=True, **kwargs) as process:
+            try:
+                return process.wait(timeout=timeout_seconds)
+            except BaseException:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+                raise
+
+    def _get_rate_limit_remaining(self, context: dict) -> int | None:
+        return self._get_github_repository(context["config"]).get_rate_limit_remaining()
+
+    def _record_metrics(self, duration_seconds: float) -> UpdateMetrics:
+        context = self.update_pipeline.context
+        results = self.update_pipeline.results
+        version_control_data = context.get("config") or {}
+        installation = Path(version_control_data.get("local_repository_path", "unknown")).name
+
+        update_metrics = UpdateMetrics(installation)
+        update_metrics.set_duration("total", duration_seconds)
+        for name, result in results.items():
+            update_metrics.set_status(name, result["status"])
+            if result["duration_seconds"] is not None:
+                update_metrics.set_duration(name, result["duration_seconds"])
+
+        update_metrics.set_value("updated", int(results["checkout"]["status"] == UpdatePipeline.STATUS_SUCCEEDED))
+        checkout = context.get("checkout") or {}
+        update_metrics.set_value("checkout_files_changed", checkout.get("files_changed"))
+        update_metrics.set_value("checkout_files_written", checkout.get("files_written"))
+        update_metrics.set_value("checkout_bytes_written", checkout.get("bytes_written"))
+        update_metrics.set_value("changelog_commits", (context.get("changelog") or {}).get("commits_count"))
+        if not self.environment_store:
+            update_metrics.set_value("dependencies_pip_commands", context.get("dependencies"))
+
+        resolved_version = context.get("resolve")
+        if resolved_version:
+            github_repository = resolved_version["github_repository"]
+            update_metrics.set_value("github_api_calls", github_repository.api_calls_count)
+            if github_repository.last_fetch_report:
+                update_metrics.set_value("fetch_objects", github_repository.last_fetch_report["objects"])
+                update_metrics.set_value("fetch_bytes", github_repository.last_fetch_report["bytes"])
+        if self.response_cache:
+            update_metrics.set_value("response_cache_hits", self.response_cache.hits_count)
+        if "rate_limit_before" in results and version_control_data:
+            update_metrics.set_value("github_rate_limit_remaining_before", context.get("rate_limit_before"))
+            update_metrics.set_value(
+                "github_rate_limit_remaining_after",
+                self._get_github_repository(version_control_data).get_rate_limit_remaining(),
+            )
+
+        self.last_update_metrics = update_metrics
+        update_metrics.append_json_record(self.metrics_directory / "app_updater_runs.jsonl")
+        update_metrics.write_prometheus_textfile(self.metrics_directory / f"app_updater_{installation}.prom")
+        return update_metrics
+
+    def _run_health_check(self, context: dict) -> bool | None:
+        version_control_data = context["config"]
+        health_check_command = version_control_data.get("health_check_command")
+        if not health_check_command:
+            return None
+
+        try:
+            return_code = self._run_command(
+                health_check_command,
+                version_control_data.get("health_check_timeout_seconds", self.default_health_check_timeout_seconds),
+                shell=True,
+                cwd=version_control_data["local_repository_path"],
+            )
+            error = None if return_code == 0 else f"exit code {return_code}"
+        except subprocess.TimeoutExpired as e:
+            error = f"timed out after {e.timeout} seconds"
+        if error is None:
+            return True
+
+        resolved_version = context["resolve"]
+        rejected_release = {"version": resolved_version["version_tag"], "commit": resolved_version["version_commit"]}
+        resolved_version["deployment_state"].update(rejected_release=rejected_release)
+        previous_release = resolved_version["previous_release"]
+        if previous_release.get("commit"):
+            self._restore_release(version_control_data, previous_release)
+        raise HealthCheckError(f"The health check of {version_control_data['version']} failed - {error}")
+
+    def _record_release(self, context: dict) -> list[dict]:
+        resolved_version = context["resolve"]
+        deployment_state = resolved_version["deployment_state"]
+        release = self._get_current_release(
+            deployment_state, resolved_version["worktree_deployer"], resolved_version["version_commit"]
+        )
+        release["deployed_at"] = time.time()
+
+        history = deployment_state.get("history") or []
+        previous_release = resolved_version["previous_release"]
+        if not history and previous_release.get("commit"):
+            history = [previous_release]
+        history = [release, *(entry for entry in history if entry.get("commit") != release["commit"])]
+        history = history[:self.max_release_history]
+        deployment_state.update(deployed_at=release["deployed_at"], history=history)
+        return history
+
+    def _get_current_release(
+        self,
+        deployment_state: DeploymentState,
+        worktree_deployer: WorktreeDeployer | None,
+        commit: str | None,
+    ) -> dict:
+        state = deployment_state.read()
+        release = {key: state.get(key) for key in self.release_keys}
+        release["commit"] = state.get("commit") or commit
+        live_release_path = worktree_deployer.get_live_release_path() if worktree_deployer else None
+        release["release_path"] = str(live_release_path) if live_release_path else None
+        release["deployed_at"] = state.get("deployed_at")
+        return release
+
+    def rollback(self, version_control_data: VersionControlConfigs | None = None, commit: str | None = None) -> dict:
+        if version_control_data is None:
+            version_control_data = self.version_control_provider.get_config()
+        deployment_state = DeploymentState.for_installation(version_control_data["local_repository_path"])
+        current_commit = deployment_state.get("commit")
+
+        for release in deployment_state.get("history") or []:
+            is_target = release["commit"].startswith(commit) if commit else release["commit"] != current_commit
+            if is_target:
+                # the release is rejected first, so a restore that fails halfway is not redeployed either
+                deployment_state.update(
+                    rejected_release={"version": version_control_data.get("version"), "commit": current_commit},
+                )
+                self._restore_release(version_control_data, release)
+                return release
+        raise ValueError(f"There is no deployed release to roll back to{f' with commit {commit}' if commit else ''}")
+
+    def _restore_release(self, version_control_data: VersionControlConfigs, release: dict) -> None:
+        github_repository = self._get_github_repository(version_control_data)
+        worktree_deployer = self._get_worktree_deployer(version_control_data)
+        deployment_state = DeploymentState.for_installation(version_control_data["local_repository_path"])
+        installed_requirements_hash = deployment_state.get("requirements_hash")
+
+        if (
+            not self.environment_store
+            and release.get("requirements_hash")
+            and release["requirements_hash"] != installed_requirements_hash
+        ):
+            # the dependencies are installed before the checkout, so a failed install leaves the code untouched
+            self._install_release_requirements(github_repository, release)
+
+        release_path = Path(release["release_path"]) if release.get("release_path") else None
+        if worktree_deployer:
+            if release_path is None or not release_path.exists():
+                release_path = github_repository.checkout_worktree(worktree_deployer, release["commit"])
+            worktree_deployer.switch(release_path)
+        else:
+            github_repository.checkout_source_code_version(release["commit"])
+
+        if self.environment_store:
+            environment_path = Path(release["environment"]) if release.get("environment") else None
+            if environment_path is None or not environment_path.exists():
+                # the environment of the release may have been evicted from the store since it was deployed
+                requirements = github_repository.read_file(release["commit"], self.requirements_path) or ""
+                environment_path = self.environment_store.get_or_build(requirements)
+                release = release | {
+                    "requirements_hash": get_requirements_hash(requirements),
+                    "environment": str(environment_path),
+                }
+            self.environment_store.activate(environment_path, self._get_environment_link_path(version_control_data))
+
+        deployment_state.update(**{key: release.get(key) for key in self.release_keys})
+        self._log_change(f"Se revirtio a la version {release.get('version')} - commit {release['commit']}\n\n")
+
+    def _install_release_requirements(self, github_repository: GithubRepository, release: dict) -> None:
+        self.wheels_path.mkdir(parents=True, exist_ok=True)
+        requirements_path = self.wheels_path / f"requirements-{release['requirements_hash']}.txt"
+        requirements_path.write_text(github_repository.read_file(release["commit"], self.requirements_path) or "")
+        pip_arguments = ["--find-links", str(self.wheels_path), "-r", str(requirements_path)]
+        try:
+            self._run_pip(["install", "--no-index", *pip_arguments])
+        except subprocess.CalledProcessError:
+            # the wheels of an older release may never have been downloaded, so they come from the index
+            self._run_pip(["install", *pip_arguments])
+
+    def _plan_migrations(self, context: dict) -> MigrationPlan | None:
+        if not context["config"].get("migration_command"):
+            return None
+        resolved_version = context["resolve"]
+        github_repository = resolved_version["github_repository"]
+        version_commit = resolved_version["version_commit"]
+
+        # the state keeps the last commit migrated, so the no-op check retries a failed run and a repeated
+        # one is free
+        migrated_commit = resolved_version["deployment_state"].get("migrations")
+        if migrated_commit == version_commit:
+            return None
+        changed_files = None
+        if migrated_commit and github_repository.has_commit(migrated_commit):
+            changed_files = github_repository.get_changed_files(migrated_commit, version_commit)
+        migration_plan = plan_migrations(changed_files, self.migration_file_patterns, self.schema_file_patterns)
+        if migration_plan is None:
+            resolved_version["deployment_state"].update(migrations=version_commit)
+        return migration_plan
+
+    def prefetch_releases(self, version_control_data: VersionControlConfigs | None = None) -> list[PrefetchedRelease]:
+        if version_control_data is None:
+            version_control_data = self.version_control_provider.get_config()
+        github_repository = self._get_github_repository(version_control_data)
+        if github_repository.get_local_head_commit() is None:
+            return []
+
+        deployment_state = DeploymentState.for_installation(version_control_data["local_repository_path"])
+        version_tags = self._get_prefetch_version_tags(version_control_data, github_repository)
+        prefetched_releases = {
+            version_tag: release
+            for version_tag, release in (deployment_state.get("prefetched_releases") or {}).items()
+            if version_tag in version_tags
+        }
+        max_bytes_per_second = version_control_data.get("prefetch_max_bytes_per_second")
+        max_disk_bytes = version_control_data.get("prefetch_max_disk_bytes")
+
+        new_prefetched_releases = []
+        started_at = time.monotonic()
+        downloaded_bytes = 0
+        for version_tag in version_tags:
+            try:
+                version_commit = github_repository.get_commit_sha_of_version_tag(version_tag)
+                version_commit = github_repository.peel_commit(version_commit)
+            except Exception as e:
+                print(f"No se pudo resolver la version {version_tag} para precargarla: {e}")
+                continue
+            prefetched_release = prefetched_releases.get(version_tag)
+            if github_repository.is_at_commit(version_commit) or (
+                prefetched_release
+                and prefetched_release["commit"] == version_commit
+                and github_repository.has_commit(version_commit)
+            ):
+                continue
+            if max_disk_bytes is not None and sum(
+                release["bytes"] for release in prefetched_releases.values()
+            ) >= max_disk_bytes:
+                print(f"Se omitio la precarga de {version_tag}, se alcanzo el limite de disco.")
+                break
+            # git can not throttle a single fetch, so the average rate is kept by waiting between releases
+            if max_bytes_per_second:
+                wait_seconds = downloaded_bytes / max_bytes_per_second - (time.monotonic() - started_at)
+                if wait_seconds > 0:
+                    time.sleep(wait_seconds)
+
+            prefetched_release = self._prefetch_release(github_repository, version_tag, version_commit)
+            downloaded_bytes += prefetched_release["bytes"]
+            prefetched_releases[version_tag] = prefetched_release
+            new_prefetched_releases.append(prefetched_release)
+            deployment_state.update(prefetched_releases=prefetched_releases)
+
+        github_repository.prune_prefetched_tags(version_tags)
+        deployment_state.update(prefetched_releases=prefetched_releases)
+        return new_prefetched_releases
+
+    def _get_prefetch_version_tags(
+        self,
+        version_control_data: VersionControlConfigs,
+        github_repository: GithubRepository,
+    ) -> list[str]:
+        version_tags = []
+        for version_tag in version_control_data.get("prefetch_tags") or []:
+            if version_tag == self.PREFETCH_LATEST_RELEASE:
+                try:
+                    version_tag = github_repository.last_release
+                except Exception as e:
+                    print(f"No se pudo obtener la ultima version para precargarla: {e}")
+                    continue
+            if version_tag not in version_tags:
+                version_tags.append(version_tag)
+        return version_tags
+
+    def _prefetch_release(
+        self,
+        github_repository: GithubRepository,
+        version_tag: str,
+        version_commit: str,
+    ) -> PrefetchedRelease:
+        fetch_report = github_repository.prefetch_version_tag(version_tag)
+        prefetched_release = PrefetchedRelease(
+            version=version_tag,
+            commit=github_repository.resolve_commit(version_commit),
+            requirements_hash=None,
+            bytes=fetch_report["bytes"],
+            prefetched_at=time.time(),
+        )
+        requirements = github_repository.read_file(version_commit, self.requirements_path)
+        if requirements is None:
+            return prefetched_release
+
+        prefetched_release["requirements_hash"] = get_requirements_hash(requirements)
+        if self.environment_store:
+            environment_path = self.environment_store.get_environment_path(prefetched_release["requirements_hash"])
+            bytes_before = self._get_directory_bytes(environment_path)
+            self.environment_store.get_or_build(requirements)
+            prefetched_release["bytes"] += self._get_directory_bytes(environment_path) - bytes_before
+        elif self.prefetch_wheels:
+            bytes_before = self._get_directory_bytes(self.wheels_path)
+            self.wheels_path.mkdir(parents=True, exist_ok=True)
+            requirements_path = self.wheels_path / f"requirements-{prefetched_release['requirements_hash']}.txt"
+            requirements_path.write_text(requirements)
+            try:
+                self._run_pip(["download", "--dest", str(self.wheels_path), "-r", str(requirements_path)])
+            except subprocess.CalledProcessError:
+                print(f"No se pudieron precargar las dependencias de {version_tag}.")
+            prefetched_release["bytes"] += self._get_directory_bytes(self.wheels_path) - bytes_before
+        return prefetched_release
+
+    @staticmethod
+    def _get_directory_bytes(path: Path) -> int:
+        if not path.exists():
+            return 0
+        return sum(file_path.stat().st_size for file_path in path.rglob("*") if file_path.is_file())
+
+    def _run_database_migration(self, context: dict) -> list[str] | None:
+        migration_plan = context["plan_migrations"]
+        if migration_plan is None:
+            return None
+
+        version_control_data = context["config"]
+        apps = migration_plan["apps"]
+        if apps is not None and len(apps) > self.max_narrowed_migration_apps:
+            apps = None
+        for app_arguments in ([""] if apps is None else [f" {shlex.quote(app)}" for app in apps]):
+            migration_command = f"{version_control_data['migration_command']}{app_arguments}"
+            return_code = self._run_command(
+                migration_command,
+                self.update_pipeline.get_remaining_seconds("migrations"),
+                shell=True,
+                cwd=version_control_data["local_repository_path"],
+            )
+            if return_code:
+                raise subprocess.CalledProcessError(return_code, migration_command)
+
+        context["resolve"]["deployment_state"].update(migrations=context["resolve"]["version_commit"])
+        self._log_change(f"Se aplicaron las migraciones de {', '.join(apps) if apps else 'todas las apps'}\n\n")
+        return apps or []
+
+    def _send_email_with_resume_of_changes(self, context: dict) -> None:
+        developers = getattr(self, "developers", ())
+        if not developers:
+            return
 
-    def _send_email_with_resume_of_changes(self):
-        changes_made = self.changes_made
+        changes_made = "".join(self.changes_made) + format_changelog(context.get("changelog"))
 
-        email_sender = EmailSender()
+        if self.email_sender:
+            self.email_sender.send_email_in_background(developers, "actualizacion Core", changes_made)
+            return
 
-        for user_target in self.developers:
-            email_sender.send_email(user_target, "actualizacion Core", changes_made)
+        with EmailSender(self.user_mail, self.password_mail) as email_sender:
+            email_sender.send_email(developers, "actualizacion Core", changes_made)
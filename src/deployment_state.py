@@ -0,0 +1,43 @@
+from pathlib import Path
+import threading
+
+from src.file_utils import file_lock, write_atomically
+from src.lazy_imports import lazy_import
+
+yaml = lazy_import("yaml")
+
+
+class DeploymentState:
+    file_name_template = ".{installation_name}.version.yaml"
+
+    _update_lock = threading.Lock()
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+
+    @classmethod
+    def for_installation(cls, local_repository_path: Path) -> "DeploymentState":
+        local_repository_path = Path(local_repository_path).absolute()
+        file_name = cls.file_name_template.format(installation_name=local_repository_path.name)
+        return cls(local_repository_path.parent / file_name)
+
+    def read(self) -> dict:
+        try:
+            with open(self.path, "rb") as file:
+                return yaml.safe_load(file.read()) or {}
+        except FileNotFoundError:
+            return {}
+
+    def get(self, key: str, default=None):
+        return self.read().get(key, default)
+
+    @property
+    def lock_path(self) -> Path:
+        return self.path.with_name(f"{self.path.name}.lock")
+
+    def update(self, **values) -> dict:
+        # the pipeline stages update the state concurrently, and the daemon and the cli can run at the same time
+        with self._update_lock, file_lock(self.lock_path):
+            state = self.read() | values
+            write_atomically(self.path, yaml.safe_dump(state))
+        return state
@@ -1,27 +1,142 @@
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+import queue
+import threading
+import time
+
+from src.lazy_imports import lazy_import
+
+smtplib = lazy_import("smtplib")
+ssl = lazy_import("ssl")
 
 
 class EmailSender:
+    default_host = 'smtp.gmail.com'
+    default_port = 587
+    max_recipients_per_message = 50
+    max_attempts = 3
+    retry_delay_seconds = 1
+    timeout_seconds = 30
 
-    def __init__(self, user, password) -> None:
+    def __init__(
+        self,
+        user,
+        password,
+        host: str = default_host,
+        port: int = default_port,
+        use_tls: bool = True,
+    ) -> None:
         self.user = user
         self.password = password
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+
+        self.connections_count = 0
+        self.delivery_errors: list[Exception] = []
+        self._server = None
+        self._lock = threading.Lock()
+        self._queue: queue.Queue | None = None
+        self._worker: threading.Thread | None = None
+
+    def send_email(self, user_target, subject, body) -> dict:
+        user_targets = [user_target] if isinstance(user_target, str) else list(user_target)
+        refused_recipients = {}
+        for start in range(0, len(user_targets), self.max_recipients_per_message):
+            recipients = user_targets[start:start + self.max_recipients_per_message]
+            email_message = self._build_email_message(", ".join(recipients), subject, body)
+            refused_recipients |= self._send_with_retries(recipients, email_message)
+        return refused_recipients
+
+    def send_email_in_background(self, user_target, subject, body) -> None:
+        with self._lock:
+            if self._worker is None:
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._deliver_queued_emails, name="email-sender", daemon=True)
+                self._worker.start()
+        self._queue.put((user_target, subject, body))
+
+    def wait_for_delivery(self) -> None:
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_server()
 
-    def send_email(self, user_target, subject, body):
+    def __enter__(self) -> "EmailSender":
+        return self
 
-        server = self._get_email_server()
-        email_message = self._build_email_message(user_target, subject, body)
-        self._send_email(server, user_target, email_message)
-        server.quit()
+    def __exit__(self, *exc_info) -> None:
+        self.wait_for_delivery()
+        self.close()
 
-    def _get_email_server(self):
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.login(self.user, self.password)
+    def _deliver_queued_emails(self) -> None:
+        while True:
+            user_target, subject, body = self._queue.get()
+            try:
+                self.send_email(user_target, subject, body)
+            except Exception as e:
+                self.delivery_errors.append(e)
+            finally:
+                if self._queue.unfinished_tasks == 1:
+                    self.close()
+                self._queue.task_done()
+
+    def _send_with_retries(self, recipients: list[str], email_message: str) -> dict:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with self._lock:
+                    server = self._get_email_server()
+                    return self._send_email(server, recipients, email_message)
+            except Exception as e:
+                if not self._is_transient_error(e) or attempt == self.max_attempts:
+                    raise
+                with self._lock:
+                    self._close_server()
+                time.sleep(self.retry_delay_seconds * attempt)
+
+    def _get_email_server(self) -> "smtplib.SMTP":
+        if self._server is not None:
+            return self._server
+
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout_seconds)
+        try:
+            server.ehlo()
+            if self.use_tls:
+                server.starttls(context=ssl.create_default_context())
+                server.ehlo()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except BaseException:
+            server.close()
+            raise
+        self._server = server
+        self.connections_count += 1
         return server
 
+    def _close_server(self) -> None:
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            self._server.close()
+        self._server = None
+
+    @staticmethod
+    def _is_transient_error(error: Exception) -> bool:
+        # smtplib errors are OSErrors too, but only a lost connection or a 4xx reply can succeed on a retry
+        if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+            return True
+        if isinstance(error, smtplib.SMTPResponseException):
+            return 400 <= error.smtp_code < 500
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return all(400 <= smtp_code < 500 for smtp_code, _ in error.recipients.values())
+        return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
     def _build_email_message(self, user_target: str, subject: str, body: str) -> str:
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+
         email_message = MIMEMultipart()
 
         email_message['From'] = self.user
@@ -34,6 +149,5 @@ class EmailSender:
 
         return email_message
 
-    def _send_email(self, server, user_target, email_message):
-        server.starttls()
-        server.sendmail(self.user, user_target, email_message)
+    def _send_email(self, server, user_target, email_message) -> dict:
+        return server.sendmail(self.user, user_target, email_message)
@@ -0,0 +1,111 @@
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+
+from src.file_utils import file_lock, replace_symlink
+from src.requirements_diff import get_requirements_hash
+
+
+class EnvironmentStore:
+    default_directory = Path.home() / ".cache" / "app_updater" / "environments"
+    default_max_environments = 5
+    complete_marker_name = ".complete"
+    links_file_name = "links"
+
+    def __init__(
+        self,
+        directory: Path = default_directory,
+        max_environments: int = default_max_environments,
+        python_executable: str = sys.executable,
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_environments = max_environments
+        self.python_executable = python_executable
+
+    def get_environment_path(self, requirements_hash: str) -> Path:
+        return self.directory / requirements_hash
+
+    def get_or_build(self, requirements: str) -> Path:
+        requirements_hash = get_requirements_hash(requirements)
+        environment_path = self.get_environment_path(requirements_hash)
+        if self._is_complete(environment_path):
+            self._mark_as_used(environment_path)
+            return environment_path
+
+        with self._lock(requirements_hash):
+            if self._is_complete(environment_path):
+                self._mark_as_used(environment_path)
+                return environment_path
+
+            # environments are built in place because venv scripts embed their absolute path,
+            # the complete marker is what makes them visible to other processes
+            shutil.rmtree(environment_path, ignore_errors=True)
+            try:
+                environment_path.mkdir(parents=True)
+                requirements_path = environment_path / "requirements.txt"
+                requirements_path.write_text(requirements)
+                self._build_environment(environment_path, requirements_path)
+            except BaseException:
+                shutil.rmtree(environment_path, ignore_errors=True)
+                raise
+            (environment_path / self.complete_marker_name).touch()
+
+        self._mark_as_used(environment_path)
+        return environment_path
+
+    def activate(self, environment_path: Path, link_path: Path) -> None:
+        link_path = Path(link_path).absolute()
+        replace_symlink(environment_path, link_path)
+
+        self._register_link(link_path)
+        self._mark_as_used(environment_path)
+        self.evict()
+
+    def evict(self) -> list[Path]:
+        active_environment_paths = {
+            link_path.resolve() for link_path in self._get_links() if link_path.is_symlink()
+        }
+        environment_paths = sorted(
+            (path for path in self.directory.iterdir() if self._is_complete(path)),
+            key=lambda path: (path / self.complete_marker_name).stat().st_mtime,
+            reverse=True,
+        )
+
+        evicted_environment_paths = []
+        for environment_path in environment_paths[self.max_environments:]:
+            if environment_path.resolve() in active_environment_paths:
+                continue
+            with self._lock(environment_path.name):
+                shutil.rmtree(environment_path, ignore_errors=True)
+            evicted_environment_paths.append(environment_path)
+        return evicted_environment_paths
+
+    def _build_environment(self, environment_path: Path, requirements_path: Path) -> None:
+        subprocess.check_call([self.python_executable, "-m", "venv", str(environment_path)])
+        subprocess.check_call([
+            str(environment_path / "bin" / "python"), "-m", "pip", "install", "--quiet", "-r", str(requirements_path),
+        ])
+
+    def _is_complete(self, environment_path: Path) -> bool:
+        return (environment_path / self.complete_marker_name).exists()
+
+    def _mark_as_used(self, environment_path: Path) -> None:
+        (Path(environment_path) / self.complete_marker_name).touch()
+
+    def _get_links(self) -> list[Path]:
+        links_path = self.directory / self.links_file_name
+        if not links_path.exists():
+            return []
+        return [Path(line) for line in links_path.read_text().splitlines() if line]
+
+    def _register_link(self, link_path: Path) -> None:
+        with self._lock(self.links_file_name):
+            links = self._get_links()
+            if link_path not in links:
+                (self.directory / self.links_file_name).write_text(
+                    "".join(f"{link}\n" for link in [*links, link_path])
+                )
+
+    def _lock(self, name: str):
+        return file_lock(self.directory / f".{name}.lock")
@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+import fcntl
+import os
+from pathlib import Path
+import threading
+from typing import Iterator
+
+
+def get_temporal_path(path: Path, suffix: str = ".tmp") -> Path:
+    path = Path(path)
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}{suffix}")
+
+
+def write_atomically(path: Path, content: str, mode: int = 0o666) -> None:
+    # readers see either the previous or the new content, and the mode is set before anything is written
+    path = Path(path)
+    temporal_path = get_temporal_path(path)
+    try:
+        with open(os.open(temporal_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode), "w") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporal_path, path)
+    except BaseException:
+        temporal_path.unlink(missing_ok=True)
+        raise
+
+
+def replace_symlink(target_path: Path, link_path: Path) -> None:
+    link_path = Path(link_path)
+    temporal_link_path = get_temporal_path(link_path, ".link")
+    temporal_link_path.unlink(missing_ok=True)
+    os.symlink(Path(target_path).absolute(), temporal_link_path, target_is_directory=True)
+    os.replace(temporal_link_path, link_path)
+
+
+@contextmanager
+def file_lock(lock_path: Path) -> Iterator[None]:
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
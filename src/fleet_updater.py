@@ -0,0 +1,157 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import threading
+import time
+import traceback
+from typing import NotRequired, TypedDict
+
+from src.app_updater import AppUpdater
+from src.environment_store import EnvironmentStore
+from src.github_repository import GithubClientPool
+from src.lazy_imports import lazy_import
+from src.object_store import SharedObjectStore
+from src.release_changelog import ChangelogCache
+from src.release_index import ReleaseIndex
+from src.response_cache import ResponseCache
+from src.version_control_provider import (
+    CoreConfigProvider,
+    StaticConfigProvider,
+    VersionControlConfigs,
+    VersionControlProvider,
+)
+
+yaml = lazy_import("yaml")
+
+
+class FleetTarget(TypedDict):
+    name: str
+    version_control_provider: NotRequired[VersionControlProvider]
+    config: NotRequired[VersionControlConfigs]
+
+
+class FleetTargetResult(TypedDict):
+    name: str
+    status: str
+    changes_made: list[str]
+    error: str | None
+    duration_seconds: float
+
+
+class FleetReport(TypedDict):
+    results: list[FleetTargetResult]
+    updated_count: int
+    unchanged_count: int
+    failed_count: int
+    duration_seconds: float
+
+
+class FleetUpdater:
+    STATUS_UPDATED = "updated"
+    STATUS_UNCHANGED = "unchanged"
+    STATUS_FAILED = "failed"
+
+    default_max_workers = 4
+
+    def __init__(
+        self,
+        targets: list[FleetTarget],
+        max_workers: int = default_max_workers,
+        response_cache: ResponseCache | None = None,
+        client_pool: GithubClientPool | None = None,
+        object_store: SharedObjectStore | None = None,
+        environment_store: EnvironmentStore | None = None,
+        metrics_directory: Path | None = None,
+        changelog_cache: ChangelogCache | None = None,
+        release_index: ReleaseIndex | None = None,
+    ) -> None:
+        self.targets = targets
+        self.max_workers = max_workers
+        self.response_cache = response_cache
+        self.client_pool = client_pool or GithubClientPool()
+        self.object_store = object_store
+        self.environment_store = environment_store
+        self.metrics_directory = metrics_directory
+        self.changelog_cache = changelog_cache
+        self.release_index = release_index
+
+        self._path_locks = {}
+        self._path_locks_lock = threading.Lock()
+
+    def update_all(self) -> FleetReport:
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fleet-updater") as executor:
+            results = list(executor.map(self._update_target, self.targets))
+
+        return FleetReport(
+            results=results,
+            updated_count=sum(result["status"] == self.STATUS_UPDATED for result in results),
+            unchanged_count=sum(result["status"] == self.STATUS_UNCHANGED for result in results),
+            failed_count=sum(result["status"] == self.STATUS_FAILED for result in results),
+            duration_seconds=time.perf_counter() - started_at,
+        )
+
+    def _update_target(self, target: FleetTarget) -> FleetTargetResult:
+        started_at = time.perf_counter()
+        app_updater = None
+        try:
+            app_updater = self._get_app_updater(target)
+            version_control_data = app_updater.version_control_provider.get_config()
+            with self._get_path_lock(version_control_data["local_repository_path"]):
+                is_updated = app_updater.update_source_code_automaticaly(version_control_data)
+        except Exception as e:
+            traceback.print_exc()
+            return self._build_result(target, self.STATUS_FAILED, app_updater, started_at, error=str(e))
+        status = self.STATUS_UPDATED if is_updated else self.STATUS_UNCHANGED
+        return self._build_result(target, status, app_updater, started_at)
+
+    def _get_app_updater(self, target: FleetTarget) -> AppUpdater:
+        version_control_provider = target.get("version_control_provider")
+        if version_control_provider is None:
+            version_control_provider = StaticConfigProvider(target["config"])
+        return AppUpdater(
+            version_control_provider=version_control_provider,
+            response_cache=self.response_cache,
+            client_pool=self.client_pool,
+            object_store=self.object_store,
+            environment_store=self.environment_store,
+            metrics_directory=self.metrics_directory,
+            changelog_cache=self.changelog_cache,
+            release_index=self.release_index,
+        )
+
+    def _get_path_lock(self, local_repository_path: Path) -> threading.Lock:
+        lock_key = Path(local_repository_path).resolve()
+        with self._path_locks_lock:
+            return self._path_locks.setdefault(lock_key, threading.Lock())
+
+    @staticmethod
+    def _build_result(
+        target: FleetTarget,
+        status: str,
+        app_updater: AppUpdater | None,
+        started_at: float,
+        error: str | None = None,
+    ) -> FleetTargetResult:
+        return FleetTargetResult(
+            name=target["name"],
+            status=status,
+            changes_made=list(app_updater.changes_made) if app_updater else [],
+            error=error,
+            duration_seconds=time.perf_counter() - started_at,
+        )
+
+
+def load_fleet_targets(fleet_file_path: Path) -> list[FleetTarget]:
+    with open(fleet_file_path, "rb") as file:
+        fleet_config = yaml.safe_load(file.read())
+
+    targets = []
+    for target_config in fleet_config.get("targets", []):
+        if target_config.get("core_be_token"):
+            targets.append(FleetTarget(
+                name=target_config["name"],
+                version_control_provider=CoreConfigProvider(token=target_config["core_be_token"]),
+            ))
+        else:
+            targets.append(FleetTarget(name=target_config["name"], config=target_config))
+    return targets
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+from concurrent.futures import Future
+import json
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from src.lazy_imports import lazy_import
+
+if TYPE_CHECKING:
+    from requests import Response, Session
+
+requests = lazy_import("requests")
+
+LookupKey = tuple[str, ...]
+
+
+class RateLimitExceededError(Exception):
+    pass
+
+
+class RateLimitBudget:
+    def __init__(self, min_remaining_requests: int = 0) -> None:
+        self.min_remaining_requests = min_remaining_requests
+        self.remaining: int | None = None
+        self.reset_at: float | None = None
+
+    def update(self, headers) -> None:
+        if headers.get("X-RateLimit-Remaining") is not None:
+            self.remaining = int(headers["X-RateLimit-Remaining"])
+        if headers.get("X-RateLimit-Reset") is not None:
+            self.reset_at = float(headers["X-RateLimit-Reset"])
+
+    def reserve(self) -> float:
+        # returns the seconds to wait before the request, every reserved request is discounted right away
+        # so concurrent callers don't spend the same remaining requests
+        if self.remaining is None:
+            return 0
+        if self.remaining <= self.min_remaining_requests and self.reset_at and self.reset_at > time.time():
+            return self.reset_at - time.time()
+        if self.reset_at and self.reset_at <= time.time():
+            self.remaining = None
+            return 0
+        self.remaining -= 1
+        return 0
+
+
+class GithubApiClient:
+    RESOURCE_CORE = "core"
+    RESOURCE_GRAPHQL = "graphql"
+
+    LOOKUP_REF = "ref"
+    LOOKUP_LATEST_RELEASE = "latest_release"
+
+    default_api_base_url = "https://api.github.com"
+    min_remaining_requests = 5
+    max_wait_seconds = 60 * 60
+    max_attempts = 3
+    timeout_seconds = 30
+    batch_window_seconds = 0.01
+    max_lookups_per_query = 50
+    tags_per_query = 100
+
+    def __init__(self, token: str, api_base_url: str = default_api_base_url, session: Session | None = None) -> None:
+        self.token = token
+        self.api_base_url = api_base_url.rstrip("/")
+        self._session = session
+        self._budgets = {
+            resource: RateLimitBudget(self.min_remaining_requests)
+            for resource in (self.RESOURCE_CORE, self.RESOURCE_GRAPHQL)
+        }
+        self._lock = threading.Lock()
+        self._lookups: dict[LookupKey, Future] = {}
+        self._pending_lookups: list[LookupKey] = []
+
+        self.requests_count = 0
+        self.queries_count = 0
+        self.deduplicated_count = 0
+        self.waited_seconds = 0.0
+
+    @property
+    def session(self) -> Session:
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+            return self._session
+
+    @property
+    def graphql_url(self) -> str:
+        if self.api_base_url.endswith("/api/v3"):
+            return f"{self.api_base_url.removesuffix('/api/v3')}/api/graphql"
+        return f"{self.api_base_url}/graphql"
+
+    def get(self, url: str, headers: dict | None = None, **kwargs) -> Response:
+        return self.request("GET", url, headers=headers, **kwargs)
+
+    def request(self, method: str, url: str, resource: str = RESOURCE_CORE, **kwargs) -> Response:
+        kwargs.setdefault("timeout", self.timeout_seconds)
+        budget = self._budgets[resource]
+        for attempt in range(1, self.max_attempts + 1):
+            with self._lock:
+                wait_seconds = budget.reserve()
+            self._wait(wait_seconds)
+
+            response = self.session.request(method, url, **kwargs)
+            with self._lock:
+                self.requests_count += 1
+                budget.update(response.headers)
+            if not self._is_rate_limited(response) or attempt == self.max_attempts:
+                return response
+            self._wait(self._get_rate_limited_wait_seconds(response))
+        return response
+
+    def get_commit_sha(self, owner: str, name: str, tag: str) -> str | None:
+        return self.get_commit_shas(owner, name, [tag])[tag]
+
+    def get_commit_shas(self, owner: str, name: str, tags: list[str]) -> dict[str, str | None]:
+        futures = self._lookup([(self.LOOKUP_REF, owner, name, tag) for tag in tags])
+        return {tag: future.result() for tag, future in zip(tags, futures)}
+
+    def get_latest_release(self, owner: str, name: str) -> str | None:
+        return self._lookup([(self.LOOKUP_LATEST_RELEASE, owner, name)])[0].result()
+
+    def get_tag_objects(self, owner: str, name: str) -> dict[str, tuple[str, str]]:
+        # maps each tag to its (tag object, peeled commit) shas, a page of tags costs a single query
+        tag_objects = {}
+        cursor = None
+        while True:
+            data = self._query(
+                f"r0: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) "
+                f"{{ refs(refPrefix: \"refs/tags/\", first: {self.tags_per_query}, after: {json.dumps(cursor)}) "
+                "{ pageInfo { hasNextPage endCursor } nodes { name target { oid ... on Tag { target { oid } } } } } }"
+            )
+            refs = (data.get("r0") or {}).get("refs") or {"nodes": [], "pageInfo": {"hasNextPage": False}}
+            for node in refs["nodes"]:
+                target = node["target"]
+                tag_objects[node["name"]] = (target["oid"], (target.get("target") or target)["oid"])
+            if not refs["pageInfo"]["hasNextPage"]:
+                return tag_objects
+            cursor = refs["pageInfo"]["endCursor"]
+
+    def _lookup(self, keys: list[LookupKey]) -> list[Future]:
+        # identical lookups share the future of the one in flight, and the first caller of a batch waits a
+        # moment so the lookups of other installations are sent in the same query
+        futures = []
+        is_leader = False
+        with self._lock:
+            for key in keys:
+                future = self._lookups.get(key)
+                if future is None:
+                    future = self._lookups[key] = Future()
+                    is_leader |= not self._pending_lookups
+                    self._pending_lookups.append(key)
+                else:
+                    self.deduplicated_count += 1
+                futures.append(future)
+
+        if is_leader:
+            time.sleep(self.batch_window_seconds)
+            with self._lock:
+                batch_keys, self._pending_lookups = self._pending_lookups, []
+            self._run_batch(batch_keys)
+        return futures
+
+    def _run_batch(self, keys: list[LookupKey]) -> None:
+        for start in range(0, len(keys), self.max_lookups_per_query):
+            chunk_keys = keys[start:start + self.max_lookups_per_query]
+            try:
+                results = self._query_lookups(chunk_keys)
+            except Exception as e:
+                results = e
+            with self._lock:
+                futures = [self._lookups.pop(key) for key in chunk_keys]
+            for key, future in zip(chunk_keys, futures):
+                if isinstance(results, Exception):
+                    future.set_exception(results)
+                else:
+                    future.set_result(results.get(key))
+
+    def _query_lookups(self, keys: list[LookupKey]) -> dict[LookupKey, str | None]:
+        repository_aliases = {}
+        repository_fields = {}
+        field_keys = {}
+        for key in keys:
+            repository = key[1:3]
+            repository_alias = repository_aliases.setdefault(repository, f"r{len(repository_aliases)}")
+            fields = repository_fields.setdefault(repository_alias, [])
+            field_alias = f"f{len(fields)}"
+            if key[0] == self.LOOKUP_REF:
+                fields.append(
+                    f"{field_alias}: ref(qualifiedName: {json.dumps(f'refs/tags/{key[3]}')}) "
+                    "{ target { oid ... on Tag { target { oid } } } }"
+                )
+            else:
+                fields.append(f"{field_alias}: latestRelease {{ tagName }}")
+            field_keys[(repository_alias, field_alias)] = key
+
+        data = self._query(*(
+            f"{repository_alias}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) "
+            f"{{ {' '.join(repository_fields[repository_alias])} }}"
+            for (owner, name), repository_alias in repository_aliases.items()
+        ))
+
+        results = {}
+        for (repository_alias, field_alias), key in field_keys.items():
+            value = (data.get(repository_alias) or {}).get(field_alias)
+            if not value:
+                results[key] = None
+            elif key[0] == self.LOOKUP_REF:
+                target = value["target"]
+                results[key] = (target.get("target") or target)["oid"]
+            else:
+                results[key] = value["tagName"]
+        return results
+
+    def _query(self, *query_lines: str) -> dict:
+        query = "query {\n" + "\n".join(query_lines) + "\nrateLimit { cost remaining resetAt }\n}"
+        response = self.request(
+            "POST",
+            self.graphql_url,
+            resource=self.RESOURCE_GRAPHQL,
+            json={"query": query},
+            headers={"Authorization": f"bearer {self.token}"},
+        )
+        with self._lock:
+            self.queries_count += 1
+        if response.status_code != 200:
+            raise Exception(f"There was an error calling to github - {response.status_code} - {response.reason}")
+        return response.json().get("data") or {}
+
+    @staticmethod
+    def _is_rate_limited(response: Response) -> bool:
+        if response.status_code not in (403, 429):
+            return False
+        return response.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in response.headers
+
+    def _get_rate_limited_wait_seconds(self, response: Response) -> float:
+        if "Retry-After" in response.headers:
+            return float(response.headers["Retry-After"])
+        return max(0.0, float(response.headers.get("X-RateLimit-Reset", time.time())) - time.time())
+
+    def _wait(self, wait_seconds: float) -> None:
+        if wait_seconds <= 0:
+            return
+        if wait_seconds > self.max_wait_seconds:
+            raise RateLimitExceededError(
+                f"The github rate limit resets in {wait_seconds:.0f} seconds, more than {self.max_wait_seconds}"
+            )
+        with self._lock:
+            self.waited_seconds += wait_seconds
+        time.sleep(wait_seconds)
@@ -1,43 +1,178 @@
+from __future__ import annotations
+
+from functools import cached_property
 from pathlib import Path
+import threading
+from typing import TYPE_CHECKING, Iterator, TypedDict
 
-from github import (
-    Auth,
-    BadCredentialsException,
-    Github,
-    GitRelease,
+from src.github_api_client import GithubApiClient
+from src.lazy_imports import lazy_import
+from src.object_store import SharedObjectStore
+from src.release_changelog import LOG_FORMAT
+from src.release_index import ReleaseIndex
+from src.response_cache import ResponseCache
+from src.sparse_checkout import (
+    CheckoutReport,
+    apply_sparse_checkout,
+    get_checkout_report,
 )
-from git import Repo
+
+if TYPE_CHECKING:
+    from github import Github, GitRelease
+    from git import Repo
+
+    from src.worktree_deployer import WorktreeDeployer
+
+git = lazy_import("git")
+github = lazy_import("github")
+requests = lazy_import("requests")
+
+
+class FetchReport(TypedDict):
+    strategy: str
+    objects: int
+    bytes: int
+
+
+class GithubClientPool:
+    def __init__(self) -> None:
+        self._http_session = None
+        self._github_accounts = {}
+        self._api_clients = {}
+        self._lock = threading.Lock()
+
+    @property
+    def http_session(self) -> requests.Session:
+        with self._lock:
+            if self._http_session is None:
+                self._http_session = requests.Session()
+            return self._http_session
+
+    def get_github_account(self, token: str) -> Github:
+        with self._lock:
+            if token not in self._github_accounts:
+                self._github_accounts[token] = GithubRepository._get_github_account(token)
+            return self._github_accounts[token]
+
+    def get_api_client(self, token: str) -> GithubApiClient:
+        # the rate limit budget belongs to the token, so every installation using it shares the client
+        http_session = self.http_session
+        with self._lock:
+            if token not in self._api_clients:
+                self._api_clients[token] = GithubApiClient(
+                    token, api_base_url=GithubRepository.api_base_url, session=http_session
+                )
+            return self._api_clients[token]
 
 
 class GithubRepository:
+    REF_RESOLVER_API = "api"
+    REF_RESOLVER_REMOTE = "remote"
+    REF_RESOLVER_LOCAL = "local"
+    REF_RESOLVER_GRAPHQL = "graphql"
+
+    FETCH_STRATEGY_FULL = "full"
+    FETCH_STRATEGY_TARGET = "target"
+    FETCH_STRATEGY_PREFETCH = "prefetch"
+
+    prefetch_ref_prefix = "refs/prefetch/tags/"
+    # a new release comes with a new tag, which clears it on sync, the age covers releases of existing tags
+    max_latest_release_age_seconds = 60 * 60
+
+    git_base_url = "https://github.com"
+    api_base_url = "https://api.github.com"
+
     def __init__(
         self,
         api_token: str,
         organizacion_name: str,
         local_repository_path: Path,
         repository_name: str,
+        ref_resolver: str = REF_RESOLVER_API,
+        response_cache: ResponseCache | None = None,
+        client_pool: GithubClientPool | None = None,
+        fetch_strategy: str = FETCH_STRATEGY_FULL,
+        fetch_depth: int | None = None,
+        fetch_filter: str | None = None,
+        object_store: SharedObjectStore | None = None,
+        repository_url: str | None = None,
+        live_path: Path | None = None,
+        sparse_checkout_paths: list[str] | None = None,
+        release_index: ReleaseIndex | None = None,
     ) -> None:
         self.api_token = api_token
         self.organizacion_name = organizacion_name
         self.repository_name = repository_name
 
         self.source_code_path = local_repository_path
+        self.ref_resolver = ref_resolver
+        self.response_cache = response_cache
+        self.client_pool = client_pool
+        self.fetch_strategy = fetch_strategy
+        self.fetch_depth = fetch_depth
+        self.fetch_filter = fetch_filter
+        self.object_store = object_store
+        self._repository_url = repository_url
+        self.live_path = live_path
+        self.sparse_checkout_paths = sparse_checkout_paths
+        self.release_index = release_index
+
+        self.api_calls_count = 0
+        self.last_fetch_report: FetchReport | None = None
+        self.last_checkout_report: CheckoutReport | None = None
+        self._is_release_index_synced = False
+        self._objects_before_fetch = {"objects": 0, "bytes": 0}
+        self._is_fetched = False
+
+    @cached_property
+    def github_account(self) -> Github:
+        if self.client_pool:
+            return self.client_pool.get_github_account(self.api_token)
+        return self._get_github_account(self.api_token)
 
-        self.github_account = self._get_github_account(self.api_token)
-        self.repository = self.github_account.get_repo(
-            f"{self.organizacion_name}/{self.repository_name}"
+    @cached_property
+    def api_client(self) -> GithubApiClient:
+        if self.client_pool:
+            return self.client_pool.get_api_client(self.api_token)
+        return GithubApiClient(self.api_token, api_base_url=self.api_base_url)
+
+    @cached_property
+    def repository(self):
+        # a lazy repository makes no request, so a no-op run only spends the ref lookup
+        return self.github_account.get_repo(
+            f"{self.organizacion_name}/{self.repository_name}", lazy=True
         )
 
+    @cached_property
+    def version_info(self) -> dict:
         last_release = self._get_last_release()
         commit_sha = self._get_commit_sha_of_release(last_release)
         commit_short_sha = commit_sha[:7]
 
-        self.version_info = {
+        return {
             "last_release": last_release,
             "commit_sha": commit_sha,
             "commit_short_sha": commit_short_sha,
         }
 
+    @cached_property
+    def local_repository(self) -> Repo:
+        return git.Repo(self.source_code_path)
+
+    @cached_property
+    def remote_tag_refs(self) -> dict[str, str]:
+        if self._is_cloned():
+            raw_refs = self.local_repository.git.ls_remote("--tags", self._get_remote())
+        else:
+            raw_refs = git.Git().ls_remote("--tags", self._get_repository_url_with_token(self.repository_url))
+        return self._parse_tag_refs(raw_refs)
+
+    @property
+    def repository_url(self) -> str:
+        if self._repository_url:
+            return self._repository_url
+        return f"{self.git_base_url}/{self.organizacion_name}/{self.repository_name}.git"
+
     @property
     def last_release(self) -> str:
         return self.version_info.get("last_release")
@@ -49,40 +184,430 @@ class GithubRepository:
     @classmethod
     def _is_token_valid(cls, token: str) -> bool:
         try:
-            github = cls._get_github_account(token)
-            github.get_user().login
+            github_account = cls._get_github_account(token)
+            github_account.get_user().login
             return True
-        except BadCredentialsException:
+        except github.BadCredentialsException:
             return False
 
     @staticmethod
     def _get_github_account(token: str) -> Github:
-        auth = Auth.Token(token)
-        return Github(auth=auth)
+        auth = github.Auth.Token(token)
+        return github.Github(auth=auth, base_url=GithubRepository.api_base_url)
+
+    def _count_api_call(self) -> None:
+        self.api_calls_count += 1
 
     def _get_last_release(self) -> str:
-        latest_release = self.repository.get_latest_release()
-        return latest_release.tag_name
+        if self._uses_release_index():
+            latest_release = self.release_index.get_latest_release(
+                self.repository_url, self.max_latest_release_age_seconds
+            )
+            if latest_release:
+                return latest_release
+
+        if self.ref_resolver == self.REF_RESOLVER_GRAPHQL:
+            self._count_api_call()
+            latest_release = self.api_client.get_latest_release(self.organizacion_name, self.repository_name)
+            if latest_release is None:
+                raise ValueError(f"There is no release in {self.organizacion_name}/{self.repository_name}")
+        elif self.response_cache:
+            latest_release = self._get_cached_api_response("releases/latest")["tag_name"]
+        else:
+            self._count_api_call()
+            latest_release = self.repository.get_latest_release().tag_name
+        if self._uses_release_index():
+            self.release_index.set_latest_release(self.repository_url, latest_release)
+        return latest_release
+
+    def sync_release_index(self) -> bool:
+        if self.ref_resolver == self.REF_RESOLVER_REMOTE:
+            tag_objects = {tag: (commit_sha, commit_sha) for tag, commit_sha in self.remote_tag_refs.items()}
+        elif self.ref_resolver == self.REF_RESOLVER_GRAPHQL:
+            self._count_api_call()
+            tag_objects = self.api_client.get_tag_objects(self.organizacion_name, self.repository_name)
+        else:
+            tag_objects = self._get_api_tag_objects()
+
+        is_changed = self.release_index.replace_tags(self.repository_url, tag_objects)
+        if is_changed:
+            self.release_index.forget_latest_release(self.repository_url)
+        self._is_release_index_synced = True
+        return is_changed
+
+    def _uses_release_index(self) -> bool:
+        # the local resolver already reads the tags from the local repository
+        if not self.release_index or self.ref_resolver == self.REF_RESOLVER_LOCAL:
+            return False
+        if not self._is_release_index_synced:
+            self.sync_release_index()
+        return True
+
+    def _get_api_tag_objects(self) -> dict[str, tuple[str, str]]:
+        if self.response_cache:
+            raw_refs = [
+                (ref["ref"], ref["object"]["sha"], ref["object"]["type"])
+                for ref in self._get_cached_api_response("git/matching-refs/tags")
+            ]
+        else:
+            self._count_api_call()
+            raw_refs = [
+                (ref.ref, ref.object.sha, ref.object.type) for ref in self.repository.get_git_matching_refs("tags")
+            ]
+
+        # the annotated tags are indexed without their commit, they are peeled when they are looked up
+        indexed_tag_objects = self.release_index.get_tag_objects(self.repository_url)
+        tag_objects = {}
+        for ref, object_sha, object_type in raw_refs:
+            tag = ref.removeprefix("refs/tags/")
+            if object_type != "tag":
+                tag_objects[tag] = (object_sha, object_sha)
+            elif indexed_tag_objects.get(tag, (None,))[0] == object_sha:
+                tag_objects[tag] = indexed_tag_objects[tag]
+            else:
+                tag_objects[tag] = (object_sha, "")
+        return tag_objects
+
+    def _peel_tag_object(self, tag_object_sha: str) -> str:
+        if self.response_cache:
+            return self._get_cached_api_response(f"git/tags/{tag_object_sha}")["object"]["sha"]
+        self._count_api_call()
+        return self.repository.get_git_tag(tag_object_sha).object.sha
 
     def get_commit_sha_of_version_tag(self, version_tag: str) -> str:
+        if self._uses_release_index():
+            indexed_tag_object = self.release_index.get_tag_object(self.repository_url, version_tag)
+            if indexed_tag_object:
+                object_sha, commit_sha = indexed_tag_object
+                if not commit_sha:
+                    commit_sha = self._peel_tag_object(object_sha)
+                    self.release_index.set_commit_sha(self.repository_url, version_tag, object_sha, commit_sha)
+                return commit_sha
+        if self.ref_resolver == self.REF_RESOLVER_REMOTE:
+            return self._get_commit_sha_from_remote(version_tag)
+        if self.ref_resolver == self.REF_RESOLVER_LOCAL:
+            return self._get_commit_sha_from_local_refs(version_tag)
+        if self.ref_resolver == self.REF_RESOLVER_GRAPHQL:
+            return self._get_commit_sha_from_graphql(version_tag)
+        if self.response_cache:
+            return self._get_cached_api_response(f"git/ref/tags/{version_tag}")["object"]["sha"]
+
+        self._count_api_call()
         commit = self.repository.get_git_ref(f"tags/{version_tag}")
         return commit.object.sha
 
     def _get_commit_sha_of_release(self, release: GitRelease.GitRelease) -> str:
+        if self.ref_resolver != self.REF_RESOLVER_API or self.response_cache:
+            return self.get_commit_sha_of_version_tag(str(release))
+
+        self._count_api_call()
         release_commit = self.repository.get_git_ref(f"tags/{release}")
         return release_commit.object.sha
 
+    def _get_cached_api_response(self, endpoint: str) -> dict:
+        url = f"{self.api_base_url}/repos/{self.organizacion_name}/{self.repository_name}/{endpoint}"
+        self._count_api_call()
+        response = self.response_cache.get(
+            url,
+            headers={
+                "Authorization": f"token {self.api_token}",
+                "Accept": "application/vnd.github+json",
+            },
+            session=self.api_client,
+        )
+        if response.status_code != 200:
+            raise Exception(
+                f"There was an error calling to github - {response.status_code} - {response.reason}"
+            )
+        return response.json()
+
+    def _get_commit_sha_from_remote(self, version_tag: str) -> str:
+        try:
+            return self.remote_tag_refs[version_tag]
+        except KeyError:
+            raise ValueError(f"The tag {version_tag} does not exist in the remote repository")
+
+    def _get_commit_sha_from_graphql(self, version_tag: str) -> str:
+        self._count_api_call()
+        commit_sha = self.api_client.get_commit_sha(self.organizacion_name, self.repository_name, version_tag)
+        if commit_sha is None:
+            raise ValueError(f"The tag {version_tag} does not exist in the remote repository")
+        return commit_sha
+
+    def _get_commit_sha_from_local_refs(self, version_tag: str) -> str:
+        # a cold install has no local refs yet, so its first tag is read from the remote advertisement
+        if not self._is_cloned():
+            return self._get_commit_sha_from_remote(version_tag)
+        self._fetch(f"+refs/tags/{version_tag}:refs/tags/{version_tag}")
+        return self.local_repository.git.rev_parse(f"refs/tags/{version_tag}^{{commit}}")
+
+    def _get_remote(self) -> str:
+        if self.local_repository.remotes:
+            return self.local_repository.remote().name
+        return self._get_repository_url_with_token(self.repository_url)
+
+    @staticmethod
+    def _parse_tag_refs(raw_refs: str) -> dict[str, str]:
+        tag_refs = {}
+        peeled_tag_refs = {}
+        for line in raw_refs.splitlines():
+            sha, _, ref = line.partition("\t")
+            if not ref.startswith("refs/tags/"):
+                continue
+            tag = ref.removeprefix("refs/tags/")
+            if tag.endswith("^{}"):
+                peeled_tag_refs[tag.removesuffix("^{}")] = sha
+            else:
+                tag_refs[tag] = sha
+        return tag_refs | peeled_tag_refs
+
+    def _get_repository_url_with_token(self, repository_url: str) -> str:
+        if "@" in repository_url.removeprefix("https://").split("/")[0]:
+            return repository_url
+        return repository_url.replace("https://", f"https://{self.api_token}@")
+
     def _clone_repository(self, repository_url: str, path_to_clone_the_app: str):
-        repo_url_with_token = repository_url.replace(
-            "https://", f"https://{self.api_token}@"
+        repo_url_with_token = self._get_repository_url_with_token(repository_url)
+        # with a sparse checkout the first checkout already writes only the deployed paths, and in worktree
+        # mode the releases are worktrees, so the repository itself needs no working tree
+        clone_options = {"no_checkout": True} if self.sparse_checkout_paths or self.live_path else {}
+        if self.object_store:
+            self.object_store.clone(repo_url_with_token, path_to_clone_the_app, **clone_options)
+            return
+        if self._is_live_path_checkout():
+            # an installation moving to worktree mode already has the objects, they are copied locally because
+            # the old checkout is pruned as a legacy release later
+            clone_options.update(reference=str(self.live_path), dissociate=True)
+        git.Repo.clone_from(repo_url_with_token, path_to_clone_the_app, **clone_options)
+
+    def _is_live_path_checkout(self) -> bool:
+        if self.live_path is None:
+            return False
+        live_path = Path(self.live_path)
+        return not live_path.is_symlink() and (live_path / ".git").is_dir()
+
+    def _is_cloned(self) -> bool:
+        return (Path(self.source_code_path) / ".git").exists()
+
+    def get_local_head_commit(self) -> str | None:
+        if self.live_path is not None:
+            if not (Path(self.live_path) / ".git").exists():
+                return None
+            repository = git.Repo(self.live_path)
+        elif self._is_cloned():
+            repository = self.local_repository
+        else:
+            return None
+        try:
+            return repository.head.commit.hexsha
+        except ValueError:
+            return None
+
+    def resolve_commit(self, commit: str) -> str:
+        return self.local_repository.git.rev_parse(f"{commit}^{{commit}}")
+
+    def peel_commit(self, commit: str) -> str:
+        # the api resolvers return the tag object of annotated tags, it is peeled when the object is local
+        if not self._is_cloned():
+            return commit
+        try:
+            return self.local_repository.git.rev_parse("--verify", "--quiet", f"{commit}^{{commit}}")
+        except git.GitCommandError:
+            return commit
+
+    def refresh(self) -> None:
+        # long running callers reuse the handle between checks, so only the github clients and the local
+        # repository are kept and every tag or release lookup is resolved again
+        for cached_property_name in ("version_info", "remote_tag_refs"):
+            self.__dict__.pop(cached_property_name, None)
+        self.api_calls_count = 0
+        self.last_fetch_report = None
+        self.last_checkout_report = None
+        self._is_release_index_synced = False
+        self._is_fetched = False
+
+    def is_at_commit(self, commit: str) -> bool:
+        head_commit = self.get_local_head_commit()
+        if head_commit is None:
+            return False
+        if head_commit == commit:
+            return True
+        if not self._is_cloned():
+            return False
+        try:
+            return self.local_repository.git.rev_parse("--verify", "--quiet", f"{commit}^{{commit}}") == head_commit
+        except git.GitCommandError:
+            return False
+
+    def get_changed_files(self, previous_commit: str | None, commit: str) -> list[str]:
+        if previous_commit is None:
+            return self.local_repository.git.ls_tree("-r", "--name-only", commit).splitlines()
+        if self.release_index:
+            changed_files = self.release_index.get_changed_paths(self.repository_url, previous_commit, commit)
+            if changed_files is not None:
+                return changed_files
+
+        changed_files = self.local_repository.git.diff(
+            "--name-only", "--no-renames", previous_commit, commit
+        ).splitlines()
+        if self.release_index:
+            self.release_index.add_changed_paths(self.repository_url, previous_commit, commit, changed_files)
+        return changed_files
+
+    def iter_log_lines(self, previous_commit: str, commit: str) -> Iterator[str]:
+        process = self.local_repository.git.log(
+            "--numstat", "--no-renames", LOG_FORMAT, f"{previous_commit}..{commit}", as_process=True
         )
-        Repo.clone_from(repo_url_with_token, path_to_clone_the_app)
+        for line in process.stdout:
+            yield line.decode("utf-8", errors="replace")
+        process.wait()
+
+    def get_rate_limit_remaining(self) -> int | None:
+        session = self.client_pool.http_session if self.client_pool else requests
+        try:
+            response = session.get(
+                f"{self.api_base_url}/rate_limit",
+                headers={"Authorization": f"token {self.api_token}"},
+                timeout=10,
+            )
+            return response.json()["resources"]["core"]["remaining"]
+        except (requests.RequestException, KeyError, ValueError):
+            return None
+
+    def read_file(self, commit: str, file_path: Path) -> str | None:
+        if commit is None or not self._is_cloned():
+            return None
+        try:
+            return self.local_repository.git.show(
+                f"{commit}:{Path(file_path).as_posix()}", strip_newline_in_stdout=False
+            )
+        except git.GitCommandError:
+            return None
 
     def change_source_code_version(self, commit: str) -> None:
         self._fetch_and_checkout(commit)
 
     def _fetch_and_checkout(self, commit: str) -> None:
-        # TODO: check if local_repository_path exists ?? or maybe this ewhen the process willbe automatic
-        local_repository = Repo(self.source_code_path)
-        local_repository.remote().fetch()
-        local_repository.git.checkout(commit)
+        self.fetch_source_code_version(commit)
+        self.checkout_source_code_version(commit)
+
+    def fetch_source_code_version(self, commit: str, is_prefetched: bool = False) -> None:
+        self._objects_before_fetch = self._count_local_objects()
+        if not self._is_cloned():
+            self._clone_repository(self.repository_url, self.source_code_path)
+            self._is_fetched = self.has_commit(commit)
+        elif is_prefetched:
+            self._is_fetched = self.has_commit(commit)
+
+        self._fetch(commit)
+
+    def prefetch_version_tag(self, version_tag: str) -> FetchReport:
+        # the objects are kept reachable from their own namespace so neither tags nor gc are affected
+        objects_before = self._count_local_objects()
+        self.local_repository.remote().fetch(
+            f"+refs/tags/{version_tag}:{self.prefetch_ref_prefix}{version_tag}", **self._get_fetch_options()
+        )
+        objects_after = self._count_local_objects()
+        return FetchReport(
+            strategy=self.FETCH_STRATEGY_PREFETCH,
+            objects=objects_after["objects"] - objects_before["objects"],
+            bytes=objects_after["bytes"] - objects_before["bytes"],
+        )
+
+    def prune_prefetched_tags(self, kept_version_tags: list[str]) -> list[str]:
+        pruned_version_tags = []
+        raw_refs = self.local_repository.git.for_each_ref("--format=%(refname)", self.prefetch_ref_prefix)
+        for ref in raw_refs.splitlines():
+            version_tag = ref.removeprefix(self.prefetch_ref_prefix)
+            if version_tag not in kept_version_tags:
+                self.local_repository.git.update_ref("-d", ref)
+                pruned_version_tags.append(version_tag)
+        return pruned_version_tags
+
+    def checkout_source_code_version(self, commit: str) -> None:
+        is_checked_out = (Path(self.local_repository.git_dir) / "index").exists()
+        previous_commit = self.get_local_head_commit() if is_checked_out else None
+        is_sparse_checkout_changed = apply_sparse_checkout(self.local_repository, self.sparse_checkout_paths)
+        self.local_repository.git.checkout(commit)
+        self._is_fetched = False
+        self._update_fetch_report()
+
+        written_files = None
+        if previous_commit is not None and not is_sparse_checkout_changed:
+            written_files = self.get_changed_files(previous_commit, commit)
+        self.last_checkout_report = get_checkout_report(
+            self.local_repository, commit, written_files, self.sparse_checkout_paths
+        )
+
+    def checkout_worktree(self, worktree_deployer: WorktreeDeployer, commit: str) -> Path:
+        commit = self.resolve_commit(commit)
+        is_prepared = worktree_deployer.get_head_commit(worktree_deployer.get_release_path(commit)) == commit
+        release_path = worktree_deployer.prepare(commit, self.sparse_checkout_paths)
+        self._is_fetched = False
+        self._update_fetch_report()
+        self.last_checkout_report = get_checkout_report(
+            git.Repo(release_path), commit, [] if is_prepared else None, self.sparse_checkout_paths
+        )
+        return release_path
+
+    def _update_fetch_report(self) -> None:
+        objects_before = self._objects_before_fetch
+        objects_after = self._count_local_objects()
+        self.last_fetch_report = FetchReport(
+            strategy=self.fetch_strategy,
+            objects=objects_after["objects"] - objects_before["objects"],
+            bytes=objects_after["bytes"] - objects_before["bytes"],
+        )
+
+    def _fetch(self, target: str | None = None) -> None:
+        if self._is_fetched:
+            return
+
+        remote = self.local_repository.remote()
+        if self.object_store:
+            store_path = self.object_store.ensure(self._get_repository_url_with_token(remote.url))
+            self.object_store.attach(self.source_code_path, store_path)
+
+        if self.fetch_strategy == self.FETCH_STRATEGY_TARGET and target:
+            if not self.has_commit(target):
+                remote.fetch(target, **self._get_fetch_options())
+        elif self.ref_resolver == self.REF_RESOLVER_LOCAL:
+            remote.fetch(tags=True, force=True, **self._get_fetch_options())
+        else:
+            remote.fetch(**self._get_fetch_options())
+        self._is_fetched = True
+
+    def _get_fetch_options(self) -> dict:
+        fetch_options = {}
+        if self.fetch_depth:
+            fetch_options["depth"] = self.fetch_depth
+        if self.fetch_filter:
+            fetch_options["filter"] = self.fetch_filter
+        return fetch_options
+
+    def has_commit(self, commit: str) -> bool:
+        if commit.startswith("+refs/"):
+            return False
+        try:
+            self.local_repository.git.cat_file("-e", f"{commit}^{{commit}}")
+            return True
+        except git.GitCommandError:
+            return False
+
+    def _count_local_objects(self) -> dict:
+        if not self._is_cloned():
+            return {"objects": 0, "bytes": 0}
+        try:
+            raw_count = self.local_repository.git.count_objects("-v")
+        except git.GitCommandError:
+            return {"objects": 0, "bytes": 0}
+
+        count = {}
+        for line in raw_count.splitlines():
+            key, _, value = line.partition(": ")
+            if value.isdigit():
+                count[key] = int(value)
+        return {
+            "objects": count.get("count", 0) + count.get("in-pack", 0),
+            "bytes": (count.get("size", 0) + count.get("size-pack", 0)) * 1024,
+        }
@@ -0,0 +1,20 @@
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+
+
+class _LazyModule(ModuleType):
+    # importlib's LazyLoader is not thread safe before python 3.12, so the first attribute access goes through
+    # the regular import system, which makes concurrent first accesses wait for the same import
+    def __getattr__(self, attribute: str):
+        return getattr(importlib.import_module(self.__name__), attribute)
+
+
+def lazy_import(name: str) -> ModuleType:
+    # the module is executed on the first attribute access, so it only costs import time when it is used
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    return _LazyModule(name)
@@ -0,0 +1,47 @@
+from fnmatch import fnmatch
+from pathlib import PurePosixPath
+from typing import TypedDict
+
+migration_file_patterns = ("*/migrations/*.py",)
+schema_file_patterns = ("requirements.txt", "*settings.py", "*/settings/*.py")
+
+
+class MigrationPlan(TypedDict):
+    # None when every app has to be migrated
+    apps: list[str] | None
+    changed_files: list[str]
+
+
+def get_migration_app(file_path: str) -> str | None:
+    directories = PurePosixPath(file_path).parts[:-1]
+    if "migrations" not in directories[1:]:
+        return None
+    return directories[directories.index("migrations", 1) - 1]
+
+
+def plan_migrations(
+    changed_files: list[str] | None,
+    migration_file_patterns: tuple[str, ...] = migration_file_patterns,
+    schema_file_patterns: tuple[str, ...] = schema_file_patterns,
+) -> MigrationPlan | None:
+    if changed_files is None:
+        return MigrationPlan(apps=None, changed_files=[])
+
+    migration_files = [
+        file_path for file_path in changed_files
+        if any(fnmatch(file_path, pattern) for pattern in migration_file_patterns)
+    ]
+    schema_files = [
+        file_path for file_path in changed_files
+        if any(fnmatch(file_path, pattern) for pattern in schema_file_patterns)
+    ]
+    if schema_files:
+        return MigrationPlan(apps=None, changed_files=[*schema_files, *migration_files])
+    if not migration_files:
+        return None
+
+    apps = {get_migration_app(file_path) for file_path in migration_files}
+    return MigrationPlan(
+        apps=None if None in apps else sorted(apps),
+        changed_files=migration_files,
+    )
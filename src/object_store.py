@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+import time
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from src.file_utils import file_lock
+from src.lazy_imports import lazy_import
+
+if TYPE_CHECKING:
+    from git import Repo
+
+git = lazy_import("git")
+
+
+class SharedObjectStore:
+    default_directory = Path.home() / ".cache" / "app_updater" / "objects"
+    default_refresh_interval_seconds = 30
+    borrowers_file_name = "app_updater_borrowers"
+
+    def __init__(
+        self,
+        directory: Path = default_directory,
+        refresh_interval_seconds: float = default_refresh_interval_seconds,
+    ) -> None:
+        self.directory = Path(directory)
+        self.refresh_interval_seconds = refresh_interval_seconds
+
+    def get_store_path(self, repository_url: str) -> Path:
+        url_parts = urlsplit(repository_url)
+        url_without_credentials = f"{url_parts.hostname or ''}{url_parts.path}"
+        url_hash = hashlib.sha256(url_without_credentials.encode()).hexdigest()[:12]
+        repository_name = Path(url_parts.path).name.removesuffix(".git")
+        return self.directory / f"{repository_name}-{url_hash}.git"
+
+    def ensure(self, repository_url: str) -> Path:
+        store_path = self.get_store_path(repository_url)
+        with self._lock(store_path):
+            if not (store_path / "HEAD").exists():
+                store_repository = git.Repo.clone_from(repository_url, store_path, mirror=True)
+                with store_repository.config_writer() as config:
+                    config.set_value("gc", "auto", "0")
+            elif self._is_stale(store_path):
+                git.Repo(store_path).git.fetch("--prune", "origin")
+        return store_path
+
+    def attach(self, borrower_path: Path, store_path: Path) -> None:
+        borrower_repository = git.Repo(borrower_path)
+        alternates_path = Path(borrower_repository.common_dir) / "objects" / "info" / "alternates"
+        store_objects_path = str((store_path / "objects").absolute())
+
+        alternates = alternates_path.read_text().splitlines() if alternates_path.exists() else []
+        if store_objects_path not in alternates:
+            alternates_path.parent.mkdir(parents=True, exist_ok=True)
+            alternates_path.write_text("\n".join([*alternates, store_objects_path]) + "\n")
+        self._register_borrower(borrower_path, store_path)
+
+    def clone(self, repository_url: str, path_to_clone_the_app: Path, **clone_options) -> Repo:
+        store_path = self.ensure(repository_url)
+        repository = git.Repo.clone_from(
+            repository_url, path_to_clone_the_app, reference=str(store_path), **clone_options
+        )
+        self._register_borrower(path_to_clone_the_app, store_path)
+        return repository
+
+    def get_store_paths(self) -> list[Path]:
+        if not self.directory.exists():
+            return []
+        return sorted(path for path in self.directory.glob("*.git") if (path / "HEAD").exists())
+
+    def collect_all_garbage(self) -> list[Path]:
+        # the stores disable git's automatic gc, so this has to be run periodically
+        store_paths = self.get_store_paths()
+        for store_path in store_paths:
+            self.collect_garbage(store_path)
+        return store_paths
+
+    def collect_garbage(self, store_path: Path) -> None:
+        with self._lock(store_path):
+            store_repository = git.Repo(store_path)
+            live_borrowers = []
+            for borrower_path in self._get_borrowers(store_path):
+                borrower_ref_namespace = f"refs/borrowers/{self._get_borrower_id(borrower_path)}"
+                if not (borrower_path / ".git").exists():
+                    self._delete_refs(store_repository, borrower_ref_namespace)
+                    continue
+                # keep every object reachable from the borrowers so pruning never breaks them
+                store_repository.git.fetch(
+                    "--no-tags",
+                    str(borrower_path),
+                    f"+refs/*:{borrower_ref_namespace}/refs/*",
+                    f"+HEAD:{borrower_ref_namespace}/HEAD",
+                )
+                live_borrowers.append(borrower_path)
+
+            self._write_borrowers(store_path, live_borrowers)
+            store_repository.git.gc("--quiet")
+
+    def _is_stale(self, store_path: Path) -> bool:
+        fetch_head_path = store_path / "FETCH_HEAD"
+        if not fetch_head_path.exists():
+            return True
+        return time.time() - fetch_head_path.stat().st_mtime > self.refresh_interval_seconds
+
+    @staticmethod
+    def _get_borrower_id(borrower_path: Path) -> str:
+        return hashlib.sha256(str(Path(borrower_path).absolute()).encode()).hexdigest()[:16]
+
+    def _get_borrowers(self, store_path: Path) -> list[Path]:
+        borrowers_path = store_path / self.borrowers_file_name
+        if not borrowers_path.exists():
+            return []
+        return [Path(line) for line in borrowers_path.read_text().splitlines() if line]
+
+    def _register_borrower(self, borrower_path: Path, store_path: Path) -> None:
+        with self._lock(store_path):
+            borrowers = self._get_borrowers(store_path)
+            borrower_path = Path(borrower_path).absolute()
+            if borrower_path not in borrowers:
+                self._write_borrowers(store_path, [*borrowers, borrower_path])
+
+    def _write_borrowers(self, store_path: Path, borrowers: list[Path]) -> None:
+        borrowers_path = store_path / self.borrowers_file_name
+        borrowers_path.write_text("".join(f"{borrower}\n" for borrower in borrowers))
+
+    @staticmethod
+    def _delete_refs(store_repository: Repo, ref_namespace: str) -> None:
+        refs = store_repository.git.for_each_ref("--format=%(refname)", ref_namespace).splitlines()
+        for ref in refs:
+            store_repository.git.update_ref("-d", ref)
+
+    def _lock(self, store_path: Path):
+        return file_lock(store_path.with_suffix(".lock"))
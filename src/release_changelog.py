@@ -0,0 +1,136 @@
+from collections import Counter
+import json
+from pathlib import Path
+import threading
+from typing import Callable, Iterable, TypedDict
+
+from src.file_utils import write_atomically
+
+LOG_RECORD_SEPARATOR = "\x1e"
+LOG_FIELD_SEPARATOR = "\x1f"
+LOG_FORMAT = f"--format={LOG_RECORD_SEPARATOR}%H{LOG_FIELD_SEPARATOR}%an{LOG_FIELD_SEPARATOR}%s"
+
+
+class ChangelogCommit(TypedDict):
+    sha: str
+    author: str
+    subject: str
+
+
+class ReleaseChangelog(TypedDict):
+    old_commit: str
+    new_commit: str
+    commits_count: int
+    authors: dict[str, int]
+    files_changed: int
+    insertions: int
+    deletions: int
+    commits: list[ChangelogCommit]
+
+
+def build_changelog(
+    old_commit: str,
+    new_commit: str,
+    log_lines: Iterable[str],
+    max_listed_commits: int = 50,
+) -> ReleaseChangelog:
+    authors = Counter()
+    changed_files = set()
+    commits = []
+    commits_count = insertions = deletions = 0
+
+    for line in log_lines:
+        line = line.rstrip("\n")
+        if line.startswith(LOG_RECORD_SEPARATOR):
+            sha, author, subject = line.removeprefix(LOG_RECORD_SEPARATOR).split(LOG_FIELD_SEPARATOR, 2)
+            commits_count += 1
+            authors[author] += 1
+            if len(commits) < max_listed_commits:
+                commits.append(ChangelogCommit(sha=sha, author=author, subject=subject))
+            continue
+
+        added_lines, _, rest = line.partition("\t")
+        removed_lines, _, file_path = rest.partition("\t")
+        if not file_path:
+            continue
+        changed_files.add(file_path)
+        # binary files are reported with "-" instead of line counts
+        insertions += int(added_lines) if added_lines.isdigit() else 0
+        deletions += int(removed_lines) if removed_lines.isdigit() else 0
+
+    return ReleaseChangelog(
+        old_commit=old_commit,
+        new_commit=new_commit,
+        commits_count=commits_count,
+        authors=dict(authors.most_common()),
+        files_changed=len(changed_files),
+        insertions=insertions,
+        deletions=deletions,
+        commits=commits,
+    )
+
+
+def format_changelog(changelog: ReleaseChangelog | None) -> str:
+    if not changelog:
+        return ""
+
+    lines = [
+        f"Cambios desde {changelog['old_commit'][:7]} hasta {changelog['new_commit'][:7]}: "
+        f"{changelog['commits_count']} commits de {len(changelog['authors'])} autores, "
+        f"{changelog['files_changed']} archivos modificados (+{changelog['insertions']} -{changelog['deletions']})",
+        "Autores: " + ", ".join(f"{author} ({count})" for author, count in changelog["authors"].items()),
+        "",
+    ]
+    lines += [f"- {commit['sha'][:7]} {commit['subject']} ({commit['author']})" for commit in changelog["commits"]]
+    not_listed_commits_count = changelog["commits_count"] - len(changelog["commits"])
+    if not_listed_commits_count > 0:
+        lines.append(f"... y {not_listed_commits_count} commits mas")
+    return "\n".join(lines) + "\n"
+
+
+class ChangelogCache:
+    default_directory = Path.home() / ".cache" / "app_updater" / "changelogs"
+
+    def __init__(self, directory: Path = default_directory) -> None:
+        self.directory = Path(directory)
+        self.hits_count = 0
+        self.misses_count = 0
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def get_or_build(
+        self,
+        old_commit: str,
+        new_commit: str,
+        build: Callable[[], ReleaseChangelog],
+    ) -> ReleaseChangelog:
+        key = f"{old_commit}..{new_commit}"
+        with self._get_lock(key):
+            changelog = self._read_entry(key)
+            if changelog is not None:
+                self.hits_count += 1
+                return changelog
+
+            self.misses_count += 1
+            changelog = build()
+            self._write_entry(key, changelog)
+            return changelog
+
+    def _get_lock(self, key: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _get_entry_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _read_entry(self, key: str) -> ReleaseChangelog | None:
+        try:
+            with open(self._get_entry_path(key)) as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_entry(self, key: str, changelog: ReleaseChangelog) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entry_path = self._get_entry_path(key)
+        write_atomically(entry_path, json.dumps(changelog))
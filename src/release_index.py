@@ -0,0 +1,154 @@
+from contextlib import contextmanager
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Iterator
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tags (
+    repository TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    object_sha TEXT NOT NULL,
+    commit_sha TEXT NOT NULL,
+    PRIMARY KEY (repository, tag)
+);
+CREATE TABLE IF NOT EXISTS releases (
+    repository TEXT PRIMARY KEY,
+    latest_tag TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS diffs (
+    repository TEXT NOT NULL,
+    old_commit TEXT NOT NULL,
+    new_commit TEXT NOT NULL,
+    PRIMARY KEY (repository, old_commit, new_commit)
+);
+CREATE TABLE IF NOT EXISTS changed_paths (
+    repository TEXT NOT NULL,
+    old_commit TEXT NOT NULL,
+    new_commit TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (repository, old_commit, new_commit, path)
+);
+"""
+
+
+class ReleaseIndex:
+    default_path = Path.home() / ".cache" / "app_updater" / "release_index.sqlite3"
+    timeout_seconds = 30
+
+    def __init__(self, path: Path = default_path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, timeout=self.timeout_seconds, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+        self.queries_count = 0
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock, self._connection:
+            self.queries_count += 1
+            yield self._connection
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def get_commit_sha(self, repository: str, tag: str) -> str | None:
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT commit_sha FROM tags WHERE repository = ? AND tag = ?", (repository, tag)
+            ).fetchone()
+        return row[0] if row and row[0] else None
+
+    def get_tag_object(self, repository: str, tag: str) -> tuple[str, str] | None:
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT object_sha, commit_sha FROM tags WHERE repository = ? AND tag = ?", (repository, tag)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def set_commit_sha(self, repository: str, tag: str, object_sha: str, commit_sha: str) -> None:
+        # the tag is only peeled if it was not moved to another object in the meantime
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tags SET commit_sha = ? WHERE repository = ? AND tag = ? AND object_sha = ?",
+                (commit_sha, repository, tag, object_sha),
+            )
+
+    def get_tag_objects(self, repository: str) -> dict[str, tuple[str, str]]:
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT tag, object_sha, commit_sha FROM tags WHERE repository = ?", (repository,)
+            ).fetchall()
+        return {tag: (object_sha, commit_sha) for tag, object_sha, commit_sha in rows}
+
+    def replace_tags(self, repository: str, tags: dict[str, tuple[str, str]]) -> bool:
+        # tags maps each tag to its (tag object, peeled commit) shas, the commit is empty for the annotated tags
+        # that are not peeled yet, and only the differences are written
+        indexed_tags = self.get_tag_objects(repository)
+        removed_tags = [(repository, tag) for tag in indexed_tags if tag not in tags]
+        changed_tags = [
+            (repository, tag, object_sha, commit_sha)
+            for tag, (object_sha, commit_sha) in tags.items()
+            if indexed_tags.get(tag) != (object_sha, commit_sha)
+        ]
+        if not removed_tags and not changed_tags:
+            return False
+
+        with self._transaction() as connection:
+            connection.executemany("DELETE FROM tags WHERE repository = ? AND tag = ?", removed_tags)
+            connection.executemany(
+                "INSERT OR REPLACE INTO tags (repository, tag, object_sha, commit_sha) VALUES (?, ?, ?, ?)",
+                changed_tags,
+            )
+        return True
+
+    def get_latest_release(self, repository: str, max_age_seconds: float | None = None) -> str | None:
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT latest_tag, synced_at FROM releases WHERE repository = ?", (repository,)
+            ).fetchone()
+        if row is None or (max_age_seconds is not None and time.time() - row[1] > max_age_seconds):
+            return None
+        return row[0]
+
+    def set_latest_release(self, repository: str, tag: str) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO releases (repository, latest_tag, synced_at) VALUES (?, ?, ?)",
+                (repository, tag, time.time()),
+            )
+
+    def forget_latest_release(self, repository: str) -> None:
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM releases WHERE repository = ?", (repository,))
+
+    def get_changed_paths(self, repository: str, old_commit: str, new_commit: str) -> list[str] | None:
+        with self._transaction() as connection:
+            is_indexed = connection.execute(
+                "SELECT 1 FROM diffs WHERE repository = ? AND old_commit = ? AND new_commit = ?",
+                (repository, old_commit, new_commit),
+            ).fetchone()
+            if not is_indexed:
+                return None
+            rows = connection.execute(
+                "SELECT path FROM changed_paths WHERE repository = ? AND old_commit = ? AND new_commit = ? "
+                "ORDER BY path",
+                (repository, old_commit, new_commit),
+            ).fetchall()
+        return [path for path, in rows]
+
+    def add_changed_paths(self, repository: str, old_commit: str, new_commit: str, paths: list[str]) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO diffs (repository, old_commit, new_commit) VALUES (?, ?, ?)",
+                (repository, old_commit, new_commit),
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO changed_paths (repository, old_commit, new_commit, path) VALUES (?, ?, ?, ?)",
+                [(repository, old_commit, new_commit, path) for path in paths],
+            )
@@ -0,0 +1,57 @@
+import hashlib
+import re
+from typing import TypedDict
+
+requirement_name_pattern = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+class RequirementsDiff(TypedDict):
+    added: list[str]
+    changed: list[str]
+    removed: list[str]
+    options_changed: bool
+
+
+def get_requirements_hash(requirements: str) -> str:
+    return hashlib.sha256(requirements.encode()).hexdigest()
+
+
+def normalize_requirement_name(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def parse_requirements(requirements: str) -> tuple[dict[str, str], list[str]]:
+    pinned_requirements = {}
+    options = []
+    for line in requirements.splitlines():
+        line = line.split(" #", 1)[0].strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("-"):
+            options.append(line)
+            continue
+
+        name_match = requirement_name_pattern.match(line)
+        if name_match:
+            pinned_requirements[normalize_requirement_name(name_match.group(1))] = line
+        else:
+            options.append(line)
+    return pinned_requirements, options
+
+
+def diff_requirements(old_requirements: str, new_requirements: str) -> RequirementsDiff:
+    old_pinned_requirements, old_options = parse_requirements(old_requirements)
+    new_pinned_requirements, new_options = parse_requirements(new_requirements)
+
+    return RequirementsDiff(
+        added=[
+            requirement for name, requirement in new_pinned_requirements.items()
+            if name not in old_pinned_requirements
+        ],
+        changed=[
+            requirement for name, requirement in new_pinned_requirements.items()
+            if name in old_pinned_requirements and old_pinned_requirements[name] != requirement
+        ],
+        removed=[name for name in old_pinned_requirements if name not in new_pinned_requirements],
+        options_changed=old_options != new_options,
+    )
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from src.file_utils import write_atomically
+from src.lazy_imports import lazy_import
+
+requests = lazy_import("requests")
+
+
+class CachedResponse:
+    def __init__(self, status_code: int, reason: str, body, headers: dict, from_cache: bool = False) -> None:
+        self.status_code = status_code
+        self.reason = reason
+        self.body = body
+        self.headers = headers
+        self.from_cache = from_cache
+
+    def json(self):
+        return self.body
+
+
+class ResponseCache:
+    default_directory = Path.home() / ".cache" / "app_updater" / "responses"
+    default_ttl_seconds = 7 * 24 * 60 * 60
+    default_max_size_bytes = 10 * 1024 * 1024
+
+    def __init__(
+        self,
+        directory: Path = default_directory,
+        ttl_seconds: float = default_ttl_seconds,
+        max_size_bytes: int = default_max_size_bytes,
+    ) -> None:
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = max_size_bytes
+
+        self.hits_count = 0
+        self.misses_count = 0
+
+    def get(self, url: str, headers: dict = None, session=requests, **kwargs) -> CachedResponse:
+        headers = dict(headers or {})
+        key = self._get_key(url, headers.get("Authorization", ""))
+        entry = self._read_entry(key)
+
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = session.get(url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry:
+            self.hits_count += 1
+            self._get_entry_path(key).touch()
+            return CachedResponse(200, "OK", entry["body"], response.headers, from_cache=True)
+
+        self.misses_count += 1
+        if response.status_code != 200:
+            return CachedResponse(response.status_code, response.reason, None, response.headers)
+
+        body = response.json()
+        self._write_entry(key, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "body": body,
+        })
+        return CachedResponse(response.status_code, response.reason, body, response.headers)
+
+    def clear(self) -> None:
+        for entry_path in self._get_entry_paths():
+            entry_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _get_key(url: str, auth_identity: str) -> str:
+        auth_hash = hashlib.sha256(auth_identity.encode()).hexdigest()
+        return hashlib.sha256(f"{url}\0{auth_hash}".encode()).hexdigest()
+
+    def _get_entry_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _get_entry_paths(self) -> list[Path]:
+        if not self.directory.exists():
+            return []
+        return list(self.directory.glob("*.json"))
+
+    def _read_entry(self, key: str) -> dict | None:
+        entry_path = self._get_entry_path(key)
+        try:
+            if time.time() - entry_path.stat().st_mtime > self.ttl_seconds:
+                entry_path.unlink(missing_ok=True)
+                return None
+            with open(entry_path, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_entry(self, key: str, entry: dict) -> None:
+        # the core-be responses contain the github token, so only the owner can read the entries
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.directory.chmod(0o700)
+        entry_path = self._get_entry_path(key)
+        write_atomically(entry_path, json.dumps(entry), mode=0o600)
+        self._evict()
+
+    def _evict(self) -> None:
+        now = time.time()
+        entries = []
+        for entry_path in self._get_entry_paths():
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                entry_path.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            entry_path.unlink(missing_ok=True)
+            total_size -= size
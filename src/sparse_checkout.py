@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, TypedDict
+
+from src.lazy_imports import lazy_import
+
+if TYPE_CHECKING:
+    from git import Repo
+
+git = lazy_import("git")
+
+
+class CheckoutReport(TypedDict):
+    files: int
+    bytes: int
+    sparse_checkout_paths: list[str] | None
+
+
+def normalize_sparse_checkout_paths(sparse_checkout_paths: list[str] | None) -> list[str] | None:
+    if not sparse_checkout_paths:
+        return None
+    return sorted({path.strip("/") for path in sparse_checkout_paths if path.strip("/")}) or None
+
+
+def get_sparse_checkout_paths(repository: Repo) -> list[str] | None:
+    try:
+        return normalize_sparse_checkout_paths(repository.git.sparse_checkout("list").splitlines())
+    except git.GitCommandError:
+        return None
+
+
+def apply_sparse_checkout(repository: Repo, sparse_checkout_paths: list[str] | None) -> bool:
+    # the patterns are stored in the repository config, so every later checkout only writes these paths
+    sparse_checkout_paths = normalize_sparse_checkout_paths(sparse_checkout_paths)
+    current_sparse_checkout_paths = get_sparse_checkout_paths(repository)
+    if sparse_checkout_paths == current_sparse_checkout_paths:
+        return False
+    if sparse_checkout_paths:
+        repository.git.sparse_checkout("set", "--cone", *sparse_checkout_paths)
+    else:
+        repository.git.sparse_checkout("disable")
+    return True
+
+
+def get_checkout_report(
+    repository: Repo,
+    commit: str,
+    written_files: list[str] | None = None,
+    sparse_checkout_paths: list[str] | None = None,
+) -> CheckoutReport:
+    file_sizes = {}
+    for entry in repository.git.ls_tree("-r", "-l", "-z", commit).split("\0"):
+        info, _, path = entry.partition("\t")
+        if not path:
+            continue
+        _, object_type, _, size = info.split()
+        if object_type == "blob":
+            file_sizes[path] = int(size)
+
+    skipped_files = {
+        entry[2:] for entry in repository.git.ls_files("-t", "-z").split("\0") if entry.startswith("S ")
+    }
+    written_files = [
+        path for path in (file_sizes if written_files is None else written_files)
+        if path in file_sizes and path not in skipped_files
+    ]
+    return CheckoutReport(
+        files=len(written_files),
+        bytes=sum(file_sizes[path] for path in written_files),
+        sparse_checkout_paths=normalize_sparse_checkout_paths(sparse_checkout_paths),
+    )
@@ -0,0 +1,117 @@
+import random
+import signal
+import threading
+import time
+import traceback
+
+from src.app_updater import AppUpdater
+
+
+class UpdateDaemon:
+    default_min_interval_seconds = 10
+    default_max_interval_seconds = 2 * 60
+    max_error_interval_seconds = 15 * 60
+    backoff_factor = 2
+    jitter_ratio = 0.1
+    prefetch_interval_seconds = 10 * 60
+    garbage_collection_interval_seconds = 24 * 60 * 60
+
+    def __init__(
+        self,
+        app_updater: AppUpdater,
+        min_interval_seconds: float = default_min_interval_seconds,
+        max_interval_seconds: float = default_max_interval_seconds,
+    ) -> None:
+        self.app_updater = app_updater
+        self.min_interval_seconds = min_interval_seconds
+        self.max_interval_seconds = max_interval_seconds
+
+        self.interval_seconds = min_interval_seconds
+        self.checks_count = 0
+        self.updates_count = 0
+        self.errors_count = 0
+        self.prefetches_count = 0
+        self.garbage_collections_count = 0
+        self.last_error: Exception | None = None
+        self._last_prefetch_at: float | None = None
+        self._last_garbage_collection_at: float | None = None
+        self._is_forced_check = False
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def run(self, max_checks: int | None = None) -> None:
+        while not self._stop_event.is_set():
+            self.check()
+            if max_checks is not None and self.checks_count >= max_checks:
+                break
+            self._wake_event.wait(self._get_jittered_interval())
+            self._wake_event.clear()
+
+    def check(self) -> bool:
+        self.checks_count += 1
+        try:
+            version_control_data = self.app_updater.version_control_provider.get_config()
+            is_forced_check, self._is_forced_check = self._is_forced_check, False
+            if not is_forced_check and self.app_updater.is_deployed(version_control_data):
+                self._increase_interval(self.max_interval_seconds)
+                self._prefetch(version_control_data)
+                self._collect_garbage()
+                return False
+
+            is_updated = self.app_updater.update_source_code_automaticaly(version_control_data)
+        except Exception as e:
+            self.errors_count += 1
+            self.last_error = e
+            traceback.print_exc()
+            self._increase_interval(self.max_error_interval_seconds)
+            return False
+
+        self.last_error = None
+        self.updates_count += int(is_updated)
+        self.interval_seconds = self.min_interval_seconds
+        return is_updated
+
+    def request_check(self, force: bool = False) -> None:
+        # a forced check runs the whole update pipeline without the idle deployed check first
+        self._is_forced_check |= force
+        self._wake_event.set()
+
+    def stop(self, *_) -> None:
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def install_signal_handlers(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, lambda *_: self.request_check())
+
+    def _prefetch(self, version_control_data) -> None:
+        # candidate releases are downloaded while idle, so ordering one of them only needs a local checkout
+        if not version_control_data.get("prefetch_tags"):
+            return
+        if self._last_prefetch_at is not None and (
+            time.monotonic() - self._last_prefetch_at < self.prefetch_interval_seconds
+        ):
+            return
+        self._last_prefetch_at = time.monotonic()
+        self.app_updater.prefetch_releases(version_control_data)
+        self.prefetches_count += 1
+
+    def _collect_garbage(self) -> None:
+        # the shared object store is only packed and pruned here, while there is nothing to deploy
+        if self.app_updater.object_store is None:
+            return
+        if self._last_garbage_collection_at is not None and (
+            time.monotonic() - self._last_garbage_collection_at < self.garbage_collection_interval_seconds
+        ):
+            return
+        self._last_garbage_collection_at = time.monotonic()
+        self.app_updater.object_store.collect_all_garbage()
+        self.garbage_collections_count += 1
+
+    def _increase_interval(self, max_interval_seconds: float) -> None:
+        self.interval_seconds = min(max_interval_seconds, self.interval_seconds * self.backoff_factor)
+
+    def _get_jittered_interval(self) -> float:
+        jitter = self.interval_seconds * self.jitter_ratio
+        return max(0, self.interval_seconds + random.uniform(-jitter, jitter))
@@ -0,0 +1,81 @@
+import json
+from pathlib import Path
+import re
+import time
+
+from src.file_utils import write_atomically
+
+
+class UpdateMetrics:
+    metric_prefix = "app_updater"
+
+    def __init__(self, installation: str) -> None:
+        self.installation = installation
+        self.started_at = time.time()
+        self.durations_seconds: dict[str, float] = {}
+        self.statuses: dict[str, str] = {}
+        self.values: dict[str, float] = {}
+
+    def set_duration(self, name: str, seconds: float) -> None:
+        self.durations_seconds[name] = seconds
+
+    def set_status(self, name: str, status: str) -> None:
+        self.statuses[name] = status
+
+    def set_value(self, name: str, value: float | None) -> None:
+        if value is not None:
+            self.values[name] = value
+
+    def to_record(self) -> dict:
+        return {
+            "installation": self.installation,
+            "started_at": self.started_at,
+            "durations_seconds": dict(self.durations_seconds),
+            "statuses": dict(self.statuses),
+            "values": dict(self.values),
+        }
+
+    def append_json_record(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a") as file:
+            file.write(json.dumps(self.to_record(), sort_keys=True) + "\n")
+
+    def to_prometheus_text(self) -> str:
+        installation_label = f'installation="{self._escape_label(self.installation)}"'
+        lines = [
+            f"# TYPE {self.metric_prefix}_run_timestamp_seconds gauge",
+            f"{self.metric_prefix}_run_timestamp_seconds{{{installation_label}}} {self.started_at}",
+            f"# TYPE {self.metric_prefix}_stage_duration_seconds gauge",
+        ]
+        for stage, seconds in sorted(self.durations_seconds.items()):
+            lines.append(
+                f'{self.metric_prefix}_stage_duration_seconds{{{installation_label},stage="{stage}"}} {seconds}'
+            )
+
+        lines.append(f"# TYPE {self.metric_prefix}_stage_succeeded gauge")
+        for stage, status in sorted(self.statuses.items()):
+            is_succeeded = int(status == "succeeded")
+            lines.append(
+                f'{self.metric_prefix}_stage_succeeded{{{installation_label},stage="{stage}",status="{status}"}} '
+                f"{is_succeeded}"
+            )
+
+        for name, value in sorted(self.values.items()):
+            metric_name = f"{self.metric_prefix}_{self._sanitize_name(name)}"
+            lines.append(f"# TYPE {metric_name} gauge")
+            lines.append(f"{metric_name}{{{installation_label}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_textfile(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomically(path, self.to_prometheus_text())
+
+    @staticmethod
+    def _sanitize_name(name: str) -> str:
+        return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+    @staticmethod
+    def _escape_label(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,223 @@
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+import time
+from typing import Callable, TypedDict
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+class StageTimeoutError(Exception):
+    pass
+
+
+class Stage:
+    FAILURE_ABORT = "abort"
+    FAILURE_CONTINUE = "continue"
+    FAILURE_IGNORE = "ignore"
+
+    def __init__(
+        self,
+        name: str,
+        function: Callable[[dict], object],
+        depends_on: tuple[str, ...] = (),
+        timeout_seconds: float | None = None,
+        failure_policy: str = FAILURE_ABORT,
+        background: bool = False,
+    ) -> None:
+        self.name = name
+        self.function = function
+        self.depends_on = tuple(depends_on)
+        self.timeout_seconds = timeout_seconds
+        self.failure_policy = failure_policy
+        self.background = background
+
+
+class StageResult(TypedDict):
+    name: str
+    status: str
+    started_at: float | None
+    duration_seconds: float | None
+    error: BaseException | None
+
+
+class UpdatePipeline:
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_TIMED_OUT = "timed_out"
+    STATUS_SKIPPED = "skipped"
+    STATUS_STOPPED = "stopped"
+
+    default_max_workers = 4
+
+    def __init__(self, stages: list[Stage], max_workers: int = default_max_workers) -> None:
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers
+        self._validate()
+
+        self.context = {}
+        self.results: dict[str, StageResult] = {}
+        self._background_futures: list[Future] = []
+        self._abandoned_futures: list[Future] = []
+
+    def run(self, context: dict | None = None) -> dict[str, StageResult]:
+        self.context = context if context is not None else {}
+        self.results = {
+            name: StageResult(
+                name=name,
+                status=self.STATUS_PENDING,
+                started_at=None,
+                duration_seconds=None,
+                error=None,
+            )
+            for name in self.stages
+        }
+        self._abandoned_futures = []
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="update-pipeline")
+        running: dict[Future, Stage] = {}
+        is_stopped = False
+        try:
+            while True:
+                if not is_stopped:
+                    for stage in self._get_ready_stages():
+                        self._start_stage(executor, stage, running)
+
+                foreground_running = {future: stage for future, stage in running.items() if not stage.background}
+                if not foreground_running:
+                    break
+
+                done, _ = wait(
+                    foreground_running,
+                    timeout=self._get_next_deadline(foreground_running),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    is_stopped |= self._finish_stage(running.pop(future), future)
+                for future, stage in list(running.items()):
+                    if self._is_timed_out(stage):
+                        running.pop(future)
+                        self._abandoned_futures.append(future)
+                        timeout_error = StageTimeoutError(
+                            f"{stage.name} took more than {stage.timeout_seconds} seconds"
+                        )
+                        self._fail_stage(stage, timeout_error, self.STATUS_TIMED_OUT)
+                        is_stopped |= stage.failure_policy == Stage.FAILURE_ABORT
+
+            for result in self.results.values():
+                if result["status"] == self.STATUS_PENDING:
+                    result["status"] = self.STATUS_SKIPPED
+        finally:
+            executor.shutdown(wait=False)
+        return self.results
+
+    def wait_for_background_stages(self, timeout_seconds: float | None = None) -> None:
+        wait(self._background_futures, timeout=timeout_seconds)
+
+    def wait_for_abandoned_stages(self, timeout_seconds: float | None = None) -> None:
+        # the thread of a timed out stage can't be stopped, the stage has to stop its own work on its deadline
+        wait(self._abandoned_futures, timeout=timeout_seconds)
+
+    def get_remaining_seconds(self, name: str) -> float | None:
+        stage = self.stages[name]
+        started_at = self.results[name]["started_at"]
+        if stage.timeout_seconds is None or started_at is None:
+            return None
+        return max(0, stage.timeout_seconds - (time.perf_counter() - started_at))
+
+    def get_error(self) -> BaseException | None:
+        for name, result in self.results.items():
+            is_fatal = self.stages[name].failure_policy == Stage.FAILURE_ABORT
+            if is_fatal and result["status"] in (self.STATUS_FAILED, self.STATUS_TIMED_OUT):
+                return result["error"]
+        return None
+
+    def _validate(self) -> None:
+        for stage in self.stages.values():
+            for dependency in stage.depends_on:
+                if dependency not in self.stages:
+                    raise ValueError(f"The stage {stage.name} depends on the unknown stage {dependency}")
+
+    def _get_ready_stages(self) -> list[Stage]:
+        ready_stages = []
+        for stage in self.stages.values():
+            if self.results[stage.name]["status"] != self.STATUS_PENDING:
+                continue
+            dependency_statuses = [self._get_dependency_status(dependency) for dependency in stage.depends_on]
+            if all(status == self.STATUS_SUCCEEDED for status in dependency_statuses):
+                ready_stages.append(stage)
+        return ready_stages
+
+    def _get_dependency_status(self, dependency: str) -> str:
+        status = self.results[dependency]["status"]
+        is_ignored_failure = (
+            self.stages[dependency].failure_policy == Stage.FAILURE_IGNORE
+            and status in (self.STATUS_FAILED, self.STATUS_TIMED_OUT)
+        )
+        return self.STATUS_SUCCEEDED if is_ignored_failure else status
+
+    def _start_stage(self, executor: ThreadPoolExecutor, stage: Stage, running: dict) -> None:
+        result = self.results[stage.name]
+        result["status"] = self.STATUS_RUNNING
+        result["started_at"] = time.perf_counter()
+        if stage.background:
+            future = executor.submit(self._run_background_stage, stage)
+            self._background_futures.append(future)
+        else:
+            future = executor.submit(stage.function, self.context)
+        running[future] = stage
+
+    def _run_background_stage(self, stage: Stage) -> None:
+        stage_future = Future()
+        try:
+            stage_future.set_result(stage.function(self.context))
+        except BaseException as e:
+            stage_future.set_exception(e)
+        self._finish_stage(stage, stage_future)
+
+    def _finish_stage(self, stage: Stage, future: Future) -> bool:
+        result = self.results[stage.name]
+        if result["status"] != self.STATUS_RUNNING:
+            return False
+        result["duration_seconds"] = time.perf_counter() - result["started_at"]
+
+        error = future.exception()
+        if isinstance(error, PipelineStopped):
+            result["status"] = self.STATUS_STOPPED
+            return True
+        if error is not None:
+            self._fail_stage(stage, error, self.STATUS_FAILED)
+            return stage.failure_policy == Stage.FAILURE_ABORT
+
+        self.context[stage.name] = future.result()
+        result["status"] = self.STATUS_SUCCEEDED
+        return False
+
+    def _fail_stage(self, stage: Stage, error: BaseException, status: str) -> None:
+        result = self.results[stage.name]
+        result["status"] = status
+        result["error"] = error
+        if result["duration_seconds"] is None:
+            result["duration_seconds"] = time.perf_counter() - result["started_at"]
+
+    def _is_timed_out(self, stage: Stage) -> bool:
+        if stage.background or stage.timeout_seconds is None:
+            return False
+        return time.perf_counter() - self.results[stage.name]["started_at"] > stage.timeout_seconds
+
+    def _get_next_deadline(self, running: dict) -> float | None:
+        remaining_times = [
+            stage.timeout_seconds - (time.perf_counter() - self.results[stage.name]["started_at"])
+            for stage in running.values()
+            if stage.timeout_seconds is not None
+        ]
+        if not remaining_times:
+            return None
+        return max(0, min(remaining_times))
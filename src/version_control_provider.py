@@ -1,9 +1,18 @@
 from abc import abstractmethod
-import requests
+import hashlib
+import json
+import random
 import os
-import yaml
+import time
 from pathlib import Path
-from typing import TypedDict
+from typing import NotRequired, TypedDict
+
+from src.file_utils import write_atomically
+from src.lazy_imports import lazy_import
+from src.response_cache import ResponseCache
+
+requests = lazy_import("requests")
+yaml = lazy_import("yaml")
 
 config_file_path = Path() / ".config.yaml"
 
@@ -12,9 +21,56 @@ class VersionControlConfigs(TypedDict):
     token: str
     version: str
     local_repository_path: str
+    ref_resolver: NotRequired[str]
+    fetch_strategy: NotRequired[str]
+    fetch_depth: NotRequired[int]
+    fetch_filter: NotRequired[str]
+    repository_url: NotRequired[str]
+    environment_path: NotRequired[str]
+    deploy_mode: NotRequired[str]
+    keep_releases: NotRequired[int]
+    sparse_checkout_paths: NotRequired[list[str]]
+    migration_command: NotRequired[str]
+    prefetch_tags: NotRequired[list[str]]
+    prefetch_max_bytes_per_second: NotRequired[int]
+    prefetch_max_disk_bytes: NotRequired[int]
+    health_check_command: NotRequired[str]
+    health_check_timeout_seconds: NotRequired[float]
+
+
+OPTIONAL_CONFIG_KEYS = (
+    "ref_resolver",
+    "fetch_strategy",
+    "fetch_depth",
+    "fetch_filter",
+    "repository_url",
+    "environment_path",
+    "deploy_mode",
+    "keep_releases",
+    "sparse_checkout_paths",
+    "migration_command",
+    "prefetch_tags",
+    "prefetch_max_bytes_per_second",
+    "prefetch_max_disk_bytes",
+    "health_check_command",
+    "health_check_timeout_seconds",
+)
+
+
+def get_optional_configs(config: dict) -> dict:
+    return {key: config[key] for key in OPTIONAL_CONFIG_KEYS if config.get(key) is not None}
+
+
+class CoreUnavailableError(Exception):
+    pass
 
 
 class VersionControlProvider:
+    response_cache: ResponseCache | None = None
+
+    def use_response_cache(self, response_cache: ResponseCache) -> None:
+        self.response_cache = response_cache
+
     @abstractmethod
     def get_config(self) -> VersionControlConfigs:
         raise NotImplementedError()
@@ -22,9 +78,18 @@ class VersionControlProvider:
 
 class CoreConfigProvider(VersionControlProvider):
     BASE_URL = os.getenv("CORE_BE_URL")
-
-    def __init__(self, token=None):
+    http_session = None
+    connect_timeout_seconds = 5
+    read_timeout_seconds = 30
+    max_attempts = 3
+    retry_backoff_seconds = 1
+    max_stale_seconds = 24 * 60 * 60
+    default_last_known_good_directory = Path.home() / ".cache" / "app_updater" / "configs"
+
+    def __init__(self, token=None, last_known_good_directory: Path = default_last_known_good_directory):
         self.token = token if token else os.getenv("CORE_BE_TOKEN")
+        self.last_known_good_directory = Path(last_known_good_directory)
+        self.is_stale_config = False
         super().__init__()
 
     def get_config(self) -> VersionControlConfigs:
@@ -33,22 +98,77 @@ class CoreConfigProvider(VersionControlProvider):
             token=config.get("token"),
             version=config.get("version"),
             local_repository_path=Path(config.get("local_repository_path")),
+            **get_optional_configs(config),
         )
 
     def _get_version_control_info(self):
+        try:
+            config = self._request_version_control_info()
+        except CoreUnavailableError as e:
+            config = self._read_last_known_good_config()
+            if config is None:
+                raise Exception(f"There was an error calling to core-be - {e}")
+            print(f"No se pudo contactar a core-be, se usa la ultima configuracion conocida - {e}")
+            self.is_stale_config = True
+            return config
+
+        self.is_stale_config = False
+        self._write_last_known_good_config(config)
+        return config
+
+    def _request_version_control_info(self) -> dict:
         url = f"{self.BASE_URL}api/company/version-control/me/"
+        headers = {"Authorization": f"Token {self.token}"}
+        timeout = (self.connect_timeout_seconds, self.read_timeout_seconds)
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                if self.response_cache:
+                    response = self.response_cache.get(
+                        url, headers=headers, session=self._get_http_session(), timeout=timeout
+                    )
+                else:
+                    response = self._get_http_session().get(url, headers=headers, timeout=timeout)
+            except requests.RequestException as e:
+                error = CoreUnavailableError(str(e))
+            else:
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code < 500 and response.status_code != 429:
+                    raise Exception(
+                        f"There was an error getting the config - {response.status_code} - {response.reason}"
+                    )
+                error = CoreUnavailableError(f"{response.status_code} - {response.reason}")
+
+            if attempt < self.max_attempts:
+                time.sleep(random.uniform(0, self.retry_backoff_seconds * 2 ** (attempt - 1)))
+        raise error
+
+    @classmethod
+    def _get_http_session(cls):
+        # shared by every provider so connections to core-be are kept alive between checks
+        if CoreConfigProvider.http_session is None:
+            CoreConfigProvider.http_session = requests.Session()
+        return cls.http_session
+
+    def _get_last_known_good_path(self) -> Path:
+        token_hash = hashlib.sha256(f"{self.BASE_URL}\0{self.token}".encode()).hexdigest()[:16]
+        return self.last_known_good_directory / f"{token_hash}.json"
+
+    def _read_last_known_good_config(self) -> dict | None:
+        config_path = self._get_last_known_good_path()
         try:
-            response = requests.get(
-                url, headers={"Authorization": f"Token {self.token}"}
-            )
-        except Exception as e:
-            raise Exception(f"There was an error calling to core-be - {e}")
-
-        if response.status_code == 200:
-            return response.json()
-        raise Exception(
-            f"There was an error getting the config - {response.status_code} - {response.reason}"
-        )
+            if time.time() - config_path.stat().st_mtime > self.max_stale_seconds:
+                return None
+            with open(config_path) as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_last_known_good_config(self, config: dict) -> None:
+        config_path = self._get_last_known_good_path()
+        config_path.parent.mkdir(parents=True, exist_ok=True)
+        # the config holds the github token
+        write_atomically(config_path, json.dumps(config), mode=0o600)
 
 
 class LocalConfigProvider(VersionControlProvider):
@@ -66,6 +186,7 @@ class LocalConfigProvider(VersionControlProvider):
             token=self._get_api_token(),
             version=self._get_version_tag_to_update(),
             local_repository_path=self._get_local_repository_path(),
+            **get_optional_configs(self.config),
         )
 
     def _get_local_repository_path(self) -> str:
@@ -76,3 +197,16 @@ class LocalConfigProvider(VersionControlProvider):
 
     def _get_version_tag_to_update(self) -> str:
         return self.config.get("version")
+
+
+class StaticConfigProvider(VersionControlProvider):
+    def __init__(self, config: VersionControlConfigs):
+        self.config = config
+
+    def get_config(self) -> VersionControlConfigs:
+        return VersionControlConfigs(
+            token=self.config.get("token"),
+            version=self.config.get("version"),
+            local_repository_path=Path(self.config.get("local_repository_path")),
+            **get_optional_configs(self.config),
+        )
@@ -0,0 +1,171 @@
+from collections import OrderedDict
+import hashlib
+import hmac
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from typing import Callable
+
+
+class WebhookListener:
+    GITHUB_PATH = "/github"
+    CORE_BE_PATH = "/core-be"
+
+    default_host = "127.0.0.1"
+    default_port = 8787
+    default_coalesce_seconds = 2
+    max_body_bytes = 1024 * 1024
+    max_remembered_deliveries = 1000
+    delivery_ttl_seconds = 24 * 60 * 60
+    body_hash_ttl_seconds = 60
+    release_actions = ("published", "released", "created", "prereleased")
+
+    def __init__(
+        self,
+        triggers: dict[str, Callable[[], None]],
+        secret: str,
+        host: str = default_host,
+        port: int = default_port,
+        coalesce_seconds: float = default_coalesce_seconds,
+    ) -> None:
+        self.triggers = triggers
+        self.secret = secret.encode()
+        self.host = host
+        self.port = port
+        self.coalesce_seconds = coalesce_seconds
+
+        self.received_count = 0
+        self.duplicated_count = 0
+        self.triggered_count = 0
+        self._deliveries = OrderedDict()
+        self._pending_triggers: dict[str, threading.Timer] = {}
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "WebhookListener":
+        self._server = ThreadingHTTPServer((self.host, self.port), self._get_handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="webhook-listener", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+        with self._lock:
+            for timer in self._pending_triggers.values():
+                timer.cancel()
+            self._pending_triggers.clear()
+
+    def handle(self, path: str, headers, body: bytes) -> tuple[int, str]:
+        if path not in (self.GITHUB_PATH, self.CORE_BE_PATH):
+            return 404, "not found"
+        if not self._is_signature_valid(headers.get("X-Hub-Signature-256", ""), body):
+            return 401, "invalid signature"
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return 400, "invalid json"
+
+        self.received_count += 1
+        delivery_id = headers.get("X-GitHub-Delivery") or headers.get("X-Core-Delivery")
+        ttl_seconds = self.delivery_ttl_seconds
+        if delivery_id is None:
+            # without a delivery id only retries are deduplicated, a later A -> B -> A notification is legitimate
+            delivery_id = hashlib.sha256(path.encode() + body).hexdigest()
+            ttl_seconds = self.body_hash_ttl_seconds
+        if self._is_duplicated(delivery_id, ttl_seconds):
+            self.duplicated_count += 1
+            return 200, "duplicated"
+
+        if path == self.GITHUB_PATH:
+            installations = self._get_installations_of_github_event(headers.get("X-GitHub-Event", ""), payload)
+        else:
+            installations = self._get_installations_of_core_be_notification(payload)
+        for installation in installations:
+            self._schedule_trigger(installation)
+        return 202 if installations else 200, "accepted" if installations else "ignored"
+
+    def _get_installations_of_github_event(self, event: str, payload: dict) -> list[str]:
+        is_tag_push = str(payload.get("ref", "")).startswith("refs/tags/") and not payload.get("deleted")
+        is_new_version = (
+            (event == "release" and payload.get("action") in self.release_actions)
+            or (event == "create" and payload.get("ref_type") == "tag")
+            or (event == "push" and is_tag_push)
+        )
+        return list(self.triggers) if is_new_version else []
+
+    def _get_installations_of_core_be_notification(self, payload: dict) -> list[str]:
+        installation = payload.get("installation")
+        if installation is None:
+            return list(self.triggers)
+        if installation in self.triggers:
+            return [installation]
+        # a listener with a single trigger serves one installation, whatever name core-be uses for it
+        return list(self.triggers) if len(self.triggers) == 1 else []
+
+    def _is_signature_valid(self, signature: str, body: bytes) -> bool:
+        expected_signature = "sha256=" + hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected_signature, signature)
+
+    def _is_duplicated(self, delivery_id: str, ttl_seconds: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._deliveries.get(delivery_id)
+            if expires_at is not None and expires_at > now:
+                return True
+            self._deliveries.pop(delivery_id, None)
+            self._deliveries[delivery_id] = now + ttl_seconds
+            while len(self._deliveries) > self.max_remembered_deliveries:
+                self._deliveries.popitem(last=False)
+            return False
+
+    def _schedule_trigger(self, installation: str) -> None:
+        with self._lock:
+            if installation in self._pending_triggers:
+                return
+            timer = threading.Timer(self.coalesce_seconds, self._run_trigger, (installation,))
+            timer.daemon = True
+            self._pending_triggers[installation] = timer
+        timer.start()
+
+    def _run_trigger(self, installation: str) -> None:
+        with self._lock:
+            self._pending_triggers.pop(installation, None)
+            self.triggered_count += 1
+        self.triggers[installation]()
+
+    def _get_handler_class(self) -> type[BaseHTTPRequestHandler]:
+        webhook_listener = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                content_length = int(self.headers.get("Content-Length") or 0)
+                if content_length > webhook_listener.max_body_bytes:
+                    self._reply(413, "payload too large")
+                    return
+                body = self.rfile.read(content_length)
+                self._reply(*webhook_listener.handle(self.path, self.headers, body))
+
+            def _reply(self, status_code: int, message: str) -> None:
+                payload = message.encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return WebhookHandler
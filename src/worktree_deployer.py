@@ -0,0 +1,96 @@
+import os
+from pathlib import Path
+import shutil
+import time
+
+from src.file_utils import replace_symlink
+from src.lazy_imports import lazy_import
+from src.sparse_checkout import apply_sparse_checkout
+
+git = lazy_import("git")
+
+
+class WorktreeDeployer:
+    default_keep_releases = 3
+    repository_directory_name = "repository"
+
+    def __init__(self, live_path: Path, keep_releases: int = default_keep_releases) -> None:
+        self.live_path = Path(live_path).absolute()
+        self.keep_releases = keep_releases
+        self.releases_path = self.live_path.parent / f".{self.live_path.name}.releases"
+        self.repository_path = self.releases_path / self.repository_directory_name
+
+    def get_release_path(self, commit: str) -> Path:
+        return self.releases_path / commit[:12]
+
+    def get_live_release_path(self) -> Path | None:
+        if not self.live_path.is_symlink():
+            return None
+        return self.live_path.resolve()
+
+    def prepare(self, commit: str, sparse_checkout_paths: list[str] | None = None) -> Path:
+        release_path = self.get_release_path(commit)
+        repository = git.Repo(self.repository_path)
+        if release_path.exists():
+            if self.get_head_commit(release_path) == commit:
+                apply_sparse_checkout(git.Repo(release_path), sparse_checkout_paths)
+                release_path.touch()
+                return release_path
+            self._remove_release(repository, release_path)
+
+        repository.git.worktree("prune")
+        if not sparse_checkout_paths:
+            repository.git.worktree("add", "--detach", "--force", str(release_path), commit)
+            return release_path
+
+        repository.git.worktree("add", "--detach", "--force", "--no-checkout", str(release_path), commit)
+        release_repository = git.Repo(release_path)
+        apply_sparse_checkout(release_repository, sparse_checkout_paths)
+        release_repository.git.checkout(commit)
+        return release_path
+
+    def switch(self, release_path: Path) -> None:
+        if self.live_path.exists() and not self.live_path.is_symlink():
+            # installations deployed in place keep their directory as one more release until it is pruned
+            legacy_release_path = self.releases_path / f"legacy-{int(time.time())}"
+            os.rename(self.live_path, legacy_release_path)
+
+        replace_symlink(release_path, self.live_path)
+        Path(release_path).touch()
+
+    def get_releases(self) -> list[Path]:
+        if not self.releases_path.exists():
+            return []
+        release_paths = [
+            path for path in self.releases_path.iterdir()
+            if path.is_dir() and path.name != self.repository_directory_name
+        ]
+        return sorted(release_paths, key=lambda path: path.stat().st_mtime, reverse=True)
+
+    def prune(self, protected_release_paths: tuple[Path, ...] = ()) -> list[Path]:
+        live_release_path = self.get_live_release_path()
+        protected_release_paths = {Path(path).resolve() for path in protected_release_paths}
+        repository = git.Repo(self.repository_path)
+
+        pruned_release_paths = []
+        for release_path in self.get_releases()[self.keep_releases:]:
+            if release_path.resolve() == live_release_path or release_path.resolve() in protected_release_paths:
+                continue
+            self._remove_release(repository, release_path)
+            pruned_release_paths.append(release_path)
+        repository.git.worktree("prune")
+        return pruned_release_paths
+
+    @staticmethod
+    def _remove_release(repository, release_path: Path) -> None:
+        try:
+            repository.git.worktree("remove", "--force", str(release_path))
+        except git.GitCommandError:
+            shutil.rmtree(release_path, ignore_errors=True)
+
+    @staticmethod
+    def get_head_commit(path: Path) -> str | None:
+        try:
+            return git.Repo(path).head.commit.hexsha
+        except (git.InvalidGitRepositoryError, git.NoSuchPathError, ValueError):
+            return None
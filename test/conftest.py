@@ -0,0 +1,111 @@
+from pathlib import Path
+import socketserver
+import threading
+
+import pytest
+from git import Repo
+
+
+class GitRemote:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.bare_path = root / "remote.git"
+        self.source = Repo.init(root / "source", initial_branch="main")
+        with self.source.config_writer() as config:
+            config.set_value("user", "name", "Core Developer")
+            config.set_value("user", "email", "developer@core.com")
+        self.commit("README.md", "first version")
+        Repo.clone_from(self.source.working_dir, self.bare_path, bare=True)
+        self.source.create_remote("bare", str(self.bare_path))
+
+    def commit(self, file_name: str, content: str, message: str = None) -> str:
+        file_path = Path(self.source.working_dir) / file_name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+        self.source.index.add([file_name])
+        self.source.index.commit(message or f"update {file_name}")
+        return self.source.head.commit.hexsha
+
+    def tag(self, tag_name: str, annotated: bool = True, commit: str = "HEAD") -> None:
+        if annotated:
+            self.source.git.tag("-f", "-a", tag_name, commit, "-m", f"release {tag_name}")
+        else:
+            self.source.git.tag("-f", tag_name, commit)
+
+    def push(self) -> None:
+        self.source.git.push("--force", "bare", "main", "--tags")
+
+    def clone(self, name: str = "installation") -> Path:
+        installation_path = self.root / name
+        Repo.clone_from(str(self.bare_path), installation_path)
+        return installation_path
+
+
+@pytest.fixture
+def git_remote(tmp_path: Path) -> GitRemote:
+    return GitRemote(tmp_path)
+
+
+class LocalSmtpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), LocalSmtpHandler)
+        self.messages = []
+        self.connections_count = 0
+        self.disconnections_on_mail = 0
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class LocalSmtpHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        self.server.connections_count += 1
+        self._reply("220 localhost debugging server")
+        mail_from, rcpt_tos = None, []
+        while line := self.rfile.readline().decode().rstrip("\r\n"):
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO"):
+                self._reply("250 localhost")
+            elif command == "MAIL":
+                if self.server.disconnections_on_mail:
+                    self.server.disconnections_on_mail -= 1
+                    return
+                mail_from, rcpt_tos = line.split(":", 1)[1].strip("<> "), []
+                self._reply("250 OK")
+            elif command == "RCPT":
+                rcpt_tos.append(line.split(":", 1)[1].strip("<> "))
+                self._reply("250 OK")
+            elif command == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data_lines = []
+                while (data_line := self.rfile.readline().decode().rstrip("\r\n")) != ".":
+                    data_lines.append(data_line)
+                self.server.messages.append((mail_from, rcpt_tos, "\n".join(data_lines)))
+                self._reply("250 OK")
+            elif command in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif command == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+
+@pytest.fixture
+def smtp_server() -> LocalSmtpServer:
+    server = LocalSmtpServer()
+    yield server
+    server.stop()
@@ -1,13 +1,34 @@
+import json
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+import time
 from unittest.mock import (
+    ANY,
+    call,
     patch,
     MagicMock,
 )
 
 import pytest
 
-from src.app_updater import AppUpdater
+from src.app_updater import (
+    AppUpdater,
+    HealthCheckError,
+)
 from src.github_repository import GithubRepository
-from src.version_control_provider import VersionControlConfigs, VersionControlProvider
+from src.deployment_state import DeploymentState
+from src.environment_store import EnvironmentStore
+from src.release_changelog import ChangelogCache
+from src.requirements_diff import get_requirements_hash
+from src.update_pipeline import StageTimeoutError
+from src.version_control_provider import (
+    StaticConfigProvider,
+    VersionControlConfigs,
+    VersionControlProvider,
+)
+from src.worktree_deployer import WorktreeDeployer
 
 
 @pytest.fixture
@@ -18,6 +39,7 @@ def mock_github_repository() -> GithubRepository:
             'fake_organization_name',
             'fake_repository_name',
         )
+    github_repository.last_checkout_report = None
     return github_repository
 
 
@@ -33,27 +55,877 @@ def mock_version_control_provider() -> VersionControlProvider:
     yield FakeVersionControlProvider
 
 
-@patch.object(GithubRepository, 'change_source_code_version')
+@patch.object(GithubRepository, 'resolve_commit', side_effect=lambda commit: commit)
+@patch.object(GithubRepository, 'peel_commit', side_effect=lambda commit: commit)
+@patch.object(DeploymentState, 'update')
+@patch.object(GithubRepository, 'get_changed_files', return_value=[])
+@patch.object(GithubRepository, 'read_file', return_value=None)
+@patch.object(GithubRepository, 'get_local_head_commit', return_value='fake_previous_commit')
+@patch.object(GithubRepository, 'is_at_commit', return_value=False)
+@patch.object(GithubRepository, 'checkout_source_code_version')
+@patch.object(GithubRepository, 'fetch_source_code_version')
 @patch.object(GithubRepository, 'get_commit_sha_of_version_tag')
 def test_update_to_new_version(
     patched_get_commit_sha_of_version_tag: MagicMock,
-    patched_change_source_code_version: MagicMock,
+    patched_fetch_source_code_version: MagicMock,
+    patched_checkout_source_code_version: MagicMock,
+    patched_is_at_commit: MagicMock,
+    patched_get_local_head_commit: MagicMock,
+    patched_read_file: MagicMock,
+    patched_get_changed_files: MagicMock,
+    patched_deployment_state_update: MagicMock,
+    patched_peel_commit: MagicMock,
+    patched_resolve_commit: MagicMock,
     mock_github_repository: GithubRepository,
     mock_version_control_provider: VersionControlProvider,
 ):
     # prepare
-    fake_version_tag = 'fake_version_tag'
     fake_version_commit = 'fake_version_commit'
     patched_get_commit_sha_of_version_tag.return_value = fake_version_commit
+    app_updater = AppUpdater(version_control_provider=mock_version_control_provider)
 
     # test
-    AppUpdater(
-        version_control_provider=mock_version_control_provider
-    )._update_to_new_version(
-            mock_github_repository,
-            fake_version_tag,
-        )
+    with patch.object(AppUpdater, '_get_github_repository', return_value=mock_github_repository):
+        is_updated = app_updater.update_source_code_automaticaly()
+
+    # asserts
+    mock_github_repository.get_commit_sha_of_version_tag.assert_called_once_with('fake_version')
+    mock_github_repository.fetch_source_code_version.assert_called_once_with(fake_version_commit, is_prefetched=False)
+    mock_github_repository.checkout_source_code_version.assert_called_once_with(fake_version_commit)
+    assert patched_deployment_state_update.call_args_list[0] == call(
+        version='fake_version', commit=fake_version_commit
+    )
+    assert is_updated is True
+    assert app_updater.changes_made == [f"Se actualizo a la version fake_version - commit {fake_version_commit}\n\n"]
+
+
+@patch.object(GithubRepository, 'peel_commit', side_effect=lambda commit: commit)
+@patch.object(GithubRepository, 'is_at_commit', return_value=True)
+@patch.object(GithubRepository, 'fetch_source_code_version')
+@patch.object(GithubRepository, 'get_commit_sha_of_version_tag')
+def test_update_to_new_version_skips_when_already_at_target_commit(
+    patched_get_commit_sha_of_version_tag: MagicMock,
+    patched_fetch_source_code_version: MagicMock,
+    patched_is_at_commit: MagicMock,
+    patched_peel_commit: MagicMock,
+    mock_github_repository: GithubRepository,
+    mock_version_control_provider: VersionControlProvider,
+):
+    # prepare
+    fake_version_commit = 'fake_version_commit'
+    patched_get_commit_sha_of_version_tag.return_value = fake_version_commit
+    app_updater = AppUpdater(version_control_provider=mock_version_control_provider)
+
+    # test
+    with patch.object(AppUpdater, '_get_github_repository', return_value=mock_github_repository):
+        is_updated = app_updater.update_source_code_automaticaly()
+
+    # asserts
+    assert is_updated is False
+    patched_is_at_commit.assert_called_once_with(fake_version_commit)
+    patched_fetch_source_code_version.assert_not_called()
+    assert app_updater.changes_made == []
+    assert app_updater.update_pipeline.results["resolve"]["status"] == "stopped"
+    assert app_updater.update_pipeline.results["email"]["status"] == "skipped"
+
+
+def test_update_source_code_automaticaly_records_deployment_state(git_remote):
+    # prepare
+    previous_commit = git_remote.commit("app.py", "print('v1')")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    expected_commit = git_remote.commit("app.py", "print('v2')")
+    git_remote.tag("v2")
+    git_remote.push()
+
+    version_control_provider = StaticConfigProvider({
+        'token': 'fake_token',
+        'version': 'v2',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+    })
+    app_updater = AppUpdater(version_control_provider=version_control_provider)
+
+    # test
+    is_updated = app_updater.update_source_code_automaticaly()
+    is_updated_again = app_updater.update_source_code_automaticaly()
+
+    # asserts
+    assert is_updated is True
+    assert is_updated_again is False
+    deployment_state = DeploymentState.for_installation(installation_path).read()
+    assert deployment_state['version'] == 'v2'
+    assert deployment_state['commit'] == expected_commit
+    assert [release['commit'] for release in deployment_state['history']] == [expected_commit, previous_commit]
+
+
+def test_update_records_the_commit_of_annotated_tags_resolved_to_their_tag_object(git_remote):
+    # prepare
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    expected_commit = git_remote.commit("app.py", "print('v2')")
+    git_remote.tag("v2")
+    git_remote.push()
+    tag_object = git_remote.source.tags["v2"].tag.hexsha
+    version_control_data = {
+        'token': 'fake_token',
+        'version': 'v2',
+        'local_repository_path': installation_path,
+    }
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider(version_control_data))
+
+    # test
+    with patch.object(GithubRepository, 'get_commit_sha_of_version_tag', return_value=tag_object):
+        is_updated = app_updater.update_source_code_automaticaly()
+        is_deployed = app_updater.is_deployed(version_control_data)
+
+    # asserts
+    deployment_state = DeploymentState.for_installation(installation_path).read()
+    assert is_updated is True
+    assert is_deployed is True
+    assert deployment_state["commit"] == expected_commit
+    assert deployment_state["history"][0]["commit"] == expected_commit
+
+
+def test_is_deployed_resolves_moving_tags_to_their_commit(git_remote):
+    # prepare
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.tag("qa")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    version_control_provider = StaticConfigProvider({
+        'token': 'fake_token',
+        'version': 'qa',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+    })
+    app_updater = AppUpdater(version_control_provider=version_control_provider)
+    github_repository = app_updater._get_github_repository(version_control_provider.get_config())
+
+    # test
+    is_deployed = app_updater.is_deployed(version_control_provider.get_config())
+    expected_commit = git_remote.commit("app.py", "print('v2')")
+    git_remote.tag("qa")
+    git_remote.push()
+    is_deployed_after_moving_the_tag = app_updater.is_deployed(version_control_provider.get_config())
+    is_updated = app_updater.update_source_code_automaticaly()
+
+    # asserts
+    assert is_deployed is True
+    assert is_deployed_after_moving_the_tag is False
+    assert is_updated is True
+    assert DeploymentState.for_installation(installation_path).get("commit") == expected_commit
+    assert app_updater.update_pipeline.context["resolve"]["github_repository"] is github_repository
+
+
+def get_installation_with_requirements(git_remote, requirements: str):
+    git_remote.commit("requirements.txt", requirements)
+    git_remote.tag("v1")
+    git_remote.push()
+    return git_remote.clone()
+
+
+def update_installation(installation_path, version: str) -> AppUpdater:
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider({
+        'token': 'fake_token',
+        'version': version,
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+    }))
+    app_updater.update_source_code_automaticaly()
+    return app_updater
+
+
+@patch.object(AppUpdater, 'prefetch_wheels', False)
+@patch.object(AppUpdater, '_run_pip', return_value=True)
+def test_install_dependencies_only_installs_changed_requirements(patched_run_pip: MagicMock, git_remote):
+    # prepare
+    installation_path = get_installation_with_requirements(git_remote, "requests==2.31.0\npyyaml==6.0\n")
+    DeploymentState.for_installation(installation_path).update(
+        requirements_hash=get_requirements_hash("requests==2.31.0\npyyaml==6.0\n"),
+    )
+    git_remote.commit("requirements.txt", "requests==2.32.0\npyyaml==6.0\npygithub==1.59.0\n")
+    git_remote.tag("v2")
+    git_remote.push()
+
+    # test
+    update_installation(installation_path, "v2")
+
+    # asserts
+    patched_run_pip.assert_called_once_with(["install", "pygithub==1.59.0", "requests==2.32.0"], timeout_seconds=ANY)
+    assert DeploymentState.for_installation(installation_path).get("requirements_hash") == get_requirements_hash(
+        "requests==2.32.0\npyyaml==6.0\npygithub==1.59.0\n"
+    )
+
+
+@patch.object(AppUpdater, 'prefetch_wheels', False)
+@patch.object(AppUpdater, '_run_pip', return_value=True)
+def test_install_dependencies_is_skipped_when_requirements_did_not_change(patched_run_pip: MagicMock, git_remote):
+    # prepare
+    installation_path = get_installation_with_requirements(git_remote, "requests==2.31.0\n")
+    git_remote.commit("app.py", "print('v2')")
+    git_remote.tag("v2")
+    git_remote.push()
+
+    # test
+    update_installation(installation_path, "v2")
+
+    # asserts
+    patched_run_pip.assert_not_called()
+    assert DeploymentState.for_installation(installation_path).get("requirements_hash") == get_requirements_hash(
+        "requests==2.31.0\n"
+    )
+
+
+@patch.object(AppUpdater, 'prefetch_wheels', False)
+@patch.object(AppUpdater, '_run_pip', return_value=True)
+def test_install_dependencies_installs_everything_when_installed_state_is_unknown(
+    patched_run_pip: MagicMock,
+    git_remote,
+):
+    # prepare
+    installation_path = get_installation_with_requirements(git_remote, "requests==2.31.0\n")
+    git_remote.commit("requirements.txt", "requests==2.32.0\n")
+    git_remote.tag("v2")
+    git_remote.push()
+
+    # test
+    update_installation(installation_path, "v2")
+
+    # asserts
+    patched_run_pip.assert_called_once_with(
+        ["install", "-r", str(installation_path / "requirements.txt")], timeout_seconds=ANY
+    )
+
+
+@patch.object(AppUpdater, 'prefetch_wheels', False)
+@patch.object(AppUpdater, '_run_pip')
+def test_failed_install_dependencies_is_retried_on_the_next_run(patched_run_pip: MagicMock, git_remote):
+    # prepare
+    installation_path = get_installation_with_requirements(git_remote, "requests==2.31.0\n")
+    DeploymentState.for_installation(installation_path).update(
+        requirements_hash=get_requirements_hash("requests==2.31.0\n"),
+    )
+    git_remote.commit("requirements.txt", "requests==2.32.0\n")
+    git_remote.tag("v2")
+    git_remote.push()
+    patched_run_pip.side_effect = [subprocess.CalledProcessError(1, "pip"), None]
+
+    # test
+    with pytest.raises(subprocess.CalledProcessError):
+        update_installation(installation_path, "v2")
+    state_after_failure = DeploymentState.for_installation(installation_path).read()
+    app_updater = update_installation(installation_path, "v2")
+
+    # asserts
+    assert state_after_failure["requirements_hash"] == get_requirements_hash("requests==2.31.0\n")
+    assert app_updater.update_pipeline.results["dependencies"]["status"] == "succeeded"
+    assert patched_run_pip.call_args_list == [
+        call(["install", "requests==2.32.0"], timeout_seconds=ANY),
+        call(["install", "-r", str(installation_path / "requirements.txt")], timeout_seconds=ANY),
+    ]
+    assert DeploymentState.for_installation(installation_path).get("requirements_hash") == get_requirements_hash(
+        "requests==2.32.0\n"
+    )
+
+
+def test_run_pip_reports_the_result_of_each_command(capsys):
+    # prepare
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider({}))
+
+    # test
+    with patch.object(AppUpdater, 'pip_command', (sys.executable, "-c", "pass")):
+        app_updater._run_pip(["download", "--dest", "wheels", "requests==2.32.0"])
+        app_updater._run_pip(["uninstall", "--yes", "pyyaml"])
+    with patch.object(AppUpdater, 'pip_command', (sys.executable, "-c", "raise SystemExit(1)")):
+        with pytest.raises(subprocess.CalledProcessError):
+            app_updater._run_pip(["download", "--dest", "wheels", "requests==2.32.0"])
+
+    # asserts
+    assert capsys.readouterr().out.splitlines() == [
+        "Dependencias descargadas con éxito.",
+        "Dependencias desinstaladas con éxito.",
+        "Hubo un error al descargar las dependencias.",
+    ]
+
+
+@patch.object(EnvironmentStore, '_build_environment')
+def test_update_switches_to_the_environment_of_the_new_requirements(
+    patched_build_environment: MagicMock,
+    git_remote,
+    tmp_path,
+):
+    # prepare
+    installation_path = get_installation_with_requirements(git_remote, "requests==2.31.0\n")
+    git_remote.commit("requirements.txt", "requests==2.32.0\n")
+    git_remote.tag("v2")
+    git_remote.push()
+    environment_store = EnvironmentStore(tmp_path / "environments")
+    app_updater = AppUpdater(
+        version_control_provider=StaticConfigProvider({
+            'token': 'fake_token',
+            'version': 'v2',
+            'local_repository_path': installation_path,
+            'ref_resolver': 'remote',
+        }),
+        environment_store=environment_store,
+    )
+
+    # test
+    app_updater.update_source_code_automaticaly()
+
+    # asserts
+    expected_environment_path = environment_store.get_environment_path(get_requirements_hash("requests==2.32.0\n"))
+    link_path = installation_path.parent / f".{installation_path.name}.venv"
+    assert link_path.resolve() == expected_environment_path.resolve()
+    assert DeploymentState.for_installation(installation_path).get("environment") == str(expected_environment_path)
+
+
+@patch.object(AppUpdater, '_run_pip', return_value=True)
+def test_install_dependencies_uses_wheels_downloaded_during_checkout(patched_run_pip: MagicMock, git_remote, tmp_path):
+    # prepare
+    installation_path = get_installation_with_requirements(git_remote, "requests==2.31.0\n")
+    DeploymentState.for_installation(installation_path).update(
+        requirements_hash=get_requirements_hash("requests==2.31.0\n"),
+    )
+    git_remote.commit("requirements.txt", "requests==2.32.0\n")
+    git_remote.tag("v2")
+    git_remote.push()
+    wheels_path = tmp_path / "wheels"
+
+    # test
+    with patch.object(AppUpdater, 'wheels_path', wheels_path):
+        app_updater = update_installation(installation_path, "v2")
+
+    # asserts
+    assert patched_run_pip.call_args_list == [
+        call(["download", "--dest", str(wheels_path), "requests==2.32.0"]),
+        call(["install", "requests==2.32.0", "--find-links", str(wheels_path)], timeout_seconds=ANY),
+    ]
+    assert app_updater.update_pipeline.results["prefetch_dependencies"]["status"] == "succeeded"
+
+
+@patch.object(GithubRepository, 'get_rate_limit_remaining', side_effect=[4999, 4997])
+def test_update_writes_metrics_of_the_run(patched_get_rate_limit_remaining: MagicMock, git_remote, tmp_path):
+    # prepare
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    git_remote.commit("app.py", "print('v2')")
+    git_remote.commit("other.py", "print('v2')")
+    git_remote.tag("v2")
+    git_remote.push()
+    metrics_directory = tmp_path / "metrics"
+
+    app_updater = AppUpdater(
+        version_control_provider=StaticConfigProvider({
+            'token': 'fake_token',
+            'version': 'v2',
+            'local_repository_path': installation_path,
+            'ref_resolver': 'remote',
+        }),
+        metrics_directory=metrics_directory,
+    )
+
+    # test
+    app_updater.update_source_code_automaticaly()
+
+    # asserts
+    run_record = json.loads((metrics_directory / "app_updater_runs.jsonl").read_text().splitlines()[-1])
+    assert run_record["installation"] == "installation"
+    assert run_record["statuses"]["checkout"] == "succeeded"
+    assert set(run_record["durations_seconds"]) >= {"total", "config", "resolve", "fetch", "checkout"}
+    assert run_record["values"]["updated"] == 1
+    assert run_record["values"]["checkout_files_changed"] == 2
+    assert run_record["values"]["fetch_objects"] > 0
+    assert run_record["values"]["github_rate_limit_remaining_before"] == 4999
+    assert run_record["values"]["github_rate_limit_remaining_after"] == 4997
+    rate_limit_before = app_updater.update_pipeline.results["rate_limit_before"]
+    resolve = app_updater.update_pipeline.results["resolve"]
+    assert resolve["started_at"] >= rate_limit_before["started_at"] + rate_limit_before["duration_seconds"]
+
+    prometheus_text = (metrics_directory / "app_updater_installation.prom").read_text()
+    assert 'app_updater_stage_duration_seconds{installation="installation",stage="fetch"}' in prometheus_text
+    assert 'app_updater_checkout_files_changed{installation="installation"} 2' in prometheus_text
+
+
+def test_update_builds_the_changelog_from_the_local_history(git_remote, tmp_path):
+    # prepare
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    previous_commit = git_remote.commit("app.py", "print('v2')\nprint('done')", message="print done")
+    version_commit = git_remote.commit("other.py", "print('v2')", message="add other")
+    git_remote.tag("v2")
+    git_remote.push()
+    changelog_cache = ChangelogCache(tmp_path / "changelogs")
+
+    app_updater = AppUpdater(
+        version_control_provider=StaticConfigProvider({
+            'token': 'fake_token',
+            'version': 'v2',
+            'local_repository_path': installation_path,
+            'ref_resolver': 'remote',
+        }),
+        changelog_cache=changelog_cache,
+    )
+
+    # test
+    app_updater.update_source_code_automaticaly()
+
+    # asserts
+    changelog = app_updater.update_pipeline.context["changelog"]
+    assert changelog["commits_count"] == 2
+    assert changelog["authors"] == {"Core Developer": 2}
+    assert changelog["files_changed"] == 2
+    assert changelog["insertions"] == 3
+    assert [commit["sha"] for commit in changelog["commits"]] == [version_commit, previous_commit]
+    assert changelog_cache.misses_count == 1
+
+
+def test_rollback_restores_the_previous_release_in_place(git_remote):
+    # prepare
+    previous_commit = git_remote.commit("app.py", "print('v1')")
+    git_remote.tag("v1")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    git_remote.commit("app.py", "print('v2')")
+    git_remote.tag("v2")
+    git_remote.push()
+    version_control_data = {
+        'token': 'fake_token',
+        'version': 'v2',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+    }
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider(version_control_data))
+    app_updater.update_source_code_automaticaly()
+
+    # test
+    release = app_updater.rollback()
+
+    # asserts
+    assert release["commit"] == previous_commit
+    assert (installation_path / "app.py").read_text() == "print('v1')"
+    assert DeploymentState.for_installation(installation_path).get("commit") == previous_commit
+    assert app_updater.changes_made[-1] == f"Se revirtio a la version None - commit {previous_commit}\n\n"
+
+
+def test_rollback_switches_back_to_a_kept_worktree_release(git_remote, tmp_path):
+    # prepare
+    installation_path = tmp_path / "installation"
+    release_commits = []
+    for version in ("v1", "v2"):
+        release_commits.append(git_remote.commit("app.py", f"print('{version}')"))
+        git_remote.tag(version)
+    git_remote.push()
+    version_control_data = {
+        'token': 'fake_token',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+        'repository_url': git_remote.bare_path.as_uri(),
+        'deploy_mode': 'worktree',
+    }
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider(version_control_data))
+    for version in ("v1", "v2"):
+        app_updater.update_source_code_automaticaly(version_control_data | {'version': version})
+
+    # test
+    with patch.object(GithubRepository, 'checkout_worktree') as patched_checkout_worktree:
+        release = app_updater.rollback(version_control_data, commit=release_commits[0][:8])
+
+    # asserts
+    patched_checkout_worktree.assert_not_called()
+    assert release["version"] == "v1"
+    assert installation_path.resolve() == WorktreeDeployer(installation_path).get_release_path(release_commits[0])
+    assert DeploymentState.for_installation(installation_path).get("version") == "v1"
+
+
+def test_update_rolls_back_when_the_health_check_fails(git_remote):
+    # prepare
+    previous_commit = git_remote.commit("app.py", "print('v1')")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    git_remote.commit("app.py", "raise SystemExit(1)")
+    git_remote.tag("v2")
+    git_remote.push()
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider({
+        'token': 'fake_token',
+        'version': 'v2',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+        'health_check_command': 'python app.py',
+    }))
+
+    # test
+    with pytest.raises(HealthCheckError, match="exit code 1"):
+        app_updater.update_source_code_automaticaly()
+
+    # asserts
+    assert (installation_path / "app.py").read_text() == "print('v1')"
+    assert DeploymentState.for_installation(installation_path).get("commit") == previous_commit
+    assert app_updater.update_pipeline.results["release_history"]["status"] == "skipped"
+    assert app_updater.update_pipeline.results["email"]["status"] == "skipped"
+
+
+def test_rolled_back_release_is_skipped_until_the_version_changes(git_remote):
+    # prepare
+    previous_commit = git_remote.commit("app.py", "print('v1')")
+    git_remote.tag("v1")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    git_remote.commit("app.py", "raise SystemExit(1)")
+    git_remote.tag("v2")
+    git_remote.push()
+    version_control_data = {
+        'token': 'fake_token',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+        'health_check_command': 'python app.py',
+    }
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider(version_control_data))
+    with pytest.raises(HealthCheckError):
+        app_updater.update_source_code_automaticaly(version_control_data | {'version': 'v2'})
+
+    # test
+    is_updated = app_updater.update_source_code_automaticaly(version_control_data | {'version': 'v2'})
+    is_deployed = app_updater.is_deployed(version_control_data | {'version': 'v2'})
+    app_updater.update_source_code_automaticaly(version_control_data | {'version': 'v1'})
+    with pytest.raises(HealthCheckError):
+        app_updater.update_source_code_automaticaly(version_control_data | {'version': 'v2'})
+
+    # asserts
+    assert is_updated is False
+    assert is_deployed is True
+    assert DeploymentState.for_installation(installation_path).get("commit") == previous_commit
+
+
+def test_rollback_is_not_undone_by_the_next_update(git_remote):
+    # prepare
+    previous_commit = git_remote.commit("app.py", "print('v1')")
+    git_remote.tag("v1")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    git_remote.commit("app.py", "print('v2')")
+    git_remote.tag("v2")
+    git_remote.push()
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider({
+        'token': 'fake_token',
+        'version': 'v2',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+    }))
+    app_updater.update_source_code_automaticaly()
+    app_updater.rollback()
+
+    # test
+    is_updated = app_updater.update_source_code_automaticaly()
+
+    # asserts
+    assert is_updated is False
+    assert app_updater.update_pipeline.results["resolve"]["status"] == "stopped"
+    assert DeploymentState.for_installation(installation_path).get("commit") == previous_commit
+
+
+def get_updated_installation_with_requirements(git_remote, tmp_path) -> tuple:
+    installation_path = get_installation_with_requirements(git_remote, "requests==2.31.0\n")
+    previous_commit = git_remote.source.head.commit.hexsha
+    DeploymentState.for_installation(installation_path).update(
+        requirements_hash=get_requirements_hash("requests==2.31.0\n"),
+    )
+    git_remote.commit("requirements.txt", "requests==2.32.0\n")
+    git_remote.tag("v2")
+    git_remote.push()
+    with patch.object(AppUpdater, '_run_pip'), patch.object(AppUpdater, 'wheels_path', tmp_path / "wheels"):
+        app_updater = update_installation(installation_path, "v2")
+    return app_updater, installation_path, previous_commit
+
+
+@patch.object(AppUpdater, '_run_pip')
+def test_rollback_installs_the_requirements_from_the_index_without_cached_wheels(
+    patched_run_pip: MagicMock,
+    git_remote,
+    tmp_path,
+):
+    # prepare
+    app_updater, installation_path, previous_commit = get_updated_installation_with_requirements(git_remote, tmp_path)
+    patched_run_pip.side_effect = [subprocess.CalledProcessError(1, "pip"), None]
+
+    # test
+    with patch.object(AppUpdater, 'wheels_path', tmp_path / "wheels"):
+        app_updater.rollback()
+
+    # asserts
+    requirements_hash = get_requirements_hash("requests==2.31.0\n")
+    requirements_path = tmp_path / "wheels" / f"requirements-{requirements_hash}.txt"
+    pip_arguments = ["--find-links", str(tmp_path / "wheels"), "-r", str(requirements_path)]
+    assert patched_run_pip.call_args_list == [
+        call(["install", "--no-index", *pip_arguments]),
+        call(["install", *pip_arguments]),
+    ]
+    assert requirements_path.read_text() == "requests==2.31.0\n"
+    assert DeploymentState.for_installation(installation_path).get("commit") == previous_commit
+
+
+@patch.object(AppUpdater, '_run_pip', side_effect=subprocess.CalledProcessError(1, "pip"))
+def test_failed_rollback_install_keeps_the_code_and_rejects_the_release(
+    patched_run_pip: MagicMock,
+    git_remote,
+    tmp_path,
+):
+    # prepare
+    app_updater, installation_path, _ = get_updated_installation_with_requirements(git_remote, tmp_path)
+    version_commit = DeploymentState.for_installation(installation_path).get("commit")
+
+    # test
+    with patch.object(AppUpdater, 'wheels_path', tmp_path / "wheels"), pytest.raises(subprocess.CalledProcessError):
+        app_updater.rollback(app_updater.version_control_provider.get_config())
+    is_updated = app_updater.update_source_code_automaticaly()
+
+    # asserts
+    deployment_state = DeploymentState.for_installation(installation_path).read()
+    assert (installation_path / "requirements.txt").read_text() == "requests==2.32.0\n"
+    assert deployment_state["commit"] == version_commit
+    assert deployment_state["rejected_release"] == {"version": "v2", "commit": version_commit}
+    assert is_updated is False
+
+
+@patch.object(EnvironmentStore, '_build_environment')
+def test_rollback_rebuilds_an_evicted_environment(patched_build_environment: MagicMock, git_remote, tmp_path):
+    # prepare
+    installation_path = get_installation_with_requirements(git_remote, "requests==2.31.0\n")
+    git_remote.commit("requirements.txt", "requests==2.32.0\n")
+    git_remote.tag("v2")
+    git_remote.push()
+    environment_store = EnvironmentStore(tmp_path / "environments")
+    version_control_data = {
+        'token': 'fake_token',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+    }
+    app_updater = AppUpdater(
+        version_control_provider=StaticConfigProvider(version_control_data),
+        environment_store=environment_store,
+    )
+    for version in ("v1", "v2"):
+        app_updater.update_source_code_automaticaly(version_control_data | {'version': version})
+    previous_environment_path = environment_store.get_environment_path(get_requirements_hash("requests==2.31.0\n"))
+    shutil.rmtree(previous_environment_path, ignore_errors=True)
+
+    # test
+    app_updater.rollback(version_control_data | {'version': 'v2'})
+
+    # asserts
+    assert patched_build_environment.call_args_list[-1].args[0] == previous_environment_path
+    link_path = installation_path.parent / f".{installation_path.name}.venv"
+    assert previous_environment_path.exists()
+    assert link_path.resolve() == previous_environment_path.resolve()
+    assert DeploymentState.for_installation(installation_path).get("environment") == str(previous_environment_path)
+
+
+def test_update_only_migrates_the_apps_with_changed_migrations(git_remote, tmp_path):
+    # prepare
+    migrations_log_path = tmp_path / "migrations.log"
+    migrate_script = f"import sys\nopen({str(migrations_log_path)!r}, 'a').write(repr(sys.argv[1:]))"
+    git_remote.commit("migrate.py", migrate_script)
+    git_remote.commit("billing/migrations/0001_initial.py", "")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    git_remote.commit("billing/migrations/0002_invoice_total.py", "")
+    git_remote.commit("users/views.py", "")
+    git_remote.tag("v2")
+    expected_commit = git_remote.commit("users/templates.py", "")
+    git_remote.tag("v3")
+    git_remote.push()
+    version_control_data = {
+        'token': 'fake_token',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+        'migration_command': 'python migrate.py',
+    }
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider(version_control_data))
+    installed_commit = app_updater._get_github_repository(version_control_data).get_local_head_commit()
+    DeploymentState.for_installation(installation_path).update(migrations=installed_commit)
+
+    # test
+    app_updater.update_source_code_automaticaly(version_control_data | {'version': 'v2'})
+    migrated_apps = app_updater.update_pipeline.context["migrations"]
+    app_updater.update_source_code_automaticaly(version_control_data | {'version': 'v3'})
+
+    # asserts
+    assert migrated_apps == ["billing"]
+    assert migrations_log_path.read_text() == "['billing']"
+    assert app_updater.update_pipeline.context["plan_migrations"] is None
+    assert app_updater.update_pipeline.results["migrations"]["status"] == "succeeded"
+    assert DeploymentState.for_installation(installation_path).get("migrations") == expected_commit
+
+
+def test_update_migrates_every_app_when_the_migrated_commit_is_unknown(git_remote, tmp_path):
+    # prepare
+    migrations_log_path = tmp_path / "migrations.log"
+    migrate_script = f"import sys\nopen({str(migrations_log_path)!r}, 'a').write(repr(sys.argv[1:]))"
+    git_remote.commit("migrate.py", migrate_script)
+    git_remote.tag("v1")
+    git_remote.push()
+    installation_path = tmp_path / "installation"
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider({
+        'token': 'fake_token',
+        'version': 'v1',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+        'repository_url': git_remote.bare_path.as_uri(),
+        'migration_command': 'python migrate.py',
+    }))
+
+    # test
+    app_updater.update_source_code_automaticaly()
+    app_updater.update_source_code_automaticaly()
+
+    # asserts
+    assert migrations_log_path.read_text() == "[]"
+    assert len(app_updater.changes_made) == 2
+    assert app_updater.changes_made[-1] == "Se aplicaron las migraciones de todas las apps\n\n"
+
+
+def test_timed_out_migration_is_stopped_before_the_update_returns(git_remote, tmp_path):
+    # prepare
+    pid_path = tmp_path / "migration.pid"
+    migrate_script = f"import os, time\nopen({str(pid_path)!r}, 'w').write(str(os.getpid()))\ntime.sleep(30)"
+    git_remote.commit("migrate.py", migrate_script)
+    git_remote.tag("v1")
+    git_remote.push()
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider({
+        'token': 'fake_token',
+        'version': 'v1',
+        'local_repository_path': tmp_path / "installation",
+        'ref_resolver': 'remote',
+        'repository_url': git_remote.bare_path.as_uri(),
+        'migration_command': 'python migrate.py',
+    }))
+
+    # test
+    with patch.dict(AppUpdater.stage_timeouts_seconds, {"migrations": 1}):
+        with pytest.raises((StageTimeoutError, subprocess.TimeoutExpired)):
+            app_updater.update_source_code_automaticaly()
+
+    # asserts
+    assert app_updater.update_pipeline.results["migrations"]["status"] in ("timed_out", "failed")
+    assert is_process_stopped(int(pid_path.read_text()))
+
+
+def is_process_stopped(pid: int) -> bool:
+    # the killed process is reaped by init, so it can still show up as a zombie for a moment
+    status_path = Path(f"/proc/{pid}/status")
+    for _ in range(50):
+        if not status_path.exists() or "zombie" in status_path.read_text():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_failed_migration_is_retried_on_the_next_run(git_remote, tmp_path):
+    # prepare
+    migrations_log_path = tmp_path / "migrations.log"
+    migrate_script = (
+        "import pathlib, sys\n"
+        f"log_path = pathlib.Path({str(migrations_log_path)!r})\n"
+        "is_first_run = not log_path.exists()\n"
+        "log_path.write_text(log_path.read_text() + 'run;' if log_path.exists() else 'run;')\n"
+        "sys.exit(1 if is_first_run else 0)"
+    )
+    git_remote.commit("migrate.py", migrate_script)
+    git_remote.push()
+    installation_path = git_remote.clone()
+    expected_commit = git_remote.commit("billing/migrations/0001_initial.py", "")
+    git_remote.tag("v2")
+    git_remote.push()
+    version_control_data = {
+        'token': 'fake_token',
+        'version': 'v2',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+        'migration_command': 'python migrate.py',
+    }
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider(version_control_data))
+
+    # test
+    with pytest.raises(subprocess.CalledProcessError):
+        app_updater.update_source_code_automaticaly()
+    app_updater.update_source_code_automaticaly()
+
+    # asserts
+    assert migrations_log_path.read_text() == "run;run;"
+    assert app_updater.update_pipeline.results["resolve"]["status"] == "succeeded"
+    assert app_updater.update_pipeline.results["migrations"]["status"] == "succeeded"
+    assert DeploymentState.for_installation(installation_path).get("migrations") == expected_commit
+
+
+@patch.object(AppUpdater, '_run_pip', return_value=True)
+def test_prefetched_release_only_needs_a_local_checkout(patched_run_pip: MagicMock, git_remote, tmp_path):
+    # prepare
+    wheels_path = tmp_path / "wheels"
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    expected_commit = git_remote.commit("requirements.txt", "PyYAML==6.0\n")
+    git_remote.tag("qa")
+    git_remote.push()
+    version_control_data = {
+        'token': 'fake_token',
+        'version': 'qa',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+        'prefetch_tags': ['qa', 'missing'],
+    }
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider(version_control_data))
+
+    # test
+    with patch.object(AppUpdater, 'wheels_path', wheels_path):
+        prefetched_releases = app_updater.prefetch_releases()
+        prefetched_again = app_updater.prefetch_releases()
+        with patch('git.Remote.fetch') as patched_fetch:
+            is_updated = app_updater.update_source_code_automaticaly()
+
+    # asserts
+    assert [release['commit'] for release in prefetched_releases] == [expected_commit]
+    assert prefetched_releases[0]['requirements_hash'] == get_requirements_hash("PyYAML==6.0\n")
+    assert prefetched_releases[0]['bytes'] > 0
+    assert prefetched_again == []
+    assert patched_run_pip.call_args_list[0].args[0][:3] == ["download", "--dest", str(wheels_path)]
+    assert is_updated is True
+    patched_fetch.assert_not_called()
+    assert (installation_path / "requirements.txt").read_text() == "PyYAML==6.0\n"
+
+
+@patch('src.app_updater.time.sleep')
+def test_prefetch_releases_respects_the_bandwidth_and_disk_limits(patched_sleep: MagicMock, git_remote):
+    # prepare
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    for version in ("qa", "v2", "v3"):
+        git_remote.commit("app.py", f"print('{version}')")
+        git_remote.tag(version)
+    git_remote.push()
+    version_control_data = {
+        'token': 'fake_token',
+        'version': 'v1',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+        'prefetch_tags': ['qa', 'v2', 'v3'],
+        'prefetch_max_bytes_per_second': 1,
+    }
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider(version_control_data))
+
+    # test
+    prefetched_with_disk_limit = app_updater.prefetch_releases(version_control_data | {'prefetch_max_disk_bytes': 1})
+    prefetched_state = DeploymentState.for_installation(installation_path).get("prefetched_releases")
+    prefetched_without_disk_limit = app_updater.prefetch_releases()
 
     # asserts
-    mock_github_repository.get_commit_sha_of_version_tag.assert_called_once_with(fake_version_tag)
-    mock_github_repository.change_source_code_version.assert_called_once_with(fake_version_commit)
+    assert [release['version'] for release in prefetched_with_disk_limit] == ['qa']
+    assert list(prefetched_state) == ['qa']
+    assert [release['version'] for release in prefetched_without_disk_limit] == ['v2', 'v3']
+    assert patched_sleep.call_count == 1
+    assert patched_sleep.call_args.args[0] > 0
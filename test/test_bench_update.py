@@ -0,0 +1,44 @@
+from unittest.mock import patch
+
+import requests
+
+from benchmarks.api_stub import ApiStubServer
+from benchmarks.bench_update import compare_results, run_benchmark
+from benchmarks.git_fixtures import SyntheticRepository
+from src.github_repository import GithubRepository
+
+
+def test_run_benchmark_times_every_scenario(tmp_path):
+    # test
+    results = run_benchmark(tmp_path, repeats=1, commits=20, files=10, diff_commits=5, tags=2)
+
+    # asserts
+    assert results["scenarios"]["cold_clone"]["is_updated"] is True
+    assert results["scenarios"]["no_op"]["is_updated"] is False
+    assert results["scenarios"]["large_diff"]["is_updated"] is True
+    assert set(results["scenarios"]["large_diff"]["stages_seconds"]) >= {"config", "resolve", "fetch", "checkout"}
+    assert compare_results(results, results)[1].endswith("+0.0%")
+
+
+def test_api_stub_server_serves_tags_with_etags(tmp_path):
+    # prepare
+    remote = SyntheticRepository(tmp_path / "remote.git", files=5)
+    remote.add_commits(2)
+    expected_commit = remote.tag("v1")
+
+    with ApiStubServer(remote) as api_stub_server:
+        url = f"{api_stub_server.url}/repos/core-webapp/core_legacy/git/ref/tags/v1"
+
+        # test
+        response = requests.get(url)
+        not_modified_response = requests.get(url, headers={"If-None-Match": response.headers["ETag"]})
+        with patch.object(GithubRepository, 'api_base_url', api_stub_server.url):
+            github_repository = GithubRepository("fake_token", "core-webapp", tmp_path / "installation", "core_legacy")
+            pygithub_release = github_repository.last_release
+
+    # asserts
+    assert response.json()["object"]["type"] == "tag"
+    assert remote.get_tag_object("v1")[0] == response.json()["object"]["sha"] != expected_commit
+    assert not_modified_response.status_code == 304
+    assert not_modified_response.headers["X-RateLimit-Remaining"] == response.headers["X-RateLimit-Remaining"]
+    assert pygithub_release == "v1"
@@ -0,0 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from src.deployment_state import DeploymentState
+
+
+def test_concurrent_updates_keep_every_value(tmp_path):
+    # prepare
+    installation_path = tmp_path / "installation"
+    keys = [f"key_{index}" for index in range(20)]
+
+    # test
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(
+            lambda key: DeploymentState.for_installation(installation_path).update(**{key: key}), keys
+        ))
+
+    # asserts
+    assert DeploymentState.for_installation(installation_path).read() == {key: key for key in keys}
@@ -0,0 +1,119 @@
+import smtplib
+from unittest.mock import (
+    ANY,
+    patch,
+    MagicMock,
+)
+
+import pytest
+
+from src.email_sender import EmailSender
+
+
+def get_email_sender(smtp_server) -> EmailSender:
+    return EmailSender('updater@core.com', None, host='127.0.0.1', port=smtp_server.port, use_tls=False)
+
+
+def test_send_email_reuses_one_connection_for_every_recipient(smtp_server):
+    # prepare
+    email_sender = get_email_sender(smtp_server)
+    developers = ['dev1@core.com', 'dev2@core.com', 'dev3@core.com']
+
+    # test
+    with patch.object(EmailSender, 'max_recipients_per_message', 2), email_sender:
+        email_sender.send_email(developers, 'actualizacion Core', 'first update')
+        email_sender.send_email(developers, 'actualizacion Core', 'second update')
+
+    # asserts
+    assert smtp_server.connections_count == 1
+    assert [rcpt_tos for _, rcpt_tos, _ in smtp_server.messages] == [
+        ['dev1@core.com', 'dev2@core.com'], ['dev3@core.com'],
+        ['dev1@core.com', 'dev2@core.com'], ['dev3@core.com'],
+    ]
+    assert 'To: dev1@core.com, dev2@core.com' in smtp_server.messages[0][2]
+
+
+@patch.object(EmailSender, 'retry_delay_seconds', 0)
+def test_send_email_reconnects_when_the_server_drops_the_connection(smtp_server):
+    # prepare
+    email_sender = get_email_sender(smtp_server)
+    smtp_server.disconnections_on_mail = 1
+
+    # test
+    with email_sender:
+        email_sender.send_email('dev1@core.com', 'actualizacion Core', 'update')
+
+    # asserts
+    assert smtp_server.connections_count == 2
+    assert len(smtp_server.messages) == 1
+    assert email_sender.connections_count == 2
+
+
+def test_send_email_in_background_delivers_queued_emails(smtp_server):
+    # prepare
+    email_sender = get_email_sender(smtp_server)
+
+    # test
+    email_sender.send_email_in_background(['dev1@core.com'], 'actualizacion Core', 'first update')
+    email_sender.send_email_in_background(['dev2@core.com'], 'actualizacion Core', 'second update')
+    email_sender.wait_for_delivery()
+
+    # asserts
+    assert [rcpt_tos for _, rcpt_tos, _ in smtp_server.messages] == [['dev1@core.com'], ['dev2@core.com']]
+    assert email_sender.delivery_errors == []
+    assert email_sender._server is None
+
+
+@patch('src.email_sender.smtplib.SMTP')
+def test_get_email_server_starts_tls_before_login(patched_smtp: MagicMock):
+    # prepare
+    email_sender = EmailSender('updater@core.com', 'password')
+
+    # test
+    email_sender.send_email('dev1@core.com', 'actualizacion Core', 'update')
+
+    # asserts
+    server = patched_smtp.return_value
+    assert [method_call[0] for method_call in server.method_calls] == [
+        'ehlo', 'starttls', 'ehlo', 'login', 'sendmail',
+    ]
+    server.login.assert_called_once_with('updater@core.com', 'password')
+    server.sendmail.assert_called_once_with('updater@core.com', ['dev1@core.com'], ANY)
+
+
+@pytest.mark.parametrize('error', [
+    smtplib.SMTPRecipientsRefused({'dev1@core.com': (550, b'mailbox unavailable')}),
+    smtplib.SMTPNotSupportedError('SMTPUTF8 is not supported'),
+    smtplib.SMTPDataError(554, b'transaction failed'),
+])
+@patch('src.email_sender.smtplib.SMTP')
+def test_send_email_does_not_retry_permanent_errors(patched_smtp: MagicMock, error: Exception):
+    # prepare
+    email_sender = EmailSender('updater@core.com', None)
+    patched_smtp.return_value.sendmail.side_effect = error
+
+    # test
+    with pytest.raises(type(error)):
+        email_sender.send_email('dev1@core.com', 'actualizacion Core', 'update')
+
+    # asserts
+    patched_smtp.return_value.sendmail.assert_called_once()
+
+
+@pytest.mark.parametrize('error', [
+    smtplib.SMTPRecipientsRefused({'dev1@core.com': (450, b'greylisted')}),
+    smtplib.SMTPServerDisconnected('Connection unexpectedly closed'),
+    ConnectionResetError(),
+])
+@patch.object(EmailSender, 'retry_delay_seconds', 0)
+@patch('src.email_sender.smtplib.SMTP')
+def test_send_email_retries_transient_errors(patched_smtp: MagicMock, error: Exception):
+    # prepare
+    email_sender = EmailSender('updater@core.com', None)
+    patched_smtp.return_value.sendmail.side_effect = [error, {}]
+
+    # test
+    email_sender.send_email('dev1@core.com', 'actualizacion Core', 'update')
+
+    # asserts
+    assert patched_smtp.return_value.sendmail.call_count == 2
@@ -0,0 +1,86 @@
+import os
+import time
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+import pytest
+
+from src.environment_store import EnvironmentStore
+
+
+def build_fake_environment(environment_path, requirements_path):
+    (environment_path / "bin").mkdir()
+
+
+@patch.object(EnvironmentStore, '_build_environment', side_effect=build_fake_environment)
+def test_get_or_build_reuses_environments_with_the_same_requirements(
+    patched_build_environment: MagicMock,
+    tmp_path,
+):
+    # prepare
+    environment_store = EnvironmentStore(tmp_path / "environments")
+
+    # test
+    first_environment_path = environment_store.get_or_build("requests==2.31.0\n")
+    second_environment_path = environment_store.get_or_build("requests==2.31.0\n")
+    other_environment_path = environment_store.get_or_build("requests==2.32.0\n")
+
+    # asserts
+    assert first_environment_path == second_environment_path
+    assert other_environment_path != first_environment_path
+    assert patched_build_environment.call_count == 2
+    assert (first_environment_path / "requirements.txt").read_text() == "requests==2.31.0\n"
+
+
+@patch.object(EnvironmentStore, '_build_environment', side_effect=Exception("pip failed"))
+def test_get_or_build_does_not_keep_failed_environments(patched_build_environment: MagicMock, tmp_path):
+    # prepare
+    environment_store = EnvironmentStore(tmp_path / "environments")
+
+    # test
+    with pytest.raises(Exception):
+        environment_store.get_or_build("broken==0.0.0\n")
+
+    # asserts
+    assert [path for path in (tmp_path / "environments").iterdir() if not path.name.startswith(".")] == []
+
+
+@patch.object(EnvironmentStore, '_build_environment', side_effect=build_fake_environment)
+def test_activate_switches_the_link_atomically(patched_build_environment: MagicMock, tmp_path):
+    # prepare
+    environment_store = EnvironmentStore(tmp_path / "environments")
+    link_path = tmp_path / ".core_legacy.venv"
+    first_environment_path = environment_store.get_or_build("requests==2.31.0\n")
+    second_environment_path = environment_store.get_or_build("requests==2.32.0\n")
+
+    # test
+    environment_store.activate(first_environment_path, link_path)
+    first_target = os.readlink(link_path)
+    environment_store.activate(second_environment_path, link_path)
+
+    # asserts
+    assert first_target == str(first_environment_path.absolute())
+    assert link_path.resolve() == second_environment_path.resolve()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [".core_legacy.venv", "environments"]
+
+
+@patch.object(EnvironmentStore, '_build_environment', side_effect=build_fake_environment)
+def test_evict_removes_least_recently_used_inactive_environments(patched_build_environment: MagicMock, tmp_path):
+    # prepare
+    environment_store = EnvironmentStore(tmp_path / "environments", max_environments=1)
+    environment_paths = [environment_store.get_or_build(f"requests==2.{index}.0\n") for index in range(3)]
+    for age, environment_path in enumerate(reversed(environment_paths)):
+        used_at = time.time() - age * 10
+        os.utime(environment_path / environment_store.complete_marker_name, (used_at, used_at))
+    environment_store._register_link(tmp_path / "link")
+    os.symlink(environment_paths[0], tmp_path / "link")
+
+    # test
+    evicted_environment_paths = environment_store.evict()
+
+    # asserts
+    assert evicted_environment_paths == [environment_paths[1]]
+    assert environment_paths[0].exists()
+    assert environment_paths[2].exists()
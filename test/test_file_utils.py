@@ -0,0 +1,49 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from src.file_utils import replace_symlink, write_atomically
+
+
+def test_write_atomically_replaces_the_file_with_the_given_mode(tmp_path):
+    # prepare
+    path = tmp_path / "config.json"
+    path.write_text("old")
+
+    # test
+    write_atomically(path, "new", mode=0o600)
+
+    # asserts
+    assert path.read_text() == "new"
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_write_atomically_keeps_the_previous_content_when_the_write_fails(tmp_path):
+    # prepare
+    path = tmp_path / "config.json"
+    path.write_text("old")
+
+    # test
+    with patch.object(os, "fsync", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            write_atomically(path, "new")
+
+    # asserts
+    assert path.read_text() == "old"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_replace_symlink_points_the_link_to_the_new_target(tmp_path):
+    # prepare
+    (tmp_path / "v1").mkdir()
+    (tmp_path / "v2").mkdir()
+    link_path = tmp_path / "current"
+    replace_symlink(tmp_path / "v1", link_path)
+
+    # test
+    replace_symlink(tmp_path / "v2", link_path)
+
+    # asserts
+    assert link_path.resolve() == tmp_path / "v2"
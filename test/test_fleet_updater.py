@@ -0,0 +1,117 @@
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+from git import Repo
+
+from src.app_updater import AppUpdater
+from src.fleet_updater import (
+    FleetTarget,
+    FleetUpdater,
+    load_fleet_targets,
+)
+from src.version_control_provider import CoreConfigProvider
+
+
+def get_fleet_target(name: str, local_repository_path="fake_local_repository_path", version="v1") -> FleetTarget:
+    return FleetTarget(
+        name=name,
+        config={
+            "token": "fake_token",
+            "version": version,
+            "local_repository_path": local_repository_path,
+        },
+    )
+
+
+@patch.object(AppUpdater, 'update_source_code_automaticaly')
+def test_update_all_isolates_failing_targets(patched_update_source_code_automaticaly: MagicMock):
+    # prepare
+    def update_source_code(version_control_data):
+        if str(version_control_data["local_repository_path"]) == "broken":
+            raise Exception("fetch failed")
+        return True
+
+    patched_update_source_code_automaticaly.side_effect = update_source_code
+    targets = [
+        get_fleet_target("first", "first"),
+        get_fleet_target("broken", "broken"),
+        get_fleet_target("third", "third"),
+    ]
+
+    # test
+    fleet_report = FleetUpdater(targets, max_workers=2).update_all()
+
+    # asserts
+    assert [result["name"] for result in fleet_report["results"]] == ["first", "broken", "third"]
+    assert [result["status"] for result in fleet_report["results"]] == ["updated", "failed", "updated"]
+    assert fleet_report["results"][1]["error"] == "fetch failed"
+    assert fleet_report["updated_count"] == 2
+    assert fleet_report["failed_count"] == 1
+
+
+def test_update_all_shares_the_client_pool_between_targets():
+    # prepare
+    fleet_updater = FleetUpdater([get_fleet_target("first"), get_fleet_target("second")])
+
+    # test
+    app_updaters = [fleet_updater._get_app_updater(target) for target in fleet_updater.targets]
+
+    # asserts
+    github_repositories = [
+        app_updater._get_github_repository(app_updater.version_control_provider.get_config())
+        for app_updater in app_updaters
+    ]
+    assert all(repository.client_pool is fleet_updater.client_pool for repository in github_repositories)
+    assert app_updaters[0].changes_made is not app_updaters[1].changes_made
+
+
+def test_update_all_updates_each_installation(git_remote):
+    # prepare
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.tag("v1")
+    git_remote.push()
+    installation_paths = [git_remote.clone(f"installation_{index}") for index in range(3)]
+    expected_commit = git_remote.commit("app.py", "print('v2')")
+    git_remote.tag("v2")
+    git_remote.push()
+
+    targets = []
+    for index, installation_path in enumerate(installation_paths):
+        target = get_fleet_target(f"installation_{index}", installation_path, "v2")
+        target["config"]["ref_resolver"] = "remote"
+        targets.append(target)
+
+    # test
+    fleet_report = FleetUpdater(targets, max_workers=3).update_all()
+
+    # asserts
+    assert fleet_report["updated_count"] == 3
+
+    fleet_report = FleetUpdater(targets, max_workers=3).update_all()
+    assert fleet_report["unchanged_count"] == 3
+    for installation_path in installation_paths:
+        assert Repo(installation_path).head.commit.hexsha == expected_commit
+
+
+def test_load_fleet_targets(tmp_path):
+    # prepare
+    fleet_file_path = tmp_path / "fleet.yaml"
+    fleet_file_path.write_text(
+        "targets:\n"
+        "  - name: local\n"
+        "    token: token\n"
+        "    version: v1\n"
+        "    local_repository_path: path\n"
+        "  - name: core\n"
+        "    core_be_token: core_token\n"
+    )
+
+    # test
+    targets = load_fleet_targets(fleet_file_path)
+
+    # asserts
+    assert targets[0]["config"]["version"] == "v1"
+    assert isinstance(targets[1]["version_control_provider"], CoreConfigProvider)
+    assert targets[1]["version_control_provider"].token == "core_token"
@@ -0,0 +1,157 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+from unittest.mock import (
+    patch,
+    MagicMock,
+)
+
+import pytest
+
+from benchmarks.api_stub import ApiStubServer
+from benchmarks.git_fixtures import SyntheticRepository
+from src.github_api_client import (
+    GithubApiClient,
+    RateLimitExceededError,
+)
+from src.github_repository import (
+    GithubClientPool,
+    GithubRepository,
+)
+from src.release_index import ReleaseIndex
+
+
+@pytest.fixture
+def remote(tmp_path) -> SyntheticRepository:
+    remote = SyntheticRepository(tmp_path / "remote.git", files=5)
+    remote.add_commits(2)
+    return remote
+
+
+def test_concurrent_lookups_are_batched_in_one_deduplicated_query(remote):
+    # prepare
+    first_commit = remote.tag("v1")
+    remote.add_commits(1)
+    second_commit = remote.tag("v2")
+    lookups = [("v1", "v2", "missing")] * 4
+
+    with ApiStubServer(remote) as api_stub_server:
+        api_client = GithubApiClient("fake_token", api_base_url=api_stub_server.url)
+
+        # test
+        with patch.object(GithubApiClient, 'batch_window_seconds', 0.2), ThreadPoolExecutor(5) as executor:
+            latest_release_future = executor.submit(api_client.get_latest_release, "core-webapp", "core_legacy")
+            commit_shas = list(executor.map(
+                lambda tags: api_client.get_commit_shas("core-webapp", "core_legacy", list(tags)), lookups
+            ))
+
+    # asserts
+    assert commit_shas == [{"v1": first_commit, "v2": second_commit, "missing": None}] * 4
+    assert latest_release_future.result() == "v2"
+    assert api_stub_server.requests_count["/graphql"] == 1
+    assert api_client.queries_count == 1
+    assert api_client.deduplicated_count == 9
+
+
+def test_rate_limited_requests_wait_for_the_reset_instead_of_failing(remote):
+    # prepare
+    expected_commit = remote.tag("v1")
+
+    with ApiStubServer(remote) as api_stub_server:
+        api_stub_server.set_rate_limit(remaining=0, reset_in_seconds=1)
+        api_client = GithubApiClient("fake_token", api_base_url=api_stub_server.url)
+
+        # test
+        commit_sha = api_client.get_commit_sha("core-webapp", "core_legacy", "v1")
+
+    # asserts
+    assert commit_sha == expected_commit
+    assert api_stub_server.requests_count["/graphql"] == 1
+    assert api_client.requests_count == 2
+    assert api_client.waited_seconds > 0
+
+
+@patch('src.github_api_client.time.sleep')
+def test_requests_are_scheduled_against_the_remaining_budget(patched_sleep: MagicMock):
+    # prepare
+    reset_at = time.time() + 120
+    mock_session = MagicMock()
+    mock_session.request.side_effect = [
+        MagicMock(status_code=200, headers={"X-RateLimit-Remaining": str(remaining), "X-RateLimit-Reset": reset_at})
+        for remaining in (GithubApiClient.min_remaining_requests + 1, GithubApiClient.min_remaining_requests, 4999)
+    ]
+    api_client = GithubApiClient("fake_token", session=mock_session)
+
+    # test
+    for _ in range(3):
+        api_client.get("https://api.github.com/repos/core-webapp/core_legacy/releases/latest")
+
+    # asserts
+    assert mock_session.request.call_count == 3
+    assert patched_sleep.call_count == 1
+    assert 110 < patched_sleep.call_args.args[0] <= 120
+
+
+@patch.object(GithubApiClient, 'max_wait_seconds', 60)
+def test_requests_fail_when_the_reset_is_too_far(remote):
+    # prepare
+    remote.tag("v1")
+
+    with ApiStubServer(remote) as api_stub_server:
+        api_stub_server.set_rate_limit(remaining=0, reset_in_seconds=3600)
+        api_client = GithubApiClient("fake_token", api_base_url=api_stub_server.url)
+
+        # test
+        with pytest.raises(RateLimitExceededError):
+            api_client.get_commit_sha("core-webapp", "core_legacy", "v1")
+
+
+def test_github_repository_resolves_versions_with_the_graphql_client(remote, tmp_path):
+    # prepare
+    expected_commit = remote.tag("v1")
+
+    with ApiStubServer(remote) as api_stub_server, patch.object(GithubRepository, 'api_base_url', api_stub_server.url):
+        github_repository = GithubRepository(
+            "fake_token",
+            "core-webapp",
+            tmp_path / "installation",
+            "core_legacy",
+            ref_resolver=GithubRepository.REF_RESOLVER_GRAPHQL,
+            client_pool=GithubClientPool(),
+        )
+
+        # test
+        version_info = github_repository.version_info
+        with pytest.raises(ValueError):
+            github_repository.get_commit_sha_of_version_tag("missing")
+
+    # asserts
+    assert version_info["last_release"] == "v1"
+    assert version_info["commit_sha"] == expected_commit
+    assert api_stub_server.requests_count["/graphql"] == 3
+    assert github_repository.api_client is github_repository.client_pool.get_api_client("fake_token")
+
+
+def test_graphql_resolver_syncs_the_release_index_with_paginated_queries(remote, tmp_path):
+    # prepare
+    for tag_number in range(5):
+        expected_commit = remote.tag(f"v{tag_number}")
+
+    with ApiStubServer(remote) as api_stub_server, patch.object(GithubRepository, 'api_base_url', api_stub_server.url):
+        github_repository = GithubRepository(
+            "fake_token",
+            "core-webapp",
+            tmp_path / "installation",
+            "core_legacy",
+            ref_resolver=GithubRepository.REF_RESOLVER_GRAPHQL,
+            client_pool=GithubClientPool(),
+            release_index=ReleaseIndex(tmp_path / "release_index.sqlite3"),
+        )
+
+        # test
+        with patch.object(GithubApiClient, 'tags_per_query', 2):
+            commit_sha = github_repository.get_commit_sha_of_version_tag("v4")
+        requests_count = dict(api_stub_server.requests_count)
+
+    # asserts
+    assert commit_sha == expected_commit
+    assert requests_count == {"/graphql": 3}
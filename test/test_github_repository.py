@@ -46,11 +46,35 @@ def test_github_repository_init(
     local_repository_path = Path()
     repository_name = "some_repository"
 
-    mock_repo = Mock()
-    mock_github_account = Mock()
-    mock_github_account.get_repo.return_value = mock_repo
-    patched_get_github_account.return_value = mock_github_account
+    # test
+    github_repository = GithubRepository(
+        token,
+        organizacion_name,
+        local_repository_path,
+        repository_name,
+    )
+
+    # asserts
+    assert github_repository.api_token == token
+    assert github_repository.organizacion_name == organizacion_name
+    assert github_repository.source_code_path == local_repository_path
+    assert github_repository.repository_name == repository_name
+    assert github_repository.api_calls_count == 0
+
+    patched_get_github_account.assert_not_called()
+    patched_get_last_release.assert_not_called()
+    patched_get_commit_sha_of_release.assert_not_called()
 
+
+@patch.object(GithubRepository, '_get_commit_sha_of_release')
+@patch.object(GithubRepository, '_get_last_release')
+@patch.object(GithubRepository, '_get_github_account')
+def test_version_info_is_lazy_and_memoized(
+    patched_get_github_account: MagicMock,
+    patched_get_last_release: MagicMock,
+    patched_get_commit_sha_of_release: MagicMock,
+):
+    # prepare
     fake_last_release = "fake_last_release"
     patched_get_last_release.return_value = fake_last_release
     fake_commit_sha = "fake_commit_sha"
@@ -62,29 +86,41 @@ def test_github_repository_init(
         "commit_short_sha": fake_commit_sha[:7],
     }
 
+    github_repository = GithubRepository("some_token", "some_organization", Path(), "some_repository")
+
     # test
-    github_repository = GithubRepository(
-        token,
-        organizacion_name,
-        local_repository_path,
-        repository_name,
-    )
+    first_version_info = github_repository.version_info
+    second_version_info = github_repository.version_info
 
     # asserts
-    assert github_repository.api_token == token
-    assert github_repository.organizacion_name == organizacion_name
-    assert github_repository.source_code_path == local_repository_path
-    assert github_repository.repository_name == repository_name
-
-    patched_get_github_account.assert_called_once_with(token)
-    mock_github_account.get_repo.assert_called_once_with(f'{organizacion_name}/{repository_name}')
+    assert first_version_info == expected_version_info
+    assert second_version_info is first_version_info
     patched_get_last_release.assert_called_once()
     patched_get_commit_sha_of_release.assert_called_once_with(fake_last_release)
+    patched_get_github_account.assert_not_called()
 
-    assert github_repository.version_info == expected_version_info
 
+@patch.object(GithubRepository, '_get_github_account')
+def test_repository_is_created_once_on_first_use(patched_get_github_account: MagicMock):
+    # prepare
+    token = "some_token"
+    mock_github_account = Mock()
+    patched_get_github_account.return_value = mock_github_account
+    mock_github_account.get_repo.return_value.get_git_ref.return_value.object.sha = "fake_commit_sha"
+
+    github_repository = GithubRepository(token, "some_organization", Path(), "some_repository")
+
+    # test
+    github_repository.get_commit_sha_of_version_tag("v1")
+    github_repository.get_commit_sha_of_version_tag("v2")
 
-@patch('src.github_repository.Github')
+    # asserts
+    patched_get_github_account.assert_called_once_with(token)
+    mock_github_account.get_repo.assert_called_once_with("some_organization/some_repository", lazy=True)
+    assert github_repository.api_calls_count == 2
+
+
+@patch('src.github_repository.github.Github')
 @patch.object(Auth, 'Token')
 def test_get_github_account(
     mock_auth_with_token: MagicMock,
@@ -104,7 +140,7 @@ def test_get_github_account(
 
     # asserts
     mock_auth_with_token.assert_called_once_with(token)
-    mock_github.assert_called_once_with(auth=mock_auth_instance)
+    mock_github.assert_called_once_with(auth=mock_auth_instance, base_url="https://api.github.com")
     assert result == mock_github_instance
 
 
@@ -279,10 +315,15 @@ def test_change_source_code_version(patched_fetch_and_checkout: MagicMock):
     patched_fetch_and_checkout.assert_called_once_with(fake_commit)
 
 
-@patch('src.github_repository.Repo')
+@patch('src.github_repository.git.Repo')
 def test_fetch_and_checkout(patched_repo: MagicMock):
     # prepare
     mock_repository = Mock()
+    mock_repository.git.count_objects.return_value = "count: 0\nsize: 0\nin-pack: 0\nsize-pack: 0"
+    mock_repository.git_dir = "fake_git_dir"
+    mock_repository.git.sparse_checkout.return_value = ""
+    mock_repository.git.ls_tree.return_value = "100644 blob fake_blob_sha      12\tapp.py\0"
+    mock_repository.git.ls_files.return_value = "H app.py\0"
     patched_repo.return_value = mock_repository
 
     mock_github_repository = get_github_repository_mock()
@@ -296,6 +337,7 @@ def test_fetch_and_checkout(patched_repo: MagicMock):
     mock_repository.remote.assert_called_once()
     mock_repository.remote().fetch.assert_called_once()
     mock_repository.git.checkout.assert_called_once_with(fake_commit)
+    assert mock_github_repository.last_checkout_report == {"files": 1, "bytes": 12, "sparse_checkout_paths": None}
 
 
 @patch.object(Repo, 'clone_from')
@@ -314,3 +356,199 @@ def test_clone_repository(patched_clone_from: MagicMock):
 
     # asserts
     patched_clone_from.assert_called_once_with(expected_repo_url_with_token, fake_path_to_clone_the_app)
+
+
+def test_parse_tag_refs_peels_annotated_tags():
+    # prepare
+    raw_refs = "\n".join([
+        "aaaa\trefs/tags/v1",
+        "bbbb\trefs/tags/v1^{}",
+        "cccc\trefs/tags/qa",
+        "dddd\trefs/heads/main",
+    ])
+
+    # test
+    tag_refs = GithubRepository._parse_tag_refs(raw_refs)
+
+    # asserts
+    assert tag_refs == {"v1": "bbbb", "qa": "cccc"}
+
+
+def test_get_commit_sha_of_version_tag_from_remote(git_remote):
+    # prepare
+    annotated_commit = git_remote.commit("app.py", "print('v1')")
+    git_remote.tag("v1")
+    lightweight_commit = git_remote.commit("app.py", "print('qa')")
+    git_remote.tag("qa", annotated=False)
+    git_remote.push()
+    installation_path = git_remote.clone()
+
+    github_repository = GithubRepository(
+        "some_token",
+        "some_organization",
+        installation_path,
+        "some_repository",
+        ref_resolver=GithubRepository.REF_RESOLVER_REMOTE,
+    )
+
+    # test
+    v1_commit = github_repository.get_commit_sha_of_version_tag("v1")
+    qa_commit = github_repository.get_commit_sha_of_version_tag("qa")
+
+    # asserts
+    assert v1_commit == annotated_commit
+    assert qa_commit == lightweight_commit
+    assert github_repository.api_calls_count == 0
+
+
+def test_get_commit_sha_of_version_tag_from_local_refs_after_fetch(git_remote):
+    # prepare
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.tag("qa")
+    git_remote.push()
+    installation_path = git_remote.clone()
+
+    moved_commit = git_remote.commit("app.py", "print('v2')")
+    git_remote.tag("qa")
+    git_remote.push()
+
+    github_repository = GithubRepository(
+        "some_token",
+        "some_organization",
+        installation_path,
+        "some_repository",
+        ref_resolver=GithubRepository.REF_RESOLVER_LOCAL,
+    )
+
+    # test
+    qa_commit = github_repository.get_commit_sha_of_version_tag("qa")
+    github_repository.change_source_code_version(qa_commit)
+
+    # asserts
+    assert qa_commit == moved_commit
+    assert Repo(installation_path).head.commit.hexsha == moved_commit
+    assert github_repository.api_calls_count == 0
+
+
+def test_get_commit_sha_of_version_tag_from_local_refs_before_the_first_clone(git_remote, tmp_path):
+    # prepare
+    expected_commit = git_remote.commit("app.py", "print('v1')")
+    git_remote.tag("v1")
+    git_remote.push()
+    installation_path = tmp_path / "installation"
+    github_repository = GithubRepository(
+        "some_token",
+        "some_organization",
+        installation_path,
+        "some_repository",
+        ref_resolver=GithubRepository.REF_RESOLVER_LOCAL,
+        repository_url=git_remote.bare_path.as_uri(),
+    )
+
+    # test
+    commit_sha = github_repository.get_commit_sha_of_version_tag("v1")
+    github_repository.change_source_code_version(commit_sha)
+
+    # asserts
+    assert commit_sha == expected_commit
+    assert Repo(installation_path).head.commit.hexsha == expected_commit
+    assert github_repository.api_calls_count == 0
+
+
+def test_get_commit_sha_of_version_tag_through_response_cache():
+    # prepare
+    mock_response_cache = Mock()
+    mock_response_cache.get.return_value.status_code = 200
+    mock_response_cache.get.return_value.json.return_value = {"object": {"sha": "fake_commit_sha"}}
+
+    github_repository = GithubRepository(
+        "some_token",
+        "some_organization",
+        Path(),
+        "some_repository",
+        response_cache=mock_response_cache,
+    )
+
+    # test
+    commit_sha = github_repository.get_commit_sha_of_version_tag("v1")
+
+    # asserts
+    assert commit_sha == "fake_commit_sha"
+    url = mock_response_cache.get.call_args.args[0]
+    assert url == "https://api.github.com/repos/some_organization/some_repository/git/ref/tags/v1"
+    assert mock_response_cache.get.call_args.kwargs["headers"]["Authorization"] == "token some_token"
+    assert github_repository.api_calls_count == 1
+
+
+def test_target_fetch_strategy_only_fetches_the_target_commit(git_remote):
+    # prepare
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.push()
+    installation_path = git_remote.clone()
+
+    git_remote.source.git.checkout("-b", "feature")
+    feature_commit = git_remote.commit("feature.py", "print('feature')")
+    git_remote.source.git.push("bare", "feature")
+    git_remote.source.git.checkout("main")
+    target_commit = git_remote.commit("app.py", "print('v2')")
+    git_remote.push()
+
+    github_repository = GithubRepository(
+        "some_token",
+        "some_organization",
+        installation_path,
+        "some_repository",
+        fetch_strategy=GithubRepository.FETCH_STRATEGY_TARGET,
+        fetch_depth=1,
+    )
+
+    # test
+    github_repository.change_source_code_version(target_commit)
+
+    # asserts
+    local_repository = Repo(installation_path)
+    assert local_repository.head.commit.hexsha == target_commit
+    assert not github_repository.has_commit(feature_commit)
+    assert github_repository.last_fetch_report["strategy"] == "target"
+    assert github_repository.last_fetch_report["objects"] > 0
+    assert github_repository.last_fetch_report["bytes"] > 0
+
+
+def test_target_fetch_strategy_skips_fetch_of_known_commits(git_remote):
+    # prepare
+    known_commit = git_remote.commit("app.py", "print('v1')")
+    git_remote.push()
+    installation_path = git_remote.clone()
+
+    github_repository = GithubRepository(
+        "some_token",
+        "some_organization",
+        installation_path,
+        "some_repository",
+        fetch_strategy=GithubRepository.FETCH_STRATEGY_TARGET,
+    )
+
+    # test
+    with patch.object(Repo, 'remote') as patched_remote:
+        github_repository.change_source_code_version(known_commit)
+
+    # asserts
+    patched_remote.return_value.fetch.assert_not_called()
+    assert github_repository.last_fetch_report["objects"] == 0
+
+
+def test_is_at_commit_peels_annotated_tags(git_remote):
+    # prepare
+    head_commit = git_remote.commit("app.py", "print('v1')")
+    git_remote.tag("v1")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    tag_object_sha = Repo(installation_path).git.rev_parse("refs/tags/v1")
+
+    github_repository = GithubRepository("some_token", "some_organization", installation_path, "some_repository")
+
+    # asserts
+    assert tag_object_sha != head_commit
+    assert github_repository.is_at_commit(head_commit)
+    assert github_repository.is_at_commit(tag_object_sha)
+    assert not github_repository.is_at_commit("0" * 40)
@@ -0,0 +1,10 @@
+from benchmarks.bench_import_time import IMPORT_BUDGET_SECONDS, run_benchmark
+
+
+def test_main_imports_within_budget_without_heavy_dependencies():
+    # test
+    results = run_benchmark("main", repeats=3)
+
+    # asserts
+    assert results["loaded_modules"] == []
+    assert results["min_seconds"] < IMPORT_BUDGET_SECONDS
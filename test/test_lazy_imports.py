@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+import sys
+
+import pytest
+
+from src.lazy_imports import lazy_import
+
+
+def test_lazy_import_only_executes_the_module_on_first_use(tmp_path, monkeypatch):
+    # prepare
+    (tmp_path / "lazy_sample.py").write_text("VALUE = 'loaded'\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "lazy_sample", raising=False)
+
+    # test
+    module = lazy_import("lazy_sample")
+    is_loaded_before_use = "lazy_sample" in sys.modules
+    value = module.VALUE
+
+    # asserts
+    assert is_loaded_before_use is False
+    assert value == "loaded"
+
+
+def test_lazy_import_first_use_from_several_threads(tmp_path, monkeypatch):
+    # prepare
+    (tmp_path / "slow_sample.py").write_text("import time\ntime.sleep(0.2)\nVALUE = 'loaded'\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "slow_sample", raising=False)
+    module = lazy_import("slow_sample")
+
+    # test
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        values = list(executor.map(lambda _: module.VALUE, range(4)))
+
+    # asserts
+    assert values == ["loaded"] * 4
+
+
+def test_lazy_import_fails_right_away_for_missing_modules():
+    # test
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import("not_installed_module")
@@ -0,0 +1,44 @@
+from src.migration_plan import (
+    get_migration_app,
+    plan_migrations,
+)
+
+
+def test_get_migration_app():
+    # asserts
+    assert get_migration_app("core/billing/migrations/0002_invoice_total.py") == "billing"
+    assert get_migration_app("users/migrations/__init__.py") == "users"
+    assert get_migration_app("migrations/0001_initial.py") is None
+    assert get_migration_app("billing/models.py") is None
+
+
+def test_plan_migrations_only_includes_the_apps_with_changed_migrations():
+    # prepare
+    changed_files = [
+        "core/billing/migrations/0002_invoice_total.py",
+        "core/billing/views.py",
+        "core/users/migrations/0007_user_phone.py",
+        "docs/manual.md",
+    ]
+
+    # test
+    migration_plan = plan_migrations(changed_files)
+
+    # asserts
+    assert migration_plan == {
+        "apps": ["billing", "users"],
+        "changed_files": ["core/billing/migrations/0002_invoice_total.py", "core/users/migrations/0007_user_phone.py"],
+    }
+
+
+def test_plan_migrations_skips_when_nothing_affects_the_schema():
+    # asserts
+    assert plan_migrations(["core/billing/views.py", "README.md"]) is None
+    assert plan_migrations([]) is None
+
+
+def test_plan_migrations_migrates_every_app_when_the_schema_can_change_elsewhere():
+    # asserts
+    assert plan_migrations(["requirements.txt", "core/billing/migrations/0002_invoice_total.py"])["apps"] is None
+    assert plan_migrations(["core/settings/production.py"])["apps"] is None
+    assert plan_migrations(None) == {"apps": None, "changed_files": []}
@@ -0,0 +1,97 @@
+from git import Repo
+
+from src.github_repository import GithubRepository
+from src.object_store import SharedObjectStore
+
+
+def count_local_objects(repository_path) -> int:
+    raw_count = Repo(repository_path).git.count_objects("-v")
+    count = dict(line.split(": ") for line in raw_count.splitlines() if not line.startswith("alternate"))
+    return int(count["count"]) + int(count["in-pack"])
+
+
+def test_clone_borrows_objects_from_the_shared_store(git_remote, tmp_path):
+    # prepare
+    for index in range(20):
+        git_remote.commit(f"module_{index}.py", f"value = {index}")
+    git_remote.push()
+    object_store = SharedObjectStore(tmp_path / "objects")
+    repository_url = git_remote.bare_path.as_uri()
+
+    # test
+    object_store.clone(repository_url, tmp_path / "first")
+    object_store.clone(repository_url, tmp_path / "second")
+
+    # asserts
+    store_path = object_store.get_store_path(repository_url)
+    alternates = (tmp_path / "second" / ".git" / "objects" / "info" / "alternates").read_text()
+    assert str(store_path / "objects") in alternates
+    assert count_local_objects(tmp_path / "second") == 0
+    assert object_store._get_borrowers(store_path) == [tmp_path / "first", tmp_path / "second"]
+
+
+def test_github_repository_cold_clone_and_fetch_use_the_shared_store(git_remote, tmp_path):
+    # prepare
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.tag("v1")
+    git_remote.push()
+    object_store = SharedObjectStore(tmp_path / "objects", refresh_interval_seconds=0)
+    installation_path = tmp_path / "installation"
+
+    def get_github_repository() -> GithubRepository:
+        return GithubRepository(
+            "some_token",
+            "some_organization",
+            installation_path,
+            "some_repository",
+            ref_resolver=GithubRepository.REF_RESOLVER_REMOTE,
+            object_store=object_store,
+            repository_url=git_remote.bare_path.as_uri(),
+        )
+
+    # test
+    github_repository = get_github_repository()
+    github_repository.change_source_code_version(github_repository.get_commit_sha_of_version_tag("v1"))
+
+    new_commit = git_remote.commit("app.py", "print('v2')")
+    git_remote.tag("v2")
+    git_remote.push()
+    github_repository = get_github_repository()
+    github_repository.change_source_code_version(github_repository.get_commit_sha_of_version_tag("v2"))
+
+    # asserts
+    assert Repo(installation_path).head.commit.hexsha == new_commit
+    assert github_repository.last_fetch_report["objects"] == 0
+    assert count_local_objects(installation_path) == 0
+
+
+def test_collect_garbage_keeps_objects_used_by_borrowers(git_remote, tmp_path):
+    # prepare
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.source.git.checkout("-b", "hotfix")
+    hotfix_commit = git_remote.commit("hotfix.py", "print('hotfix')")
+    git_remote.source.git.push("bare", "hotfix")
+    git_remote.source.git.checkout("main")
+    git_remote.push()
+
+    object_store = SharedObjectStore(tmp_path / "objects", refresh_interval_seconds=0)
+    repository_url = git_remote.bare_path.as_uri()
+    installation = object_store.clone(repository_url, tmp_path / "installation")
+    installation.git.checkout(hotfix_commit)
+    object_store.clone(repository_url, tmp_path / "removed_installation")
+
+    git_remote.source.git.push("bare", "--delete", "hotfix")
+    store_path = object_store.ensure(repository_url)
+    Repo(tmp_path / "removed_installation").close()
+    for path in sorted((tmp_path / "removed_installation").rglob("*"), reverse=True):
+        path.unlink() if path.is_file() or path.is_symlink() else path.rmdir()
+
+    # test
+    collected_store_paths = object_store.collect_all_garbage()
+    Repo(store_path).git.gc("--prune=now", "--quiet")
+
+    # asserts
+    assert collected_store_paths == [store_path]
+    assert object_store._get_borrowers(store_path) == [tmp_path / "installation"]
+    assert Repo(tmp_path / "installation").git.cat_file("-t", hotfix_commit) == "commit"
+    Repo(tmp_path / "installation").git.fsck("--connectivity-only")
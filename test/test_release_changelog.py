@@ -0,0 +1,56 @@
+from unittest.mock import MagicMock
+
+from src.release_changelog import (
+    ChangelogCache,
+    build_changelog,
+    format_changelog,
+)
+
+
+def get_log_lines() -> list[str]:
+    return [
+        "\x1eaaaaaaa1\x1fAna\x1ffix the invoices\n",
+        "\n",
+        "10\t2\tsrc/invoices.py\n",
+        "-\t-\tassets/logo.png\n",
+        "\x1ebbbbbbb2\x1fLuis\x1fadd reports\n",
+        "\n",
+        "5\t0\tsrc/reports.py\n",
+        "1\t1\tsrc/invoices.py\n",
+        "\x1eccccccc3\x1fAna\x1fmerge\n",
+    ]
+
+
+def test_build_changelog_aggregates_commits_authors_and_stats():
+    # test
+    changelog = build_changelog("old", "new", iter(get_log_lines()), max_listed_commits=2)
+
+    # asserts
+    assert changelog["commits_count"] == 3
+    assert changelog["authors"] == {"Ana": 2, "Luis": 1}
+    assert changelog["files_changed"] == 3
+    assert changelog["insertions"] == 16
+    assert changelog["deletions"] == 3
+    assert [commit["sha"] for commit in changelog["commits"]] == ["aaaaaaa1", "bbbbbbb2"]
+    assert format_changelog(changelog).splitlines()[-3:] == [
+        "- aaaaaaa fix the invoices (Ana)",
+        "- bbbbbbb add reports (Luis)",
+        "... y 1 commits mas",
+    ]
+
+
+def test_changelog_cache_builds_each_pair_of_commits_once(tmp_path):
+    # prepare
+    changelog = build_changelog("old", "new", get_log_lines())
+    build = MagicMock(return_value=changelog)
+    first_cache = ChangelogCache(tmp_path)
+    second_cache = ChangelogCache(tmp_path)
+
+    # test
+    first_changelog = first_cache.get_or_build("old", "new", build)
+    second_changelog = second_cache.get_or_build("old", "new", build)
+
+    # asserts
+    build.assert_called_once_with()
+    assert first_changelog == second_changelog == changelog
+    assert second_cache.hits_count == 1
@@ -0,0 +1,157 @@
+from unittest.mock import patch
+
+from benchmarks.api_stub import ApiStubServer
+from benchmarks.git_fixtures import SyntheticRepository
+from src.github_repository import GithubRepository
+from src.release_index import ReleaseIndex
+from src.response_cache import ResponseCache
+
+
+def test_replace_tags_only_writes_the_differences(tmp_path):
+    # prepare
+    release_index = ReleaseIndex(tmp_path / "release_index.sqlite3")
+    release_index.replace_tags("repository", {"v1": ("tag_1", "commit_1"), "v2": ("tag_2", "commit_2")})
+
+    # test
+    is_changed = release_index.replace_tags("repository", {"v1": ("tag_1", "commit_1"), "v2": ("tag_2", "commit_2")})
+    is_changed_after_moving_a_tag = release_index.replace_tags(
+        "repository", {"v2": ("tag_3", "commit_3"), "qa": ("commit_3", "commit_3")}
+    )
+
+    # asserts
+    assert is_changed is False
+    assert is_changed_after_moving_a_tag is True
+    assert release_index.get_commit_sha("repository", "v1") is None
+    assert release_index.get_commit_sha("repository", "v2") == "commit_3"
+    assert release_index.get_commit_sha("other_repository", "v2") is None
+    assert ReleaseIndex(tmp_path / "release_index.sqlite3").get_commit_sha("repository", "qa") == "commit_3"
+
+
+def test_changed_paths_are_queried_by_release_pair(tmp_path):
+    # prepare
+    release_index = ReleaseIndex(tmp_path / "release_index.sqlite3")
+    release_index.add_changed_paths("repository", "commit_1", "commit_2", [
+        "requirements.txt",
+        "billing/migrations/0002_invoice_total.py",
+    ])
+    release_index.add_changed_paths("repository", "commit_2", "commit_3", [])
+
+    # asserts
+    assert release_index.get_changed_paths("repository", "commit_1", "commit_2") == [
+        "billing/migrations/0002_invoice_total.py",
+        "requirements.txt",
+    ]
+    assert release_index.get_changed_paths("repository", "commit_2", "commit_3") == []
+    assert release_index.get_changed_paths("repository", "commit_1", "commit_3") is None
+
+
+def test_latest_release_is_forgotten_when_the_tags_change(tmp_path):
+    # prepare
+    release_index = ReleaseIndex(tmp_path / "release_index.sqlite3")
+    release_index.set_latest_release("repository", "v1")
+
+    # test
+    latest_release = release_index.get_latest_release("repository", max_age_seconds=60)
+    expired_latest_release = release_index.get_latest_release("repository", max_age_seconds=-1)
+    release_index.forget_latest_release("repository")
+
+    # asserts
+    assert latest_release == "v1"
+    assert expired_latest_release is None
+    assert release_index.get_latest_release("repository") is None
+
+
+def test_github_repository_resolves_tags_and_releases_from_the_synced_index(tmp_path):
+    # prepare
+    remote = SyntheticRepository(tmp_path / "remote.git", files=5)
+    remote.add_commits(2)
+    first_commit = remote.tag("v1")
+    remote.add_commits(1)
+    second_commit = remote.tag("v2")
+    release_index = ReleaseIndex(tmp_path / "release_index.sqlite3")
+    response_cache = ResponseCache(tmp_path / "responses")
+
+    def get_github_repository() -> GithubRepository:
+        return GithubRepository(
+            "fake_token",
+            "core-webapp",
+            tmp_path / "installation",
+            "core_legacy",
+            response_cache=response_cache,
+            release_index=release_index,
+        )
+
+    with ApiStubServer(remote) as api_stub_server, patch.object(GithubRepository, 'api_base_url', api_stub_server.url):
+        # test
+        github_repository = get_github_repository()
+        commit_shas = [github_repository.get_commit_sha_of_version_tag(tag) for tag in ("v1", "v2")]
+        last_release = github_repository.last_release
+        first_sync_requests_count = sum(api_stub_server.requests_count.values())
+
+        api_stub_server.requests_count.clear()
+        github_repository = get_github_repository()
+        synced_commit_sha = github_repository.get_commit_sha_of_version_tag("v2")
+        synced_last_release = github_repository.last_release
+        second_sync_requests = dict(api_stub_server.requests_count)
+
+    # asserts
+    assert commit_shas == [first_commit, second_commit]
+    assert last_release == synced_last_release == "v2"
+    assert first_sync_requests_count == 4
+    assert synced_commit_sha == second_commit
+    assert second_sync_requests == {"/repos/core-webapp/core_legacy/git/matching-refs/tags": 1}
+    assert response_cache.hits_count == 1
+
+
+def test_changed_files_are_computed_once_from_git(git_remote, tmp_path):
+    # prepare
+    installation_path = git_remote.clone()
+    previous_commit = git_remote.source.head.commit.hexsha
+    commit = git_remote.commit("billing/migrations/0002_invoice_total.py", "")
+    git_remote.push()
+    release_index = ReleaseIndex(tmp_path / "release_index.sqlite3")
+    github_repository = GithubRepository(
+        "fake_token", "core-webapp", installation_path, "core_legacy", release_index=release_index
+    )
+    github_repository.fetch_source_code_version(commit)
+
+    # test
+    changed_files = github_repository.get_changed_files(previous_commit, commit)
+    indexed_changed_files = GithubRepository(
+        "fake_token", "core-webapp", tmp_path / "missing", "core_legacy", release_index=release_index
+    ).get_changed_files(previous_commit, commit)
+
+    # asserts
+    assert changed_files == indexed_changed_files == ["billing/migrations/0002_invoice_total.py"]
+
+
+def test_only_the_looked_up_annotated_tag_is_peeled(tmp_path):
+    # prepare
+    remote = SyntheticRepository(tmp_path / "remote.git", files=5)
+    remote.add_commits(1)
+    for tag_number in range(60):
+        expected_commit = remote.tag(f"v{tag_number}")
+    release_index = ReleaseIndex(tmp_path / "release_index.sqlite3")
+
+    with ApiStubServer(remote) as api_stub_server, patch.object(GithubRepository, 'api_base_url', api_stub_server.url):
+        github_repository = GithubRepository(
+            "fake_token",
+            "core-webapp",
+            tmp_path / "installation",
+            "core_legacy",
+            response_cache=ResponseCache(tmp_path / "responses"),
+            release_index=release_index,
+        )
+
+        # test
+        commit_sha = github_repository.get_commit_sha_of_version_tag("v59")
+        requests_count = dict(api_stub_server.requests_count)
+
+    # asserts
+    assert commit_sha == expected_commit
+    assert requests_count == {
+        "/repos/core-webapp/core_legacy/git/matching-refs/tags": 1,
+        f"/repos/core-webapp/core_legacy/git/tags/{remote.get_tag_object('v59')[0]}": 1,
+    }
+    assert release_index.get_commit_sha(github_repository.repository_url, "v59") == expected_commit
+    assert release_index.get_commit_sha(github_repository.repository_url, "v0") is None
@@ -0,0 +1,44 @@
+from src.requirements_diff import (
+    diff_requirements,
+    parse_requirements,
+)
+
+
+def test_parse_requirements_normalizes_names_and_keeps_options():
+    # prepare
+    requirements = "\n".join([
+        "# pinned",
+        "PyYAML==6.0 ; python_version >= '3.11'",
+        "pyjwt[crypto]==2.7.0",
+        "git_python==3.1.32  # comment",
+        "--index-url https://pypi.org/simple",
+        "",
+    ])
+
+    # test
+    pinned_requirements, options = parse_requirements(requirements)
+
+    # asserts
+    assert pinned_requirements == {
+        "pyyaml": "PyYAML==6.0 ; python_version >= '3.11'",
+        "pyjwt": "pyjwt[crypto]==2.7.0",
+        "git-python": "git_python==3.1.32",
+    }
+    assert options == ["--index-url https://pypi.org/simple"]
+
+
+def test_diff_requirements():
+    # prepare
+    old_requirements = "requests==2.31.0\npyyaml==6.0\nsmmap==5.0.0\n"
+    new_requirements = "requests==2.32.0\npyyaml==6.0\npygithub==1.59.0\n"
+
+    # test
+    requirements_diff = diff_requirements(old_requirements, new_requirements)
+
+    # asserts
+    assert requirements_diff == {
+        "added": ["pygithub==1.59.0"],
+        "changed": ["requests==2.32.0"],
+        "removed": ["smmap"],
+        "options_changed": False,
+    }
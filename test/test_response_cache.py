@@ -0,0 +1,127 @@
+import os
+import time
+from unittest.mock import Mock
+
+from src.response_cache import ResponseCache
+
+
+def get_response_mock(status_code=200, body=None, headers=None):
+    response = Mock()
+    response.status_code = status_code
+    response.reason = "reason"
+    response.json.return_value = body
+    response.headers = headers or {}
+    return response
+
+
+def test_get_revalidates_with_etag_and_serves_not_modified_from_cache(tmp_path):
+    # prepare
+    url = "https://api.github.com/repos/core-webapp/core_legacy/releases/latest"
+    body = {"tag_name": "v1"}
+    mock_session = Mock()
+    mock_session.get.side_effect = [
+        get_response_mock(200, body, {"ETag": '"etag"', "Last-Modified": "yesterday"}),
+        get_response_mock(304),
+    ]
+    response_cache = ResponseCache(tmp_path)
+
+    # test
+    first_response = response_cache.get(url, headers={"Authorization": "token a"}, session=mock_session)
+    second_response = response_cache.get(url, headers={"Authorization": "token a"}, session=mock_session)
+
+    # asserts
+    assert first_response.json() == body
+    assert first_response.from_cache is False
+    assert second_response.status_code == 200
+    assert second_response.json() == body
+    assert second_response.from_cache is True
+    second_request_headers = mock_session.get.call_args_list[1].kwargs["headers"]
+    assert second_request_headers["If-None-Match"] == '"etag"'
+    assert second_request_headers["If-Modified-Since"] == "yesterday"
+    assert response_cache.hits_count == 1
+
+
+def test_get_keys_entries_by_auth_identity(tmp_path):
+    # prepare
+    url = "https://core-be/api/company/version-control/me/"
+    mock_session = Mock()
+    mock_session.get.side_effect = [
+        get_response_mock(200, {"version": "v1"}, {"ETag": '"a"'}),
+        get_response_mock(200, {"version": "v2"}, {"ETag": '"b"'}),
+    ]
+    response_cache = ResponseCache(tmp_path)
+
+    # test
+    response_cache.get(url, headers={"Authorization": "Token a"}, session=mock_session)
+    response_cache.get(url, headers={"Authorization": "Token b"}, session=mock_session)
+
+    # asserts
+    assert "If-None-Match" not in mock_session.get.call_args_list[1].kwargs["headers"]
+    assert len(list(tmp_path.glob("*.json"))) == 2
+    assert not any("Token" in path.read_text() for path in tmp_path.glob("*.json"))
+
+
+def test_get_does_not_cache_errors(tmp_path):
+    # prepare
+    mock_session = Mock()
+    mock_session.get.return_value = get_response_mock(500)
+    response_cache = ResponseCache(tmp_path)
+
+    # test
+    response = response_cache.get("https://core-be/", session=mock_session)
+
+    # asserts
+    assert response.status_code == 500
+    assert list(tmp_path.glob("*.json")) == []
+
+
+def test_expired_entries_are_not_revalidated(tmp_path):
+    # prepare
+    url = "https://core-be/"
+    mock_session = Mock()
+    mock_session.get.return_value = get_response_mock(200, {"version": "v1"}, {"ETag": '"a"'})
+    response_cache = ResponseCache(tmp_path, ttl_seconds=60)
+    response_cache.get(url, session=mock_session)
+    old_time = time.time() - 120
+    for entry_path in tmp_path.glob("*.json"):
+        os.utime(entry_path, (old_time, old_time))
+
+    # test
+    response_cache.get(url, session=mock_session)
+
+    # asserts
+    assert "If-None-Match" not in mock_session.get.call_args_list[1].kwargs["headers"]
+
+
+def test_size_eviction_removes_least_recently_used_entries(tmp_path):
+    # prepare
+    mock_session = Mock()
+    mock_session.get.return_value = get_response_mock(200, {"payload": "x" * 100})
+    response_cache = ResponseCache(tmp_path, max_size_bytes=300)
+
+    # test
+    for index in range(5):
+        response_cache.get(f"https://core-be/{index}", session=mock_session)
+        old_time = time.time() - 10 + index
+        os.utime(response_cache._get_entry_path(response_cache._get_key(f"https://core-be/{index}", "")),
+                 (old_time, old_time))
+
+    # asserts
+    remaining_entries = list(tmp_path.glob("*.json"))
+    assert sum(path.stat().st_size for path in remaining_entries) <= 300
+    assert response_cache._get_entry_path(response_cache._get_key("https://core-be/4", "")) in remaining_entries
+
+
+def test_entries_are_only_readable_by_the_owner(tmp_path):
+    # prepare
+    directory = tmp_path / "responses"
+    mock_session = Mock()
+    mock_session.get.return_value = get_response_mock(200, {"token": "secret"}, {"ETag": '"a"'})
+    response_cache = ResponseCache(directory)
+
+    # test
+    response_cache.get("https://core-be/", session=mock_session)
+
+    # asserts
+    assert directory.stat().st_mode & 0o777 == 0o700
+    assert [path.stat().st_mode & 0o777 for path in directory.glob("*.json")] == [0o600]
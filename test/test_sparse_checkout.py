@@ -0,0 +1,83 @@
+from src.app_updater import AppUpdater
+from src.version_control_provider import StaticConfigProvider
+from src.worktree_deployer import WorktreeDeployer
+
+
+def get_app_updater(git_remote, installation_path, **version_control_data) -> AppUpdater:
+    return AppUpdater(version_control_provider=StaticConfigProvider({
+        'token': 'fake_token',
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+        'repository_url': git_remote.bare_path.as_uri(),
+        'sparse_checkout_paths': ['app', 'config/'],
+    } | version_control_data))
+
+
+def commit_release(git_remote, version: str, files: dict[str, str]) -> None:
+    for file_name, content in files.items():
+        git_remote.commit(file_name, content)
+    git_remote.tag(version)
+    git_remote.push()
+
+
+def test_update_only_writes_the_paths_of_the_profile(git_remote, tmp_path):
+    # prepare
+    installation_path = tmp_path / "installation"
+    commit_release(git_remote, "v1", {
+        "app/main.py": "print('v1')",
+        "config/settings.yaml": "debug: false",
+        "docs/manual.md": "manual",
+        "test/fixtures/big.json": "{}",
+    })
+    commit_release(git_remote, "v2", {"app/main.py": "print('v2!')", "docs/manual.md": "new manual"})
+
+    # test
+    get_app_updater(git_remote, installation_path, version='v1').update_source_code_automaticaly()
+    app_updater = get_app_updater(git_remote, installation_path, version='v2')
+    app_updater.update_source_code_automaticaly()
+
+    # asserts
+    assert (installation_path / "app" / "main.py").read_text() == "print('v2!')"
+    assert (installation_path / "config" / "settings.yaml").exists()
+    assert (installation_path / "README.md").exists()
+    assert not (installation_path / "docs").exists()
+    assert not (installation_path / "test").exists()
+    assert app_updater.update_pipeline.context["checkout"] == {
+        "files_changed": 2,
+        "files_written": 1,
+        "bytes_written": len("print('v2!')"),
+    }
+
+
+def test_update_removes_the_profile_when_it_is_not_configured(git_remote, tmp_path):
+    # prepare
+    installation_path = tmp_path / "installation"
+    commit_release(git_remote, "v1", {"app/main.py": "print('v1')", "docs/manual.md": "manual"})
+    commit_release(git_remote, "v2", {"app/main.py": "print('v2')"})
+    get_app_updater(git_remote, installation_path, version='v1').update_source_code_automaticaly()
+
+    # test
+    app_updater = get_app_updater(git_remote, installation_path, version='v2', sparse_checkout_paths=None)
+    app_updater.update_source_code_automaticaly()
+
+    # asserts
+    assert (installation_path / "docs" / "manual.md").read_text() == "manual"
+    assert app_updater.update_pipeline.context["checkout"]["files_written"] == 3
+
+
+def test_worktree_releases_only_contain_the_paths_of_the_profile(git_remote, tmp_path):
+    # prepare
+    installation_path = tmp_path / "installation"
+    commit_release(git_remote, "v1", {"app/main.py": "print('v1')", "docs/manual.md": "manual"})
+    app_updater = get_app_updater(git_remote, installation_path, version='v1', deploy_mode='worktree')
+
+    # test
+    app_updater.update_source_code_automaticaly()
+
+    # asserts
+    release_path = installation_path.resolve()
+    assert release_path.parent == WorktreeDeployer(installation_path).releases_path
+    assert (release_path / "app" / "main.py").read_text() == "print('v1')"
+    assert not (release_path / "docs").exists()
+    assert not (WorktreeDeployer(installation_path).repository_path / "docs").exists()
+    assert app_updater.update_pipeline.context["checkout"]["files_written"] == 2
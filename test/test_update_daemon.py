@@ -0,0 +1,126 @@
+import threading
+from unittest.mock import (
+    patch,
+    MagicMock,
+)
+
+from src.app_updater import AppUpdater
+from src.update_daemon import UpdateDaemon
+from src.version_control_provider import StaticConfigProvider
+
+
+def get_app_updater(installation_path, version: str = 'v2') -> MagicMock:
+    app_updater = MagicMock(spec=AppUpdater)
+    app_updater.version_control_provider = StaticConfigProvider({
+        'token': 'fake_token',
+        'version': version,
+        'local_repository_path': installation_path,
+    })
+    app_updater.update_source_code_automaticaly.return_value = True
+    app_updater.is_deployed.return_value = False
+    app_updater.object_store = None
+    return app_updater
+
+
+def test_check_only_updates_when_the_target_is_not_deployed(tmp_path):
+    # prepare
+    app_updater = get_app_updater(tmp_path / "installation")
+    app_updater.is_deployed.side_effect = [False, True, True, True]
+    update_daemon = UpdateDaemon(app_updater, min_interval_seconds=10, max_interval_seconds=40)
+
+    # test
+    checks = [update_daemon.check() for _ in range(4)]
+
+    # asserts
+    assert checks == [True, False, False, False]
+    app_updater.update_source_code_automaticaly.assert_called_once()
+    assert update_daemon.updates_count == 1
+    assert update_daemon.interval_seconds == 40
+
+
+def test_check_backs_off_on_errors_and_resets_after_an_update(tmp_path):
+    # prepare
+    app_updater = get_app_updater(tmp_path / "installation")
+    app_updater.update_source_code_automaticaly.side_effect = [Exception("github is down")] * 7 + [True]
+    update_daemon = UpdateDaemon(app_updater, min_interval_seconds=10, max_interval_seconds=40)
+
+    # test
+    for _ in range(7):
+        update_daemon.check()
+    error_interval_seconds = update_daemon.interval_seconds
+    update_daemon.check()
+
+    # asserts
+    assert error_interval_seconds == UpdateDaemon.max_error_interval_seconds
+    assert update_daemon.errors_count == 7
+    assert update_daemon.last_error is None
+    assert update_daemon.interval_seconds == 10
+
+
+@patch.object(UpdateDaemon, 'jitter_ratio', 0)
+def test_run_wakes_up_on_request_and_stops_cleanly(tmp_path):
+    # prepare
+    app_updater = get_app_updater(tmp_path / "installation")
+    app_updater.update_source_code_automaticaly.return_value = False
+    update_daemon = UpdateDaemon(app_updater, min_interval_seconds=60, max_interval_seconds=60)
+    daemon_thread = threading.Thread(target=update_daemon.run)
+
+    # test
+    daemon_thread.start()
+    update_daemon.request_check()
+    update_daemon.stop()
+    daemon_thread.join(timeout=5)
+
+    # asserts
+    assert not daemon_thread.is_alive()
+    assert 1 <= update_daemon.checks_count <= 2
+
+
+def test_forced_check_runs_the_update_even_when_the_target_is_deployed(tmp_path):
+    # prepare
+    app_updater = get_app_updater(tmp_path / "installation")
+    app_updater.is_deployed.return_value = True
+    update_daemon = UpdateDaemon(app_updater)
+
+    # test
+    is_updated_without_force = update_daemon.check()
+    update_daemon.request_check(force=True)
+    is_updated_with_force = update_daemon.check()
+
+    # asserts
+    assert is_updated_without_force is False
+    assert is_updated_with_force is True
+    app_updater.update_source_code_automaticaly.assert_called_once()
+
+
+def test_idle_checks_prefetch_the_candidate_releases_once_per_interval(tmp_path):
+    # prepare
+    app_updater = get_app_updater(tmp_path / "installation")
+    app_updater.is_deployed.return_value = True
+    app_updater.version_control_provider.config['prefetch_tags'] = ['latest', 'qa']
+    update_daemon = UpdateDaemon(app_updater)
+
+    # test
+    update_daemon.check()
+    update_daemon.check()
+
+    # asserts
+    app_updater.prefetch_releases.assert_called_once_with(app_updater.version_control_provider.config)
+    app_updater.update_source_code_automaticaly.assert_not_called()
+    assert update_daemon.prefetches_count == 1
+
+
+def test_idle_checks_collect_the_garbage_of_the_object_store_once_per_interval(tmp_path):
+    # prepare
+    app_updater = get_app_updater(tmp_path / "installation")
+    app_updater.is_deployed.return_value = True
+    app_updater.object_store = MagicMock()
+    update_daemon = UpdateDaemon(app_updater)
+
+    # test
+    update_daemon.check()
+    update_daemon.check()
+
+    # asserts
+    app_updater.object_store.collect_all_garbage.assert_called_once_with()
+    assert update_daemon.garbage_collections_count == 1
@@ -0,0 +1,34 @@
+from src.update_metrics import UpdateMetrics
+
+
+def test_to_prometheus_text():
+    # prepare
+    update_metrics = UpdateMetrics('core "legacy"')
+    update_metrics.set_duration("fetch", 1.5)
+    update_metrics.set_status("fetch", "succeeded")
+    update_metrics.set_status("email", "failed")
+    update_metrics.set_value("fetch-bytes", 2048)
+    update_metrics.set_value("ignored", None)
+
+    # test
+    prometheus_text = update_metrics.to_prometheus_text()
+
+    # asserts
+    assert 'app_updater_stage_duration_seconds{installation="core \\"legacy\\"",stage="fetch"} 1.5' in prometheus_text
+    assert 'stage="email",status="failed"} 0' in prometheus_text
+    assert 'app_updater_fetch_bytes{installation="core \\"legacy\\""} 2048' in prometheus_text
+    assert "ignored" not in prometheus_text
+
+
+def test_write_prometheus_textfile_replaces_the_file(tmp_path):
+    # prepare
+    update_metrics = UpdateMetrics("core_legacy")
+    textfile_path = tmp_path / "app_updater_core_legacy.prom"
+    textfile_path.write_text("old")
+
+    # test
+    update_metrics.write_prometheus_textfile(textfile_path)
+
+    # asserts
+    assert textfile_path.read_text().startswith("# TYPE app_updater_run_timestamp_seconds gauge")
+    assert [path.name for path in tmp_path.iterdir()] == ["app_updater_core_legacy.prom"]
@@ -0,0 +1,165 @@
+import threading
+import time
+
+import pytest
+
+from src.update_pipeline import (
+    PipelineStopped,
+    Stage,
+    StageTimeoutError,
+    UpdatePipeline,
+)
+
+
+def sleep_and_return(seconds: float, value=None):
+    def stage_function(context):
+        time.sleep(seconds)
+        return value
+    return stage_function
+
+
+def fail(context):
+    raise ValueError("stage failed")
+
+
+def test_independent_stages_overlap():
+    # prepare
+    pipeline = UpdatePipeline([
+        Stage("fetch", sleep_and_return(0, "commit")),
+        Stage("checkout", sleep_and_return(0.3), depends_on=("fetch",)),
+        Stage("read_requirements", sleep_and_return(0.3, "requests"), depends_on=("fetch",)),
+        Stage(
+            "dependencies",
+            lambda context: context["read_requirements"],
+            depends_on=("checkout", "read_requirements"),
+        ),
+    ])
+
+    # test
+    started_at = time.perf_counter()
+    results = pipeline.run()
+    duration_seconds = time.perf_counter() - started_at
+
+    # asserts
+    assert all(result["status"] == "succeeded" for result in results.values())
+    assert pipeline.context["dependencies"] == "requests"
+    assert duration_seconds < 0.55
+
+
+def test_abort_failure_skips_every_pending_stage():
+    # prepare
+    pipeline = UpdatePipeline([
+        Stage("fetch", fail),
+        Stage("checkout", sleep_and_return(0), depends_on=("fetch",)),
+        Stage("config", sleep_and_return(0.1)),
+        Stage("email", sleep_and_return(0), depends_on=("config",)),
+    ])
+
+    # test
+    results = pipeline.run()
+
+    # asserts
+    assert results["fetch"]["status"] == "failed"
+    assert results["checkout"]["status"] == "skipped"
+    assert results["config"]["status"] == "succeeded"
+    assert results["email"]["status"] == "skipped"
+    assert isinstance(pipeline.get_error(), ValueError)
+
+
+def test_continue_and_ignore_failure_policies():
+    # prepare
+    pipeline = UpdatePipeline([
+        Stage("prefetch", fail, failure_policy=Stage.FAILURE_IGNORE),
+        Stage("install", sleep_and_return(0), depends_on=("prefetch",)),
+        Stage("migrations", fail, failure_policy=Stage.FAILURE_CONTINUE),
+        Stage("report", sleep_and_return(0), depends_on=("migrations",)),
+        Stage("email", sleep_and_return(0.05)),
+    ])
+
+    # test
+    results = pipeline.run()
+
+    # asserts
+    assert results["install"]["status"] == "succeeded"
+    assert results["report"]["status"] == "skipped"
+    assert results["email"]["status"] == "succeeded"
+    assert pipeline.get_error() is None
+
+
+def test_stage_timeout():
+    # prepare
+    release = threading.Event()
+    pipeline = UpdatePipeline([
+        Stage("fetch", lambda context: release.wait(5), timeout_seconds=0.1),
+        Stage("checkout", sleep_and_return(0), depends_on=("fetch",)),
+    ])
+
+    # test
+    results = pipeline.run()
+    release.set()
+
+    # asserts
+    assert results["fetch"]["status"] == "timed_out"
+    assert results["checkout"]["status"] == "skipped"
+    assert isinstance(pipeline.get_error(), StageTimeoutError)
+
+
+def test_timed_out_stages_can_be_waited_for():
+    # prepare
+    release = threading.Event()
+    pipeline = UpdatePipeline([
+        Stage("fetch", lambda context: release.wait(0.3), timeout_seconds=0.1),
+    ])
+
+    # test
+    results = pipeline.run()
+    remaining_seconds = pipeline.get_remaining_seconds("fetch")
+    pipeline.wait_for_abandoned_stages()
+
+    # asserts
+    assert results["fetch"]["status"] == "timed_out"
+    assert remaining_seconds == 0
+    assert all(future.done() for future in pipeline._abandoned_futures)
+
+
+def test_background_stages_do_not_delay_the_pipeline():
+    # prepare
+    pipeline = UpdatePipeline([
+        Stage("checkout", sleep_and_return(0)),
+        Stage("email", sleep_and_return(0.3, "sent"), depends_on=("checkout",), background=True),
+    ])
+
+    # test
+    started_at = time.perf_counter()
+    results = pipeline.run()
+    duration_seconds = time.perf_counter() - started_at
+    pipeline.wait_for_background_stages()
+
+    # asserts
+    assert duration_seconds < 0.25
+    assert results["email"]["status"] == "succeeded"
+    assert pipeline.context["email"] == "sent"
+
+
+def test_pipeline_stopped_skips_the_remaining_stages():
+    # prepare
+    def already_deployed(context):
+        raise PipelineStopped("already deployed")
+
+    pipeline = UpdatePipeline([
+        Stage("resolve", already_deployed),
+        Stage("fetch", sleep_and_return(0), depends_on=("resolve",)),
+    ])
+
+    # test
+    results = pipeline.run()
+
+    # asserts
+    assert results["resolve"]["status"] == "stopped"
+    assert results["fetch"]["status"] == "skipped"
+    assert pipeline.get_error() is None
+
+
+def test_unknown_dependencies_are_rejected():
+    with pytest.raises(ValueError):
+        UpdatePipeline([Stage("checkout", sleep_and_return(0), depends_on=("fetch",))])
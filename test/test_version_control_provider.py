@@ -0,0 +1,91 @@
+import os
+import time
+from unittest.mock import (
+    patch,
+    MagicMock,
+)
+
+import pytest
+import requests
+
+from src.version_control_provider import CoreConfigProvider
+
+
+def get_response(status_code: int, body: dict | None = None) -> MagicMock:
+    response = MagicMock(status_code=status_code, reason="fake reason")
+    response.json.return_value = body
+    return response
+
+
+def get_core_config() -> dict:
+    return {'token': 'fake_token', 'version': 'v2', 'local_repository_path': '/opt/core_legacy'}
+
+
+@patch.object(CoreConfigProvider, 'retry_backoff_seconds', 0)
+@patch.object(CoreConfigProvider, 'http_session')
+def test_get_config_retries_when_core_be_fails_and_persists_the_config(patched_http_session: MagicMock, tmp_path):
+    # prepare
+    patched_get = patched_http_session.get
+    patched_get.side_effect = [
+        requests.ConnectionError("refused"),
+        get_response(503),
+        get_response(200, get_core_config()),
+    ]
+    config_provider = CoreConfigProvider('core_token', last_known_good_directory=tmp_path)
+
+    # test
+    config = config_provider.get_config()
+
+    # asserts
+    assert config['version'] == 'v2'
+    assert patched_get.call_count == 3
+    assert patched_get.call_args.kwargs['timeout'] == (
+        CoreConfigProvider.connect_timeout_seconds, CoreConfigProvider.read_timeout_seconds,
+    )
+    assert config_provider.is_stale_config is False
+    assert config_provider._read_last_known_good_config() == get_core_config()
+
+
+@patch.object(CoreConfigProvider, 'retry_backoff_seconds', 0)
+@patch.object(CoreConfigProvider, 'http_session')
+def test_get_config_uses_the_last_known_good_config_when_core_be_is_down(patched_http_session: MagicMock, tmp_path):
+    # prepare
+    patched_http_session.get.side_effect = requests.Timeout("read timed out")
+    config_provider = CoreConfigProvider('core_token', last_known_good_directory=tmp_path)
+    config_provider._write_last_known_good_config(get_core_config())
+
+    # test
+    config = config_provider.get_config()
+
+    # asserts
+    assert config['version'] == 'v2'
+    assert config_provider.is_stale_config is True
+    assert patched_http_session.get.call_count == CoreConfigProvider.max_attempts
+
+
+@patch.object(CoreConfigProvider, 'retry_backoff_seconds', 0)
+@patch.object(CoreConfigProvider, 'http_session')
+def test_get_config_fails_when_the_last_known_good_config_is_too_old(patched_http_session: MagicMock, tmp_path):
+    # prepare
+    patched_http_session.get.side_effect = requests.ConnectionError("refused")
+    config_provider = CoreConfigProvider('core_token', last_known_good_directory=tmp_path)
+    config_provider._write_last_known_good_config(get_core_config())
+    old_time = time.time() - CoreConfigProvider.max_stale_seconds - 1
+    os.utime(config_provider._get_last_known_good_path(), (old_time, old_time))
+
+    # test / asserts
+    with pytest.raises(Exception, match="There was an error calling to core-be"):
+        config_provider.get_config()
+
+
+@patch.object(CoreConfigProvider, 'http_session')
+def test_get_config_does_not_retry_rejected_tokens(patched_http_session: MagicMock, tmp_path):
+    # prepare
+    patched_http_session.get.return_value = get_response(401)
+    config_provider = CoreConfigProvider('core_token', last_known_good_directory=tmp_path)
+    config_provider._write_last_known_good_config(get_core_config())
+
+    # test / asserts
+    with pytest.raises(Exception, match="There was an error getting the config - 401"):
+        config_provider.get_config()
+    patched_http_session.get.assert_called_once()
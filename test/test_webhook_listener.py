@@ -0,0 +1,131 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from src.webhook_listener import WebhookListener
+
+SECRET = "fake_secret"
+
+
+@pytest.fixture
+def triggers() -> dict:
+    triggered = threading.Event()
+    first_installation = MagicMock(side_effect=lambda: triggered.set())
+    second_installation = MagicMock()
+    return {"first": first_installation, "second": second_installation, "triggered": triggered}
+
+
+@pytest.fixture
+def webhook_listener(triggers):
+    webhook_listener = WebhookListener(
+        {"first": triggers["first"], "second": triggers["second"]},
+        SECRET,
+        port=0,
+        coalesce_seconds=0.5,
+    ).start()
+    yield webhook_listener
+    webhook_listener.stop()
+
+
+def get_signature(body: bytes, secret: str = SECRET) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def post(webhook_listener: WebhookListener, path: str, payload: dict, secret: str = SECRET, **headers):
+    body = json.dumps(payload).encode()
+    signature = get_signature(body, secret)
+    return requests.post(
+        f"{webhook_listener.url}{path}",
+        data=body,
+        headers={"X-Hub-Signature-256": signature, "Content-Type": "application/json", **headers},
+        timeout=5,
+    )
+
+
+def test_github_release_events_are_deduplicated_and_coalesced(webhook_listener, triggers):
+    # test
+    responses = [
+        post(webhook_listener, "/github", {"action": "published", "release": {"tag_name": "v2"}},
+             **{"X-GitHub-Event": "release", "X-GitHub-Delivery": "delivery-1"}),
+        post(webhook_listener, "/github", {"action": "published", "release": {"tag_name": "v2"}},
+             **{"X-GitHub-Event": "release", "X-GitHub-Delivery": "delivery-1"}),
+        post(webhook_listener, "/github", {"ref": "refs/tags/v2", "deleted": False},
+             **{"X-GitHub-Event": "push", "X-GitHub-Delivery": "delivery-2"}),
+        post(webhook_listener, "/github", {"ref": "refs/heads/main"},
+             **{"X-GitHub-Event": "push", "X-GitHub-Delivery": "delivery-3"}),
+    ]
+    deadline = time.monotonic() + 5
+    while not (triggers["first"].called and triggers["second"].called) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    webhook_listener.stop()
+
+    # asserts
+    assert [response.status_code for response in responses] == [202, 200, 202, 200]
+    assert responses[1].text == "duplicated"
+    triggers["first"].assert_called_once_with()
+    triggers["second"].assert_called_once_with()
+    assert webhook_listener.duplicated_count == 1
+
+
+def test_core_be_notifications_only_trigger_the_affected_installation(webhook_listener, triggers):
+    # test
+    response = post(webhook_listener, "/core-be", {"installation": "first", "version": "v3"})
+    triggers["triggered"].wait(timeout=5)
+    webhook_listener.stop()
+
+    # asserts
+    assert response.status_code == 202
+    triggers["first"].assert_called_once_with()
+    triggers["second"].assert_not_called()
+
+
+def test_requests_with_invalid_signature_are_rejected(webhook_listener, triggers):
+    # test
+    response = post(webhook_listener, "/core-be", {"version": "v3"}, secret="wrong_secret")
+
+    # asserts
+    assert response.status_code == 401
+    assert webhook_listener.received_count == 0
+
+
+def test_a_single_trigger_takes_the_notifications_of_any_installation():
+    # prepare
+    trigger = MagicMock()
+    webhook_listener = WebhookListener({"installation": trigger}, SECRET, coalesce_seconds=0)
+
+    # test
+    status_code, _ = webhook_listener.handle(
+        "/core-be", {"X-Hub-Signature-256": get_signature(b'{"installation": "core_legacy"}')},
+        b'{"installation": "core_legacy"}',
+    )
+    time.sleep(0.1)
+    webhook_listener.stop()
+
+    # asserts
+    assert status_code == 202
+    trigger.assert_called_once_with()
+
+
+def test_notifications_without_delivery_id_are_only_deduplicated_for_a_while():
+    # prepare
+    webhook_listener = WebhookListener({"first": MagicMock(), "second": MagicMock()}, SECRET, coalesce_seconds=60)
+
+    def notify(version: str) -> str:
+        body = json.dumps({"version": version}).encode()
+        return webhook_listener.handle("/core-be", {"X-Hub-Signature-256": get_signature(body)}, body)[1]
+
+    # test
+    with patch.object(WebhookListener, "body_hash_ttl_seconds", 0.1):
+        messages = [notify("v2"), notify("v3"), notify("v2")]
+        time.sleep(0.2)
+        messages.append(notify("v2"))
+    webhook_listener.stop()
+
+    # asserts
+    assert messages == ["accepted", "accepted", "duplicated", "accepted"]
@@ -0,0 +1,122 @@
+import os
+from unittest.mock import patch
+
+from git import Repo
+
+from src.app_updater import AppUpdater
+from src.deployment_state import DeploymentState
+from src.version_control_provider import StaticConfigProvider
+from src.worktree_deployer import WorktreeDeployer
+
+
+def update_with_worktrees(git_remote, installation_path, version: str, keep_releases: int = 3) -> AppUpdater:
+    app_updater = AppUpdater(version_control_provider=StaticConfigProvider({
+        'token': 'fake_token',
+        'version': version,
+        'local_repository_path': installation_path,
+        'ref_resolver': 'remote',
+        'repository_url': git_remote.bare_path.as_uri(),
+        'deploy_mode': 'worktree',
+        'keep_releases': keep_releases,
+    }))
+    app_updater.update_source_code_automaticaly()
+    return app_updater
+
+
+def test_update_prepares_a_worktree_and_switches_the_live_path(git_remote):
+    # prepare
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.tag("v1")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    expected_commit = git_remote.commit("app.py", "print('v2')")
+    git_remote.tag("v2")
+    git_remote.push()
+    worktree_deployer = WorktreeDeployer(installation_path)
+
+    # test
+    update_with_worktrees(git_remote, installation_path, "v2")
+
+    # asserts
+    assert installation_path.is_symlink()
+    assert installation_path.resolve() == worktree_deployer.get_release_path(expected_commit)
+    assert (installation_path / "app.py").read_text() == "print('v2')"
+    assert [path.name.startswith("legacy-") for path in worktree_deployer.get_releases()] == [False, True]
+    assert DeploymentState.for_installation(installation_path).get("commit") == expected_commit
+
+
+def test_repository_of_the_releases_reuses_the_objects_of_the_in_place_checkout(git_remote):
+    # prepare
+    git_remote.commit("app.py", "print('v1')")
+    git_remote.tag("v1")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    git_remote.commit("app.py", "print('v2')")
+    git_remote.tag("v2")
+    git_remote.push()
+    worktree_deployer = WorktreeDeployer(installation_path)
+
+    # test
+    with patch.object(Repo, 'clone_from', side_effect=Repo.clone_from) as patched_clone_from:
+        update_with_worktrees(git_remote, installation_path, "v2")
+
+    # asserts
+    assert patched_clone_from.call_args.kwargs == {
+        "no_checkout": True,
+        "reference": str(installation_path),
+        "dissociate": True,
+    }
+    assert [path.name for path in worktree_deployer.repository_path.iterdir()] == [".git"]
+    assert not (worktree_deployer.repository_path / ".git" / "objects" / "info" / "alternates").exists()
+
+
+def test_update_keeps_a_bounded_number_of_releases(git_remote, tmp_path):
+    # prepare
+    installation_path = tmp_path / "installation"
+    release_commits = []
+    for version in ("v1", "v2", "v3"):
+        release_commits.append(git_remote.commit("app.py", f"print('{version}')"))
+        git_remote.tag(version)
+    git_remote.push()
+    worktree_deployer = WorktreeDeployer(installation_path)
+
+    # test
+    for version in ("v1", "v2", "v3"):
+        update_with_worktrees(git_remote, installation_path, version, keep_releases=2)
+        os.utime(installation_path.resolve())
+    is_updated_again = update_with_worktrees(git_remote, installation_path, "v3").update_source_code_automaticaly()
+
+    # asserts
+    assert is_updated_again is False
+    assert worktree_deployer.get_releases() == [
+        worktree_deployer.get_release_path(release_commits[2]),
+        worktree_deployer.get_release_path(release_commits[1]),
+    ]
+    assert (installation_path / "app.py").read_text() == "print('v3')"
+
+
+@patch.object(AppUpdater, 'prefetch_wheels', False)
+def test_update_installs_the_dependencies_of_the_release_before_switching_to_it(git_remote):
+    # prepare
+    git_remote.commit("requirements.txt", "requests==2.31.0\n")
+    git_remote.tag("v1")
+    git_remote.push()
+    installation_path = git_remote.clone()
+    git_remote.commit("requirements.txt", "requests==2.32.0\n")
+    git_remote.tag("v2")
+    git_remote.push()
+    installs = []
+
+    def run_pip(pip_arguments: list[str], **kwargs) -> None:
+        installs.append({
+            "requirements": open(pip_arguments[-1]).read(),
+            "live_requirements": (installation_path / "requirements.txt").read_text(),
+        })
+
+    # test
+    with patch.object(AppUpdater, '_run_pip', side_effect=run_pip):
+        update_with_worktrees(git_remote, installation_path, "v2")
+
+    # asserts
+    assert installs == [{"requirements": "requests==2.32.0\n", "live_requirements": "requests==2.31.0\n"}]
+    assert (installation_path / "requirements.txt").read_text() == "requests==2.32.0\n"